@@ -0,0 +1,9 @@
+"""
+Benchmarks of the cleaner module (see __main__ for how to run them).
+"""
+from sweeping.benchmark.generator import SETTINGS_PATH, RESULTS_PATH, \
+    generateSyntheticDatabase, generateParserCorpus, generateResultsTree
+from sweeping.benchmark.legacy import legacyFructoseTriplets, legacyCreate, \
+    legacyExtractDataFromFile, legacySanitizeAndDiff
+from sweeping.benchmark.scenarios import SCENARIOS, runScenarios, \
+    createReport, writeReport, readReport, compareReports
@@ -0,0 +1,239 @@
+"""
+Benchmarks measuring how the cleaner module scales with the size of the
+data it is given. Synthetic data is generated on the fly so that no large
+fixtures are needed.
+
+Run from the repository root, for instance:
+
+    python -m sweeping.benchmark triplets --rows 100000
+    python -m sweeping.benchmark create --rows 100000
+    python -m sweeping.benchmark parser --copies 50
+    python -m sweeping.benchmark scoring --rows 100000
+    python -m sweeping.benchmark latency --latency 0.005
+    python -m sweeping.benchmark partition --rows 1000000
+    python -m sweeping.benchmark interning --rows 200000
+    python -m sweeping.benchmark tree results --folders 40 --files 50
+    python -m sweeping.benchmark suite --output new.json --compare old.json
+"""
+import argparse
+import os
+import tempfile
+
+from sweeping.benchmark.comparisons import benchmarkTriplets, \
+    benchmarkCreate, benchmarkParser, benchmarkScoring, benchmarkLatency, \
+    benchmarkPartition, benchmarkInterning
+from sweeping.benchmark.generator import generateResultsTree
+from sweeping.benchmark.scenarios import SCENARIOS, runScenarios, \
+    createReport, writeReport, readReport, compareReports
+
+
+def main():
+    """
+    Parses the command line arguments and runs the requested benchmark.
+    """
+    parser = argparse.ArgumentParser(prog="python -m sweeping.benchmark",
+                                     description=__doc__.strip(),
+                                     formatter_class=argparse.
+                                     RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="benchmark", required=True)
+
+    triplets = commands.add_parser("triplets", help="fructose triplet search "
+                                                    "against the legacy one")
+    triplets.add_argument("--rows", type=int, default=100000)
+    triplets.add_argument("--legacy-rows", type=int, default=1000)
+
+    create = commands.add_parser("create", help="buffered database writes "
+                                                "against per entry writes")
+    create.add_argument("--rows", type=int, default=100000)
+    create.add_argument("--directory", default=None,
+                        help="directory to write into (default: temporary)")
+
+    parse = commands.add_parser("parser", help="exit time file parsing "
+                                               "against the legacy parser")
+    parse.add_argument("--copies", type=int, default=50,
+                       help="copies of each type_a data file")
+
+    scoring = commands.add_parser("scoring", help="ranking all fructose "
+                                                  "triplets at once against "
+                                                  "finding them one by one")
+    scoring.add_argument("--rows", type=int, default=100000)
+
+    latency = commands.add_parser("latency", help="overlapped reads against "
+                                                  "serial reads of slow files")
+    latency.add_argument("--latency", type=float, default=0.005,
+                         help="seconds every file read stalls for")
+    latency.add_argument("--concurrency", type=int, default=64)
+
+    partition = commands.add_parser("partition", help="single pass "
+                                                      "sanitizing against the "
+                                                      "legacy sanitize and "
+                                                      "diff")
+    partition.add_argument("--rows", type=int, default=1000000)
+    partition.add_argument("--legacy-rows", type=int, default=10000)
+
+    interning = commands.add_parser("interning", help="shared parameter "
+                                                      "values against "
+                                                      "copies per entry")
+    interning.add_argument("--rows", type=int, default=200000)
+
+    tree = commands.add_parser("tree", help="generate a synthetic results "
+                                            "tree")
+    tree.add_argument("directory", help="directory to generate the tree in")
+    addTreeArguments(tree)
+
+    suite = commands.add_parser("suite", help="timed scenarios of every "
+                                              "stage, saved as JSON")
+    suite.add_argument("--results", default=None,
+                       help="results tree to use instead of generating one")
+    addTreeArguments(suite)
+    suite.add_argument("--repeat", type=int, default=3,
+                       help="runs per scenario, the fastest is kept")
+    suite.add_argument("--workers", type=int, default=1)
+    suite.add_argument("--queries", type=int, default=1000)
+    suite.add_argument("--output", default="benchmark.json",
+                       help="path to save the report to")
+    suite.add_argument("--compare", default=None,
+                       help="path to a previous report to compare against")
+
+    args = parser.parse_args()
+    if args.benchmark == "triplets":
+        print("{:>10} {:>14} {:>14} {:>10}".format("rows", "legacy (s)",
+                                                   "search (s)", "speedup"))
+        for size, legacyTime, searchTime in \
+                benchmarkTriplets(args.rows, args.legacy_rows):
+            legacy = "{:.3f}".format(abs(legacyTime))
+            if legacyTime < 0:
+                legacy = "~" + legacy
+            print("{:>10} {:>14} {:>14.3f} {:>9.0f}x".format(
+                size, legacy, searchTime, abs(legacyTime) / searchTime))
+        print("(~ marks legacy times extrapolated quadratically)")
+    elif args.benchmark == "create":
+        legacyRate, bufferedRate = benchmarkCreate(args.rows, args.directory)
+        print("{:>10} {:>18} {:>18} {:>10}".format("rows", "legacy (rows/s)",
+                                                   "buffered (rows/s)",
+                                                   "speedup"))
+        print("{:>10} {:>18.0f} {:>18.0f} {:>9.1f}x".format(
+            args.rows, legacyRate, bufferedRate, bufferedRate / legacyRate))
+    elif args.benchmark == "parser":
+        files, legacyRate, currentRate = benchmarkParser(args.copies)
+        print("{:>10} {:>18} {:>18} {:>10}".format("files",
+                                                   "legacy (files/s)",
+                                                   "parser (files/s)",
+                                                   "speedup"))
+        print("{:>10} {:>18.0f} {:>18.0f} {:>9.1f}x".format(
+            files, legacyRate, currentRate, currentRate / legacyRate))
+    elif args.benchmark == "scoring":
+        triplets, findTime, rankTime, scoreRate = benchmarkScoring(args.rows)
+        print("{:>10} {:>14} {:>14} {:>10}".format("triplets", "find (s)",
+                                                   "rank (s)", "speedup"))
+        print("{:>10} {:>14.3f} {:>14.3f} {:>9.1f}x".format(
+            triplets, findTime, rankTime, findTime / rankTime))
+        print("grid scoring: {:.0f} candidates/s".format(scoreRate))
+    elif args.benchmark == "latency":
+        serialRate, asyncRate = benchmarkLatency(args.latency,
+                                                 args.concurrency)
+        print("{:>10} {:>18} {:>18} {:>10}".format("latency",
+                                                   "serial (files/s)",
+                                                   "async (files/s)",
+                                                   "speedup"))
+        print("{:>9.0f}ms {:>18.0f} {:>18.0f} {:>9.1f}x".format(
+            args.latency * 1000, serialRate, asyncRate,
+            asyncRate / serialRate))
+    elif args.benchmark == "partition":
+        print("{:>10} {:>14} {:>14} {:>14}".format("rows", "legacy (s)",
+                                                   "partition (s)",
+                                                   "us per row"))
+        for size, legacyTime, partitionTime in \
+                benchmarkPartition(args.rows, args.legacy_rows):
+            legacy = "-" if legacyTime is None else \
+                "{:.3f}".format(legacyTime)
+            print("{:>10} {:>14} {:>14.3f} {:>14.3f}".format(
+                size, legacy, partitionTime, partitionTime / size * 1e6))
+        print("(a constant time per row shows the partition is linear)")
+    elif args.benchmark == "interning":
+        results = benchmarkInterning(args.rows)
+        print("{:>10} {:>12} {:>12} {:>12}".format("values", "read (s)",
+                                                   "rank (s)", "memory (MiB)"))
+        for name in ("copied", "interned"):
+            result = results[name]
+            print("{:>10} {:>12.3f} {:>12.3f} {:>12.1f}".format(
+                name, result["READ"], result["RANK"], result["MIB"]))
+    elif args.benchmark == "tree":
+        counts = generateResultsTree(args.directory, args.folders, args.files,
+                                     args.worms, args.corrupt,
+                                     args.incomplete, not args.no_extras,
+                                     args.seed)
+        print("Generated {FOLDERS} folders holding {FILES} data files "
+              "({CORRUPT} corrupt, {INCOMPLETE} incomplete)".format(**counts))
+    elif args.benchmark == "suite":
+        runSuite(args)
+
+
+def addTreeArguments(parser):
+    """
+    Adds the arguments of generateResultsTree to a command.
+
+    :param parser: The parser of the command.
+    """
+    parser.add_argument("--folders", type=int, default=40)
+    parser.add_argument("--files", type=int, default=50,
+                        help="data files per folder")
+    parser.add_argument("--worms", type=int, default=100,
+                        help="worms per data file")
+    parser.add_argument("--corrupt", type=float, default=0.01,
+                        help="fraction of corrupt data files")
+    parser.add_argument("--incomplete", type=float, default=0.02,
+                        help="fraction of data files missing worms")
+    parser.add_argument("--no-extras", action="store_true",
+                        help="only generate the exit time data files")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def runSuite(args):
+    """
+    Runs the timed scenarios on a results tree, generated unless one is
+    given, prints and saves the report and compares it against a previous
+    one if asked to.
+
+    :param args: The parsed arguments of the suite command.
+    """
+    parameters = {key: getattr(args, key)
+                  for key in ("results", "folders", "files", "worms",
+                              "corrupt", "incomplete", "no_extras", "seed",
+                              "repeat", "workers", "queries")}
+
+    with tempfile.TemporaryDirectory() as tempDir:
+        resultsPath = args.results
+        if resultsPath is None:
+            resultsPath = os.path.join(tempDir, "results")
+            parameters.update(generateResultsTree(
+                resultsPath, args.folders, args.files, args.worms,
+                args.corrupt, args.incomplete, not args.no_extras,
+                args.seed))
+        timings = runScenarios(resultsPath, args.repeat, args.workers,
+                               args.queries, args.seed)
+
+    report = createReport(timings, parameters)
+    writeReport(args.output, report)
+
+    print("{:>10} {:>12} {:>10} {:>14}".format("scenario", "seconds",
+                                               "items", "items/s"))
+    for scenario in SCENARIOS:
+        timing = timings[scenario]
+        print("{:>10} {:>12.4f} {:>10} {:>14.0f}".format(
+            scenario, timing["SECONDS"], timing["ITEMS"],
+            timing["RATE"] or 0))
+    print("Saved the report to {}".format(args.output))
+
+    if args.compare:
+        print()
+        print("{:>10} {:>12} {:>12} {:>10}".format("scenario", "baseline (s)",
+                                                   "current (s)", "speedup"))
+        for scenario, old, new, speedup in \
+                compareReports(report, readReport(args.compare)):
+            print("{:>10} {:>12.4f} {:>12.4f} {:>9.2f}x".format(
+                scenario, old, new, speedup))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""
+Benchmarks comparing parts of the cleaner module against the legacy
+implementations they replaced (see legacy), on synthetic data generated on
+the fly so that no large fixtures are needed.
+"""
+import contextlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sweeping.cleaner import Controller, Database, Extractor, \
+    TripletSearch, valueNumbers, valueStrings
+from sweeping.benchmark.generator import SETTINGS_PATH, RESULTS_PATH, \
+    generateSyntheticDatabase, generateParserCorpus
+from sweeping.benchmark.legacy import legacyFructoseTriplets, legacyCreate, \
+    legacyExtractDataFromFile, legacySanitizeAndDiff
+
+
+def benchmarkTriplets(rows, legacyRows):
+    """
+    Times the fructose triplet search on synthetic databases of growing
+    size against the legacy implementation. The legacy implementation is
+    quadratic so it is only timed up to legacyRows, beyond which its time is
+    extrapolated from the largest measurement.
+
+    :param rows: The number of entries of the largest database.
+    :param legacyRows: The number of entries of the largest database that
+    the legacy implementation is timed on.
+    :return: A list containing a (rows, legacy seconds, search seconds)
+    tuple per size, where extrapolated legacy times are negative.
+    """
+    controller = Controller(SETTINGS_PATH)
+    sizes = []
+    size = 1000
+    while size < rows:
+        sizes.append(size)
+        size *= 10
+    sizes.append(rows)
+
+    timings = []
+    legacyTiming = None
+    for size in sizes:
+        database = generateSyntheticDatabase(size)
+
+        start = time.perf_counter()
+        found = dict(controller.findFructoseTriplets(database))
+        searchTime = time.perf_counter() - start
+
+        if size <= legacyRows:
+            start = time.perf_counter()
+            legacy = legacyFructoseTriplets(controller, database)
+            legacyTime = time.perf_counter() - start
+            legacyTiming = (size, legacyTime)
+            if legacy != found:
+                raise AssertionError("Triplets differ for {} rows"
+                                     .format(size))
+        else:
+            measuredSize, measuredTime = legacyTiming
+            legacyTime = -measuredTime * (size / measuredSize)**2
+
+        timings.append((size, legacyTime, searchTime))
+    return timings
+
+
+def benchmarkCreate(rows, directory=None):
+    """
+    Times writing a synthetic database with the legacy per entry writes
+    against the buffered writes of Database.create.
+
+    :param rows: The number of entries to write.
+    :param directory: The directory to write into (e.g. a network mount),
+    defaults to a temporary directory.
+    :return: A tuple of the legacy and buffered rates in rows per second.
+    """
+    database = Database()
+    entries = generateSyntheticDatabase(rows)
+
+    with tempfile.TemporaryDirectory(dir=directory) as tempDir:
+        legacyPath = os.path.join(tempDir, "legacy.txt")
+        bufferedPath = os.path.join(tempDir, "buffered.txt")
+
+        start = time.perf_counter()
+        legacyCreate(database, legacyPath, entries)
+        legacyTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        database.create(bufferedPath, entries)
+        bufferedTime = time.perf_counter() - start
+
+        with open(legacyPath, "r") as f1, open(bufferedPath, "r") as f2:
+            if f1.read() != f2.read():
+                raise AssertionError("Databases differ for {} rows"
+                                     .format(rows))
+
+    return rows / legacyTime, rows / bufferedTime
+
+
+def benchmarkParser(copies):
+    """
+    Times parsing a corpus of exit time data files with the legacy line by
+    line parser against the parser of the Extractor.
+
+    :param copies: The number of copies of each type_a data file.
+    :return: A tuple of the number of files and the legacy and current
+    rates in files per second.
+    """
+    extractor = Extractor()
+
+    with tempfile.TemporaryDirectory() as tempDir:
+        paths = generateParserCorpus(tempDir, copies)
+
+        def parseAll(parse):
+            start = time.perf_counter()
+            results = []
+            for path in paths:
+                try:
+                    results.append(parse(path))
+                except ValueError as e:
+                    results.append(str(e))
+            return results, time.perf_counter() - start
+
+        def parse(path):
+            data = extractor._extractDataFromFile(path)
+            return int(data["N"]), int(data["N_OUT"])
+
+        legacy, legacyTime = parseAll(legacyExtractDataFromFile)
+        current, currentTime = parseAll(parse)
+        if legacy != current:
+            raise AssertionError("Parsers disagree on the corpus")
+
+    return len(paths), len(paths) / legacyTime, len(paths) / currentTime
+
+
+def benchmarkScoring(rows):
+    """
+    Times finding and scoring every fructose triplet of a synthetic database
+    one by one against ranking them all at once, then times scoring a grid
+    of a million candidates.
+
+    :param rows: The number of entries of the database.
+    :return: A tuple of the number of triplets, the seconds taken by
+    findFructoseTriplets and rankFructoseTriplets, and the number of grid
+    candidates scored per second.
+    """
+    controller = Controller(SETTINGS_PATH)
+    database = generateSyntheticDatabase(rows)
+
+    start = time.perf_counter()
+    triplets = sum(1 for triplet in controller.findFructoseTriplets(database))
+    findTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    controller.rankFructoseTriplets(database)
+    rankTime = time.perf_counter() - start
+
+    search = TripletSearch(database)
+    ashes = sorted({entry["ASH"] for entry in database})
+    awas = sorted({entry["AWA"] for entry in database})
+    grid = [(oneMolar, ash, awa) for oneMolar in range(1, 26)
+            for ash in ashes for awa in awas]
+    grid *= 1000000 // len(grid) + 1
+    oneMolars, gridAshes, gridAwas = zip(*grid)
+
+    start = time.perf_counter()
+    search.score(oneMolars, gridAshes, gridAwas, controller.molarToExitUni,
+                 controller.molarToExitMulti)
+    scoreRate = len(grid) / (time.perf_counter() - start)
+    return triplets, findTime, rankTime, scoreRate
+
+
+class LatentExtractor(Extractor):
+    """
+    An extractor whose file reads stall for a fixed time first, simulating
+    the latency of a remote file system.
+    """
+
+    def __init__(self, latency):
+        """
+        A simple constructor.
+
+        :param latency: The seconds every file read stalls for.
+        """
+        super().__init__()
+        self.latency = latency
+
+    def _extractDataFromFile(self, filePath):
+        """
+        Stalls then extracts data like Extractor._extractDataFromFile.
+
+        :param filePath: The path of the data file.
+        :return: A dictionary containing the data extracted from the file
+        contents.
+        """
+        time.sleep(self.latency)
+        return super()._extractDataFromFile(filePath)
+
+
+def benchmarkLatency(latency, concurrency):
+    """
+    Times extracting the type_a test results serially against overlapping
+    the reads with extractAllDataAsync, with every read stalling first.
+
+    :param latency: The seconds every file read stalls for.
+    :param concurrency: The number of reads overlapped.
+    :return: A tuple of the serial and overlapped rates in files per second.
+    """
+    extractor = LatentExtractor(latency)
+    with tempfile.TemporaryDirectory() as tempDir:
+        logPath = os.path.join(tempDir, "log.txt")
+        # Silences the warnings about the corrupt files of type_a
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            serial = extractor.extractAllData(RESULTS_PATH, logPath)
+            serialTime = time.perf_counter() - start
+            files = len(extractor._listAllFilePaths(RESULTS_PATH))
+
+            overlapped = extractor.extractAllDataAsync(RESULTS_PATH, logPath,
+                                                       concurrency)
+            if serial != overlapped:
+                raise AssertionError("Extracted data differs")
+
+    return files / serialTime, extractor.filesPerSecond
+
+
+def benchmarkPartition(rows, legacyRows):
+    """
+    Times splitting synthetic databases of growing size into sanitized and
+    ignored entries, where every tenth entry is missing worms, against the
+    legacy sanitize and diff. The legacy implementation is quadratic so it
+    is only timed up to legacyRows.
+
+    :param rows: The number of entries of the largest database.
+    :param legacyRows: The number of entries of the largest database that
+    the legacy implementation is timed on.
+    :return: A list containing a (rows, legacy seconds or None, partition
+    seconds) tuple per size.
+    """
+    database = Database()
+    sizes = []
+    size = 1000
+    while size < rows:
+        sizes.append(size)
+        size *= 10
+    sizes.append(rows)
+
+    timings = []
+    for size in sizes:
+        entries = generateSyntheticDatabase(size)
+        for entry in entries[::10]:
+            entry["N"] = "37"
+
+        start = time.perf_counter()
+        partitioned = database.partition(entries)
+        partitionTime = time.perf_counter() - start
+
+        legacyTime = None
+        if size <= legacyRows:
+            start = time.perf_counter()
+            legacy = legacySanitizeAndDiff(database, entries)
+            legacyTime = time.perf_counter() - start
+            if legacy != partitioned:
+                raise AssertionError("Partitions differ for {} rows"
+                                     .format(size))
+
+        timings.append((size, legacyTime, partitionTime))
+    return timings
+
+
+def benchmarkInterning(rows):
+    """
+    Times reading a synthetic database and ranking its fructose triplets
+    with every entry holding its own copies of the values against sharing
+    the parameter values (see ValuePool) once read, and measures the memory
+    the entries take up either way.
+
+    :param rows: The number of entries of the database.
+    :return: A dictionary mapping "copied" and "interned" each to a
+    dictionary of the "READ" seconds (including sharing the values), the
+    "RANK" seconds and the "MIB" taken up by the entries.
+    """
+    controller = Controller(SETTINGS_PATH)
+    database = controller.database
+
+    def read(databasePath, interned):
+        entries = database.read(databasePath)
+        if interned:
+            for entry in entries:
+                valueStrings.internEntry(entry)
+        return entries
+
+    results = {}
+    ranked = {}
+    with tempfile.TemporaryDirectory() as tempDir:
+        databasePath = os.path.join(tempDir, "database.txt")
+        database.create(databasePath, generateSyntheticDatabase(rows))
+
+        for name in ("copied", "interned"):
+            # Both start from empty pools so neither reuses the other's
+            valueStrings.clear()
+            valueNumbers.clear()
+
+            start = time.perf_counter()
+            entries = read(databasePath, name == "interned")
+            readTime = time.perf_counter() - start
+
+            start = time.perf_counter()
+            ranked[name] = controller.rankFructoseTriplets(entries)
+            rankTime = time.perf_counter() - start
+            del entries
+
+            tracemalloc.start()
+            entries = read(databasePath, name == "interned")
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del entries
+
+            results[name] = {"READ": readTime, "RANK": rankTime,
+                             "MIB": memory / 2**20}
+
+    if ranked["copied"] != ranked["interned"]:
+        raise AssertionError("Triplets differ for {} rows".format(rows))
+    return results
@@ -0,0 +1,186 @@
+"""
+Generators of synthetic data shaped like the data of the simulator, so
+that the cleaner module can be measured at any scale without large
+fixtures.
+"""
+import datetime
+import glob
+import math
+import os
+import random
+import shutil
+
+from sweeping.cleaner import Database
+
+
+# The settings and the test results of the repository
+SETTINGS_PATH = os.path.join(os.path.dirname(__file__), "..", "settings.ini")
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "test",
+                            "results", "type_a")
+
+
+def generateSyntheticDatabase(rows, values=50, seed=0):
+    """
+    Generates a sorted database of random but realistic looking entries.
+    The fructose, ASH and AWA values are drawn from grids similar to the
+    ones swept by the simulator so that plenty of fructose triplets exist.
+
+    :param rows: The number of entries to generate.
+    :param values: The number of distinct ASH (and AWA) values.
+    :param seed: The seed of the random number generator.
+    :return: A list containing the sorted database entries as dictionaries.
+    """
+    rng = random.Random(seed)
+    frs = [str(fr) for fr in range(5, 101, 5)]
+    ashes = ["{:.2f}".format(0.2 + 0.01*i) for i in range(values)]
+    awas = ["{:.2f}".format(-0.3 - 0.05*i) for i in range(values)]
+
+    entries = []
+    for i in range(rows):
+        fr = rng.choice(frs)
+        ash = rng.choice(ashes)
+        awa = rng.choice(awas)
+        multi = rng.choice("01")
+        wormExitedCount = rng.randint(0, 100)
+        entries.append({
+            "FR":       fr,
+            "ASH":      ash,
+            "AWA":      awa,
+            "N":        "100",
+            "N_OUT":    str(wormExitedCount),
+            "EXIT":     str(wormExitedCount / 100.0),
+            "MULTI":    multi,
+            "DATE":     "16Aug",
+            "PATH":     "synthetic/16Aug_{}_{}/exit_time_raw_output_"
+                        "{}&{}&{}.csv".format("um"[int(multi)], fr,
+                                              multi, awa, ash)
+        })
+    return Database().sort(entries)
+
+
+def generateParserCorpus(directory, copies):
+    """
+    Generates a corpus of exit time data files by copying every exit time
+    data file of the type_a test results the given number of times.
+
+    :param directory: The directory to generate the corpus in.
+    :param copies: The number of copies of each data file.
+    :return: A list containing the paths of the generated data files.
+    """
+    sources = sorted(glob.glob(os.path.join(RESULTS_PATH, "*",
+                                            "exit_time_raw_output_*.csv")))
+    paths = []
+    for copy in range(copies):
+        for i, source in enumerate(sources):
+            path = os.path.join(directory, "{}_{}.csv".format(copy, i))
+            shutil.copyfile(source, path)
+            paths.append(path)
+    return paths
+
+
+def generateResultsTree(directory, folders=10, files=20, worms=100,
+                        corrupt=0.01, incomplete=0.02, extras=True, seed=0):
+    """
+    Generates a results tree laid out like the output of the simulator, with
+    one "<date>_<u|m>_<fructose>" folder per simulation batch holding an
+    "exit_time_raw_output_<multi>&<awa>&<ash>.csv" file per simulation.
+
+    :param directory: The directory to generate the tree in.
+    :param folders: The number of folders, alternating between uni and
+    multi simulations.
+    :param files: The number of exit time data files per folder.
+    :param worms: The number of worms (i.e. runs) per data file.
+    :param corrupt: The fraction of data files with a line that cannot be
+    parsed, like the ones left behind by interrupted simulations.
+    :param incomplete: The fraction of data files missing some of their
+    worms, which sanitizing leaves out.
+    :param extras: Whether to generate the other files the simulator writes
+    next to the data files (in_spot and processed outputs, .sim and seeds
+    files) that scanning has to skip and metrics are extracted from.
+    :param seed: The seed of the random number generator.
+    :return: A dictionary of the number of "FOLDERS", "FILES", "CORRUPT"
+    and "INCOMPLETE" data files generated.
+    """
+    rng = random.Random(seed)
+    frs = list(range(5, 101, 5))
+
+    # Every folder sweeps a random part of the same ASH by AWA grid
+    side = math.isqrt(max(files - 1, 0)) + 1
+    ashes = ["{:.2f}".format(0.2 + 0.01*i) for i in range(side)]
+    awas = ["{:.2f}".format(-0.3 - 0.05*i) for i in range(side)]
+    grid = [(ash, awa) for ash in ashes for awa in awas]
+    firstDate = datetime.date(2016, 8, 16)
+    counts = {"FOLDERS": folders, "FILES": 0, "CORRUPT": 0, "INCOMPLETE": 0}
+
+    for i in range(folders):
+        # Every fructose concentration is run uni and multi once per date
+        multi = i % 2
+        fr = frs[i // 2 % len(frs)]
+        date = firstDate + datetime.timedelta(days=i // (2*len(frs)))
+        folder = "{}_{}_{}".format(date.strftime("%d%b"), "um"[multi], fr)
+        folderPath = os.path.join(directory, folder)
+        os.makedirs(folderPath)
+
+        if extras:
+            with open(os.path.join(folderPath, folder + ".sim"), "w") as file:
+                file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                           '<Simulation version="2.19">\n'
+                           '<Outputs>\n'
+                           '<Output name="in_spot" '
+                           'type="SimpleChemotaxisCircle" />\n'
+                           '<Output name="exit_time" '
+                           'type="TimePointCrossingCircle" />\n'
+                           '</Outputs>\n'
+                           '</Simulation>\n')
+            with open(os.path.join(folderPath, "seeds_" + folder + ".txt"),
+                      "w") as file:
+                file.write("Using 20 threads with seed {}\n"
+                           .format(rng.getrandbits(40)))
+
+        for ash, awa in rng.sample(grid, files):
+            name = "{}&{}&{}".format(multi, awa, ash)
+            runs = worms
+            if rng.random() < incomplete:
+                runs = rng.randrange(worms)
+                counts["INCOMPLETE"] += 1
+
+            # Worms exit after a few hundred seconds, if at all
+            exitChance = rng.random()
+            lines = ["Run,TimePointCrossingCircle\n"]
+            for run in range(1, runs + 1):
+                if rng.random() < exitChance:
+                    lines.append("{},{:.4f}\n".format(
+                        run, rng.uniform(300, 900)))
+                else:
+                    lines.append("{},-1.0\n".format(run))
+            if runs and rng.random() < corrupt:
+                line = rng.randrange(1, runs + 1)
+                lines[line] = "{:.4f}          <---- What is happening from " \
+                              "here forth?\n".format(rng.uniform(0, 10))
+                counts["CORRUPT"] += 1
+
+            dataPath = os.path.join(folderPath,
+                                    "exit_time_raw_output_" + name + ".csv")
+            with open(dataPath, "w") as file:
+                file.writelines(lines)
+            counts["FILES"] += 1
+
+            if extras:
+                with open(os.path.join(folderPath, "in_spot_raw_output_" +
+                                       name + ".csv"), "w") as file:
+                    file.write("Run,SimpleChemotaxisCircle\n")
+                    file.writelines("{},0.0\n".format(run)
+                                    for run in range(1, runs + 1))
+                with open(os.path.join(folderPath, "exit_time_processed_"
+                                       "output_" + name + ".txt"),
+                          "w") as file:
+                    file.write("The average time of exit and std is "
+                               "{:.2f},{:.2f}\n".format(
+                                   rng.uniform(300, 900),
+                                   rng.uniform(0, 300)))
+                with open(os.path.join(folderPath, "in_spot_processed_"
+                                       "output_" + name + ".txt"),
+                          "w") as file:
+                    file.write("The chemotaxis index is {:.2f}\n".format(
+                        rng.uniform(-1, 1)))
+    return counts
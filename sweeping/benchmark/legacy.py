@@ -0,0 +1,116 @@
+"""
+The original implementations of parts of the cleaner module, kept as a
+reference for correctness and speed comparisons.
+"""
+
+
+def legacyFructoseTriplets(controller, database):
+    """
+    The fructose triplet search as it was originally implemented, where
+    every database entry issues six linear scans over the whole database.
+    Kept as a reference for correctness and speed comparisons.
+
+    :param controller: The controller used for sorting and scoring.
+    :param database: A list containing database entries as dictionaries.
+    :return: A dictionary mapping the file name of each triplet to a list
+    containing its sorted entries.
+    """
+    def scan(query):
+        return [entry for entry in database
+                if all(float(query[key]) == float(entry[key])
+                       for key in query)]
+
+    molarToExitUni = {"2": 35, "3": 7, "4": 0}
+    molarToExitMulti = {"2": 80, "3": 50, "4": 0}
+
+    triplets = {}
+    for entry in database:
+        ash = entry["ASH"]
+        awa = entry["AWA"]
+        oneMolar = int(float(entry["FR"]) / 2)
+        if oneMolar*4 > 100:
+            continue
+
+        molarToMatchUni = {}
+        molarToMatchMulti = {}
+        for molar in ("2", "3", "4"):
+            fr = str(oneMolar*int(molar))
+            molarToMatchUni[molar] = scan({"FR": fr, "ASH": ash,
+                                           "MULTI": "0"})
+            molarToMatchMulti[molar] = scan({"FR": fr, "ASH": ash,
+                                             "AWA": awa, "MULTI": "1"})
+
+        if all(molarToMatchMulti.values()):
+            data = molarToMatchUni["2"] + molarToMatchMulti["2"]
+            data = controller.database.sort(data)
+            fitUni = controller.computeGoodnessOfFit(molarToMatchUni,
+                                                     molarToExitUni)
+            fitMulti = controller.computeGoodnessOfFit(molarToMatchUni,
+                                                       molarToExitMulti)
+            fitness = str(int(fitUni + fitMulti))
+            name = "{}_({}_{}_{}).txt".format(fitness, oneMolar, ash, awa)
+            triplets[name] = data
+    return triplets
+
+
+def legacyCreate(database, databasePath, entries):
+    """
+    Database creation as it was originally implemented, where the file is
+    opened and closed again for every single entry. Kept as a reference for
+    speed comparisons.
+
+    :param database: The database whose format is used.
+    :param databasePath: The path to the database file.
+    :param entries: A list containing the entries as dictionaries.
+    """
+    with open(databasePath, "w") as file:
+        file.write(database.template.format(*database.dataOrder))
+
+    for entry in entries:
+        orderedData = [entry[order] for order in database.dataOrder]
+        with open(databasePath, "a") as file:
+            file.write(database.template.format(*orderedData))
+
+
+def legacyExtractDataFromFile(filePath):
+    """
+    Data file parsing as it was originally implemented, where every line is
+    stripped, split and its exit time converted to a float. Kept as a
+    reference for correctness and speed comparisons.
+
+    :param filePath: The path of the data file.
+    :return: A tuple of the number of worms and those that exited.
+    """
+    with open(filePath, "r") as file:
+        file.readline()
+        wormCount = 0
+        wormExitedCount = 0
+
+        for i, entry in enumerate(file, start=1):
+            if not entry.strip():
+                continue
+            try:
+                wormNum, timeExited = entry.rstrip().split(",")
+            except ValueError:
+                raise ValueError("Unable to parse line {} from the "
+                                 "following file: {}".format(i+1, filePath))
+            wormCount += 1
+            if float(timeExited) != -1.0:
+                wormExitedCount += 1
+
+    return wormCount, wormExitedCount
+
+
+def legacySanitizeAndDiff(database, entries):
+    """
+    Sanitizing as it was originally done, where the ignored entries are found
+    by looking every entry up in the list of sanitized ones, which makes it
+    quadratic. Kept as a reference for correctness and speed comparisons.
+
+    :param database: The database sanitizing the entries.
+    :param entries: A list containing database entries as dictionaries.
+    :return: A tuple of the sanitized and the ignored entries.
+    """
+    sanitized = [entry for entry in entries if database.isSanitary(entry)]
+    diff = [entry for entry in entries if entry not in sanitized]
+    return sanitized, diff
@@ -0,0 +1,190 @@
+"""
+Timed scenarios covering every stage of the cleaner module on a results
+tree, whose reports are saved as JSON so that the timings of different
+versions can be compared.
+"""
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+
+from sweeping.cleaner import Controller
+from sweeping.benchmark.generator import SETTINGS_PATH
+
+
+SCENARIOS = ("scan", "extract", "sanitize", "sort", "write", "read", "query",
+             "triplets")
+
+
+def runScenarios(resultsPath, repeat=3, workers=1, queries=1000, seed=0):
+    """
+    Times every stage of generating a database from a results tree and of
+    querying it, each stage being fed the output of the previous one.
+
+    :param resultsPath: The path to the results tree (see
+    generator.generateResultsTree).
+    :param repeat: The number of times each scenario is run, of which the
+    fastest is kept.
+    :param workers: The number of processes extracting the data.
+    :param queries: The number of queries run against the database.
+    :param seed: The seed of the random number generator picking queries.
+    :return: A dictionary mapping each scenario to a dictionary of its
+    "SECONDS", the number of "ITEMS" it handled and their "RATE" per second.
+    """
+    controller = Controller(SETTINGS_PATH)
+    extractor = controller.extractor
+    database = controller.database
+    timings = {}
+
+    def measure(scenario, function, count):
+        seconds, result = _best(function, repeat)
+        items = count(result)
+        timings[scenario] = {"SECONDS": seconds, "ITEMS": items,
+                             "RATE": items / seconds if seconds else None}
+        return result
+
+    with tempfile.TemporaryDirectory() as tempDir:
+        logPath = os.path.join(tempDir, "log.txt")
+        databasePath = os.path.join(tempDir, "database.txt")
+
+        measure("scan", lambda: extractor._listAllFilePaths(resultsPath),
+                len)
+
+        # Silences the warnings about the corrupt files of the tree
+        with contextlib.redirect_stdout(io.StringIO()):
+            data = measure("extract", lambda: extractor.extractAllData(
+                resultsPath, logPath, workers), len)
+
+        sanitized = measure("sanitize", lambda: database.sanitize(data), len)
+        entries = measure("sort", lambda: database.sort(sanitized), len)
+        measure("write", lambda: database.create(databasePath, entries),
+                lambda result: len(entries))
+        entries = measure("read", lambda: database.read(databasePath), len)
+
+        rng = random.Random(seed)
+        picked = [rng.choice(entries) for i in range(queries)] \
+            if entries else []
+        queryKeys = ("FR", "ASH", "AWA", "MULTI")
+        measure("query",
+                lambda: _query(database, entries, picked, queryKeys), len)
+
+        measure("triplets",
+                lambda: list(controller.findFructoseTriplets(entries)), len)
+    return timings
+
+
+def _best(function, repeat):
+    """
+    Runs a function a number of times.
+
+    :param function: The function to run, without arguments.
+    :param repeat: The number of runs.
+    :return: A tuple of the seconds taken by the fastest run and the result
+    of the last run.
+    """
+    best = None
+    for i in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def _query(database, entries, picked, keys):
+    """
+    Indexes the database then queries it for the values of picked entries.
+
+    :param database: The Database.
+    :param entries: A list containing the database entries.
+    :param picked: A list containing the entries whose values are queried.
+    :param keys: The columns queried.
+    :return: A list containing the result of each query.
+    """
+    index = database.index(entries)
+    return [database.query(index, {key: entry[key] for key in keys})
+            for entry in picked]
+
+
+def createReport(timings, parameters):
+    """
+    Bundles timings with what is needed to compare them later on.
+
+    :param timings: A dictionary of the timings of each scenario (see
+    runScenarios).
+    :param parameters: A dictionary of the parameters the tree was generated
+    and the scenarios were run with.
+    :return: A dictionary of the report.
+    """
+    return {
+        "VERSION":      _version(),
+        "DATE":         datetime.datetime.now().isoformat(timespec="seconds"),
+        "PYTHON":       platform.python_version(),
+        "PLATFORM":     platform.platform(),
+        "PARAMETERS":   parameters,
+        "SCENARIOS":    timings
+    }
+
+
+def writeReport(reportPath, report):
+    """
+    Writes a report as JSON.
+
+    :param reportPath: The path to the report file.
+    :param report: A dictionary of the report (see createReport).
+    """
+    with open(reportPath, "w") as file:
+        json.dump(report, file, indent=4, sort_keys=True)
+        file.write("\n")
+
+
+def readReport(reportPath):
+    """
+    Reads a report written by writeReport.
+
+    :param reportPath: The path to the report file.
+    :return: A dictionary of the report.
+    """
+    with open(reportPath, "r") as file:
+        return json.load(file)
+
+
+def compareReports(report, baseline):
+    """
+    Compares the timings of two reports scenario by scenario.
+
+    :param report: A dictionary of the new report.
+    :param baseline: A dictionary of the report compared against.
+    :return: A list containing a (scenario, baseline seconds, seconds,
+    speedup) tuple per scenario present in both reports.
+    """
+    comparison = []
+    for scenario in SCENARIOS:
+        new = report["SCENARIOS"].get(scenario)
+        old = baseline["SCENARIOS"].get(scenario)
+        if new and old:
+            comparison.append((scenario, old["SECONDS"], new["SECONDS"],
+                               old["SECONDS"] / new["SECONDS"]))
+    return comparison
+
+
+def _version():
+    """
+    Describes the checked out version of the repository.
+
+    :return: The output of git describe, or None outside of a git checkout.
+    """
+    try:
+        output = subprocess.run(["git", "describe", "--always", "--dirty"],
+                                cwd=os.path.dirname(__file__),
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.decode().strip()
@@ -11,64 +11,861 @@ __author__ = "Othman Alikhan"
 __email__ = "sc14omsa@leeds.ac.uk"
 __date__ = "2016-08-15"
 """
+import array
+import collections.abc
+import copy
+import cProfile
 import csv
+import fnmatch
+import functools
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import mmap
+import operator
 import os
+import pickle
+import re
+import struct
+import sys
 import time
 import datetime
 import configparser
 
+# Modules only some commands need (e.g. asyncio, concurrent.futures and
+# sqlite3) are imported where they are used instead, as they take longer to
+# import than the rest of this module together (see cli)
+
+try:
+    import resource
+except ImportError:     # Not available on Windows
+    resource = None
+
+
+class Instrumentation:
+    """
+    Responsible for recording where the time of a run goes. Methods marked
+    with stage record their wall time and number of calls, and counters
+    (e.g. bytes read) are added to from within the hot paths. Nothing is
+    recorded unless enabled, in which case an optional cProfile profile is
+    recorded as well.
+
+    Only the calls made in this process are recorded, not the ones made in
+    the worker processes of a pool.
+    """
+
+    def __init__(self):
+        """
+        A simple constructor.
+        """
+        self.enabled = False
+        self._stages = {}       # Maps a stage to its [calls, seconds]
+        self._counters = {}     # Maps a counter to its [total, first, last]
+        self._started = None
+        self._profile = None
+
+    def start(self, profile=False):
+        """
+        Enables recording, starting from scratch.
+
+        :param profile: Whether to record a cProfile profile as well.
+        """
+        self._stages = {}
+        self._counters = {}
+        self._started = time.perf_counter()
+        self._profile = cProfile.Profile() if profile else None
+        self.enabled = True
+        if self._profile is not None:
+            self._profile.enable()
+
+    def stop(self):
+        """
+        Disables recording.
+        """
+        if self._profile is not None:
+            self._profile.disable()
+        self.enabled = False
+
+    def stage(self, function):
+        """
+        A decorator recording the wall time and calls of a function.
+
+        :param function: The function to record, named after its qualified
+        name.
+        :return: The wrapped function.
+        """
+        name = function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stage = self._stages.setdefault(name, [0, 0.0])
+                stage[0] += 1
+                stage[1] += time.perf_counter() - start
+        return wrapper
+
+    def count(self, counter, amount=1):
+        """
+        Adds to a counter, remembering when it was first and last added to.
+
+        :param counter: The name of the counter.
+        :param amount: The amount to add.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        record = self._counters.get(counter)
+        if record is None:
+            self._counters[counter] = [amount, now, now]
+        else:
+            record[0] += amount
+            record[2] = now
+
+    def report(self):
+        """
+        Summarizes everything recorded so far.
+
+        :return: A dictionary of the "SECONDS" since recording started, the
+        "CALLS" and "SECONDS" of every stage, the "FILES" extracted and
+        "BYTES" read along with the "FILES_PER_SECOND" while extracting, and
+        the "PEAK_MEMORY" in bytes of this process and of its worker
+        processes (None where unknown).
+        """
+        files, firstFile, lastFile = self._counters.get("FILES",
+                                                        [0, 0.0, 0.0])
+        filesPerSecond = None
+        if lastFile > firstFile:
+            filesPerSecond = files / (lastFile - firstFile)
+
+        return {
+            "SECONDS":              time.perf_counter() - self._started
+                                    if self._started is not None else 0.0,
+            "STAGES":               {name: {"CALLS": calls,
+                                            "SECONDS": seconds}
+                                     for name, (calls, seconds)
+                                     in sorted(self._stages.items())},
+            "FILES":                files,
+            "BYTES":                self._counters.get("BYTES", [0])[0],
+            "FILES_PER_SECOND":     filesPerSecond,
+            "PEAK_MEMORY":          self._peakMemory("RUSAGE_SELF"),
+            "PEAK_MEMORY_WORKERS":  self._peakMemory("RUSAGE_CHILDREN")
+        }
+
+    def writeReport(self, reportPath, profilePath=None):
+        """
+        Writes the report as JSON and the cProfile profile if one was
+        recorded.
+
+        :param reportPath: The path to the report file.
+        :param profilePath: The path to the profile file (readable with the
+        pstats module), or None to not write it.
+        """
+        with open(reportPath, "w") as file:
+            json.dump(self.report(), file, indent=4)
+            file.write("\n")
+        if profilePath and self._profile is not None:
+            self._profile.dump_stats(profilePath)
+
+    def _peakMemory(self, who):
+        """
+        Finds the peak resident memory of processes.
+
+        :param who: The name of the resource module constant selecting the
+        processes.
+        :return: The peak memory in bytes, or None if unknown.
+        """
+        if resource is None:
+            return None
+        peak = resource.getrusage(getattr(resource, who)).ru_maxrss
+        # Reported in kilobytes everywhere but on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Records the stages of every run once enabled (see Controller)
+instrumentation = Instrumentation()
+
+
+class ValuePool(dict):
+    """
+    Responsible for sharing the values of the parameter columns, of which
+    there are only a few dozen distinct ones however many entries there
+    are. Looking a value up (e.g. pool["0.26"]) gives what it maps to,
+    computed the first time the value is seen only.
+
+    Only values of the parameter columns are meant to be looked up since
+    they are never forgotten, whereas the distinct values of other columns
+    (e.g. DATE) keep growing as simulations are run.
+    """
+
+    # The columns whose values are shared, which are the ones parsed into
+    # numbers
+    columns = ("FR", "ASH", "AWA", "MULTI")
+
+    def __init__(self, parse=None):
+        """
+        A simple constructor.
+
+        :param parse: The function turning a value into what it maps to
+        (e.g. float), or None to map every value to one canonical string
+        equal to it.
+        """
+        super().__init__()
+        self.parse = parse
+
+    def __missing__(self, value):
+        """
+        :param value: A value seen for the first time, as a string.
+        :return: What the value maps to.
+        """
+        mapped = self[value] = value if self.parse is None \
+            else self.parse(value)
+        return mapped
+
+    def internEntry(self, entry):
+        """
+        Replaces the values of the parameter columns of an entry by what
+        they map to (i.e. their canonical strings).
+
+        :param entry: A dictionary containing the data for a single row.
+        :return: The same dictionary.
+        """
+        for column in self.columns:
+            if column in entry:
+                entry[column] = self[entry[column]]
+        return entry
+
+
+# Share the parameter values so entries hold the same strings rather than
+# copies and each is parsed only once. Strings are only shared where
+# building an entry dwarfs looking its values up (extraction and the SQLite
+# backend), text databases being read faster without (see the interning
+# benchmark)
+valueStrings = ValuePool()
+valueNumbers = ValuePool(float)
+
 
 class Extractor:
     """
     Responsible for extracting data from file contents and their paths.
     """
 
-    def extractAllData(self, dataDirPath, logPath):
+    # The columns holding the metrics of the other outputs of a simulation
+    # (see _extractDataFromOutputs), which are the mean of the per run values
+    # of the raw outputs and the values summarized in the processed outputs,
+    # per type of output
+    rawColumns = {"SimpleChemotaxisCircle": "IN_SPOT"}
+    processedColumns = \
+    {
+        "SimpleChemotaxisCircle":   ("CI",),
+        "TimePointCrossingCircle":  ("EXIT_MEAN", "EXIT_STD")
+    }
+    metricColumns = ["IN_SPOT", "CI", "EXIT_MEAN", "EXIT_STD"]
+
+    # The columns holding the metadata of the folder of a simulation (see
+    # _readFolder), and the settings of the .sim file they are read from
+    metadataColumns = ["SEED", "THREADS", "WORMS", "END_TIME", "STEP_SIZE"]
+    simSettings = \
+    {
+        "numberOfSimulations":  "WORMS",
+        "endTime":              "END_TIME",
+        "stepSize":             "STEP_SIZE"
+    }
+
+    # The single line of a seeds file, e.g. "Using 20 threads with seed 42"
+    _seedsLine = re.compile(r"Using ([0-9]+) threads with seed (-?[0-9]+)")
+
+    # The columns known from the path of a data file alone, which queries
+    # can filter on before the file is read
+    pathColumns = ("FR", "MULTI", "ASH", "AWA", "DATE")
+
+    # The columns whose values are not numbers, which are matched as they
+    # are written and cannot be bounded
+    textColumns = ("DATE", "PATH")
+
+    def __init__(self, scanner=None, cache=None, metrics=False,
+                 metadata=False, folderFilter=None, query=None):
+        """
+        A simple constructor.
+
+        :param scanner: The scanner used to find the data files, defaults to
+        one that walks every directory serially.
+        :param cache: The ParseCache remembering the contents of files
+        already parsed, or None to parse every file.
+        :param metrics: Whether to also extract the metrics of the other
+        outputs declared in the .sim file of each folder into the data of
+        every exit time data file (see metricColumns).
+        :param metadata: Whether to also add the metadata of the folder of
+        every exit time data file to its data (see metadataColumns).
+        :param folderFilter: A function taking the metadata of a folder
+        (see _readFolder) and returning whether its data files are extracted
+        at all, or None to extract every folder.
+        :param query: A dictionary like the ones of Database.query whose
+        values may also be (low, high) tuples of inclusive numeric bounds
+        (either being None when unbounded), or None to extract every file.
+        Files whose paths do not match are never read (see pathColumns).
+        """
+        if query is not None:
+            unknown = set(query) - set(self.pathColumns)
+            if unknown:
+                raise ValueError("The following keys are not known before "
+                                 "reading the data files: {}"
+                                 .format(", ".join(sorted(unknown))))
+            bounded = {key for key, wanted in query.items()
+                       if isinstance(wanted, tuple)
+                       and key in self.textColumns}
+            if bounded:
+                raise ValueError("The following keys are not numbers and "
+                                 "cannot be bounded: {}"
+                                 .format(", ".join(sorted(bounded))))
+
+        self.scanner = scanner or Scanner()
+        self.cache = cache
+        self.metrics = metrics
+        self.metadata = metadata
+        self.folderFilter = folderFilter
+        self.query = query
+        self.filesPerSecond = None
+
+        # The metadata and outputs per folder, read once per folder
+        self._folders = {}
+
+    def extractAllData(self, dataDirPath, logPath, workers=1):
         """
         Extracts data from all sources (i.e. file paths and their contents)
 
         :param dataDirPath: The path to the directory that hosts all the data.
         :param logPath: The path to the log file.
+        :param workers: The number of processes to spread the files over. A
+        value of one extracts everything serially whereas zero uses every
+        available CPU.
         :return: A list containing dictionaries of the data parsed for each
         single file.
         """
         self._initializeLogFile(logPath)
-        data = {}
-        allData = []
-        hasErrorOccurred = False     # Flag highlighting a parsing error
 
-        for path in self._listAllFilePaths(dataDirPath):
-            # Extends the path from root to the data file
-            path = os.path.join(dataDirPath, path)
+        # Extends the paths from root to the data files
+        paths = [os.path.join(dataDirPath, path)
+                 for path in self._listAllFilePaths(dataDirPath)]
 
-            # Attempts to extract data from file path and contents
-            # otherwise stores the error in a separate error log file
-            try:
-                dataFromPath = self._extractDataFromPath(path)
-                dataFromFile = self._extractDataFromFile(path)
-            except ValueError as e:
-                with open(logPath, "a") as log:
-                    stamp = datetime.datetime.fromtimestamp(time.time())
-                    stamp = stamp.strftime("%m/%d %H:%M:%S")
-                    error = "{}, {}\n".format(stamp, str(e))
-                    log.write(error)
-                hasErrorOccurred = True
-                continue
+        results = list(self._extractDataFromPaths(paths, workers))
+        allData = [data for data, error in results if error is None]
+        errors = [error for data, error in results if error is not None]
+        self._writeLog(logPath, errors)
+        self._warnUser(allData, errors)
+        return allData
 
-            # Merging both dictionaries
-            data = dataFromPath.copy()
-            data.update(dataFromFile)
-            allData.append(data)
+    def extractAllDataAsync(self, dataDirPath, logPath, concurrency=64):
+        """
+        Extracts data from all sources like extractAllData but overlaps up to
+        the given number of file reads, which suits remote file systems where
+        every open and read stalls on latency rather than on the CPU. The
+        reads happen on a pool of threads driven by an event loop, and the
+        files per second achieved are kept in filesPerSecond.
 
-        # Warns the user if all or some data failed to be extracted
-        if hasErrorOccurred:
-            print("WARNING: Some files weren't parsed properly, check"
-                  "error logs for more details!")
-        elif not allData:
-            print("WARNING: Could not find a extract a shred of data! "
-                  "Perhaps the results directory is incorrectly specified?")
+        The parse cache cannot be used since its connection belongs to a
+        single thread, hence extractors with one are refused.
+
+        :param dataDirPath: The path to the directory that hosts all the data.
+        :param logPath: The path to the log file.
+        :param concurrency: The number of files being read at once.
+        :return: A list containing dictionaries of the data parsed for each
+        single file, identical to the one of extractAllData.
+        """
+        import asyncio
+        if self.cache is not None:
+            raise ValueError("The parse cache cannot be used when reading "
+                             "the data files asynchronously")
+        self._initializeLogFile(logPath)
+
+        # Extends the paths from root to the data files
+        paths = [os.path.join(dataDirPath, path)
+                 for path in self._listAllFilePaths(dataDirPath)]
+
+        start = time.perf_counter()
+        results = asyncio.run(self._extractDataAsync(paths, concurrency))
+        elapsed = time.perf_counter() - start
+        self.filesPerSecond = len(paths) / elapsed if elapsed else 0.0
+
+        # Interned like the data of extractAllData
+        allData = [valueStrings.internEntry(data)
+                   for data, error in results if error is None]
+        errors = [error for data, error in results if error is not None]
+        self._writeLog(logPath, errors)
+        self._warnUser(allData, errors)
         return allData
 
+    def iterAllData(self, dataDirPath, logPath, workers=1, batchSize=1000):
+        """
+        Extracts data from all sources like extractAllData but yields the
+        data of each file as soon as it is extracted so that memory use stays
+        bounded regardless of how many files there are.
+
+        :param dataDirPath: The path to the directory that hosts all the data.
+        :param logPath: The path to the log file.
+        :param workers: The number of processes to spread the files over
+        (see extractAllData).
+        :param batchSize: The number of paths handed to the processes at a
+        time, which bounds the results held in memory.
+        :return: A generator yielding a dictionary of the data parsed for
+        each single file.
+        """
+        self._initializeLogFile(logPath)
+
+        # Extends the paths from root to the data files
+        paths = (os.path.join(dataDirPath, path)
+                 for path in self.iterAllFilePaths(dataDirPath))
+
+        hasData = False
+        errors = []
+        for data, error in self._extractDataFromPaths(paths, workers,
+                                                      batchSize):
+            if error is None:
+                hasData = True
+                yield data
+            else:
+                self._writeLog(logPath, [error])
+                errors.append(error)
+        self._warnUser(hasData, errors)
+
+    def extractChangedData(self, dataDirPath, logPath, manifest, workers=1):
+        """
+        Extracts data from all sources like extractAllData but only parses
+        the files that are new or have changed (based on their modification
+        time and size, and those of the other files their rows are read
+        from, see _stamp) since the given manifest was recorded. Rows of
+        files that no longer exist are dropped.
+
+        :param dataDirPath: The path to the directory that hosts all the data.
+        :param logPath: The path to the log file.
+        :param manifest: A dictionary mapping each previously ingested file
+        path to a dictionary of its stamp (see _stamp) and extracted "ROW".
+        :param workers: The number of processes to spread the changed files
+        over (see extractAllData).
+        :return: A tuple containing the list of data dictionaries (in the same
+        order as extractAllData) and the updated manifest.
+        """
+        self._initializeLogFile(logPath)
+        self._folders = {}      # The folders may have changed since
+
+        # Extends the paths from root to the data files, keeping the
+        # directory entries to reuse the stat data cached while scanning
+        entries = [(os.path.join(dataDirPath, path), entry)
+                   for path, entry in self.scanner.scan(dataDirPath)
+                   if self._isWanted(dataDirPath, path)]
+        paths = [path for path, entry in entries]
+
+        # Reuses the rows of unchanged files and marks the rest for parsing
+        updated = {}
+        changedPaths = []
+        for path, entry in entries:
+            stamp = self._stamp(path, entry.stat())
+            record = manifest.get(path)
+            if record and dict(record, ROW=None) == dict(stamp, ROW=None):
+                updated[path] = record
+            else:
+                updated[path] = dict(stamp, ROW=None)
+                changedPaths.append(path)
+
+        # Files that failed to parse are left out of the manifest so they are
+        # attempted (and logged) again on the next run
+        errors = []
+        results = self._extractDataFromPaths(changedPaths, workers)
+        for path, (data, error) in zip(changedPaths, results):
+            if error is None:
+                updated[path]["ROW"] = data
+            else:
+                del updated[path]
+                errors.append(error)
+
+        allData = [updated[path]["ROW"] for path in paths if path in updated]
+        self._writeLog(logPath, errors)
+        self._warnUser(allData, errors)
+        return allData, updated
+
+    def close(self):
+        """
+        Flushes and closes the parse cache, if any, which is opened again
+        when needed.
+        """
+        if self.cache is not None:
+            self.cache.close()
+
+    def pollChangedData(self, dataDirPath, logPath, manifest, failed,
+                        settle=2.0, workers=1):
+        """
+        Extracts data from the files that are new or have changed since the
+        given manifest was recorded like extractChangedData, for polling a
+        results directory that the simulator is still writing to. Files
+        modified within the last settle seconds are taken to be still being
+        written and are left for a later poll, keeping their previous data
+        meanwhile. Files that fail to parse are logged once, dropped along
+        with their previous data and attempted again only once they change.
+
+        The log file is appended to rather than replaced.
+
+        :param dataDirPath: The path to the directory that hosts all the data.
+        :param logPath: The path to the log file.
+        :param manifest: A dictionary mapping each previously ingested file
+        path to a dictionary of its stamp (see _stamp) and extracted "ROW".
+        :param failed: A dictionary mapping the path of every file that
+        failed to parse to its stamp at the time, which is updated in place
+        from poll to poll.
+        :param settle: The number of seconds a file has to be left untouched
+        for before it is extracted.
+        :param workers: The number of processes to spread the changed files
+        over (see extractAllData).
+        :return: A tuple containing the list of data dictionaries of every
+        file (in the same order as extractAllData), the list of the data
+        dictionaries extracted by this poll, the list of the previous data
+        dictionaries of the files changed or removed since the manifest was
+        recorded, and the updated manifest.
+        """
+        now = time.time()
+        self._folders = {}      # The folders may have changed since
+        entries = [(os.path.join(dataDirPath, path), entry)
+                   for path, entry in self.scanner.scan(dataDirPath)
+                   if self._isWanted(dataDirPath, path)]
+        paths = [path for path, entry in entries]
+
+        # Picks out the changed files that have settled and were not already
+        # attempted as they are
+        updated = {}
+        stamps = {}
+        for path, entry in entries:
+            stat = entry.stat()
+            stamp = self._stamp(path, stat)
+            record = manifest.get(path)
+            if record and dict(record, ROW=None) == dict(stamp, ROW=None):
+                updated[path] = record
+                continue
+            if record:
+                updated[path] = record
+            if failed.get(path) != stamp and now - stat.st_mtime >= settle:
+                stamps[path] = stamp
+        changedPaths = list(stamps)
+
+        errors = []
+        extracted = []
+        replaced = []
+        results = self._extractDataFromPaths(changedPaths, workers)
+        for path, (data, error) in zip(changedPaths, results):
+            if error is None:
+                if path in updated:
+                    replaced.append(updated[path]["ROW"])
+                updated[path] = dict(stamps[path], ROW=data)
+                failed.pop(path, None)
+                extracted.append(data)
+            else:
+                # The previous data no longer holds
+                if path in updated:
+                    replaced.append(updated.pop(path)["ROW"])
+                failed[path] = stamps[path]
+                errors.append(error)
+
+        # Files removed since the manifest was recorded
+        existing = set(paths)
+        for path, record in manifest.items():
+            if path not in existing:
+                replaced.append(record["ROW"])
+        for path in list(failed):
+            if path not in existing:
+                del failed[path]
+
+        allData = [updated[path]["ROW"] for path in paths if path in updated]
+        self._writeLog(logPath, errors)
+        return allData, extracted, replaced, updated
+
+    def readManifest(self, manifestPath):
+        """
+        Reads the manifest of previously ingested files.
+
+        :param manifestPath: The path to the manifest file.
+        :return: A dictionary mapping file paths to their manifest records,
+        which is empty if the manifest is missing or unreadable.
+        """
+        try:
+            with open(manifestPath, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def writeManifest(self, manifestPath, manifest):
+        """
+        Writes the manifest of ingested files, replacing the old one only
+        once the new one has been fully written.
+
+        :param manifestPath: The path to the manifest file.
+        :param manifest: A dictionary mapping file paths to their manifest
+        records.
+        """
+        tempPath = "{}.{}.tmp".format(manifestPath, os.getpid())
+        with open(tempPath, "w") as file:
+            json.dump(manifest, file)
+        os.replace(tempPath, manifestPath)
+
+    def _extractDataFromPaths(self, paths, workers, batchSize=None):
+        """
+        Extracts data from the given files either serially or across a pool
+        of processes, where the latter still returns the results in the order
+        of the paths.
+
+        :param paths: An iterable containing the paths to the data files.
+        :param workers: The number of processes to spread the files over. A
+        value of one extracts everything serially whereas zero uses every
+        available CPU.
+        :param batchSize: The number of paths handed to the processes at a
+        time, or None to hand them all at once.
+        :return: A generator yielding a (data, error) tuple for each path as
+        returned by _extractData.
+        """
+        # Counted here rather than where the files are read since worker
+        # processes do not record anything
+        # Interned here as well since worker processes and the parse cache
+        # return copies of the values
+        for data, error in self._dispatchPaths(paths, workers, batchSize):
+            instrumentation.count("FILES")
+            if data is not None:
+                valueStrings.internEntry(data)
+            yield data, error
+
+    def _dispatchPaths(self, paths, workers, batchSize):
+        """
+        Extracts data from the given files for _extractDataFromPaths, either
+        serially, across a pool of processes or through the parse cache.
+
+        :param paths: An iterable containing the paths to the data files.
+        :param workers: The number of processes to spread the files over.
+        :param batchSize: The number of paths handed to the processes at a
+        time, or None to hand them all at once.
+        :return: A generator yielding a (data, error) tuple for each path.
+        """
+        import concurrent.futures
+        if workers == 0:
+            workers = os.cpu_count() or 1
+        if self.cache is not None:
+            yield from self._extractCachedDataFromPaths(paths, workers,
+                                                        batchSize)
+            return
+        if workers <= 1:
+            for path in paths:
+                yield self._extractData(path)
+            return
+
+        paths = iter(paths)
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            while True:
+                batch = list(itertools.islice(paths, batchSize))
+                if not batch:
+                    break
+                self._readFolders(batch)
+                chunkSize = max(1, len(batch) // (workers * 4))
+                yield from pool.map(self._extractData, batch,
+                                    chunksize=chunkSize)
+
+    async def _extractDataAsync(self, paths, concurrency):
+        """
+        Extracts data from the given files on a pool of threads, with a
+        semaphore bounding how many files are in flight so that only that
+        many tasks exist at any time however many paths there are.
+
+        :param paths: A list containing the paths to the data files.
+        :param concurrency: The number of files being extracted at once.
+        :return: A list containing a (data, error) tuple for each path in
+        order, as returned by _extractData.
+        """
+        import asyncio
+        import concurrent.futures
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+        results = [None] * len(paths)
+        pending = set()
+        failed = []
+
+        def finish(task):
+            # Failed tasks are kept so that their error is raised as it
+            # would be when extracting serially
+            pending.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                failed.append(task)
+
+        with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+            async def extract(i, path):
+                try:
+                    results[i] = await loop.run_in_executor(
+                        pool, self._extractData, path)
+                    instrumentation.count("FILES")
+                finally:
+                    semaphore.release()
+
+            for i, path in enumerate(paths):
+                await semaphore.acquire()
+                if failed:
+                    semaphore.release()
+                    break
+                task = asyncio.ensure_future(extract(i, path))
+                pending.add(task)
+                task.add_done_callback(finish)
+            await asyncio.gather(*failed, *pending)
+        return results
+
+    def _extractCachedDataFromPaths(self, paths, workers, batchSize):
+        """
+        Extracts data from the given files like _extractDataFromPaths while
+        going through the parse cache. Files whose path, modification time
+        and size were seen before are not read at all, the others are read
+        (by the processes when there are several) and only parsed when their
+        content hash is unknown.
+
+        The cache is only written and counted by this process, in between
+        batches.
+
+        :param paths: An iterable containing the paths to the data files.
+        :param workers: The number of processes to spread the files over.
+        :param batchSize: The number of paths handled at a time, or None to
+        handle them all at once.
+        :return: A generator yielding a (data, error) tuple for each path as
+        returned by _extractData.
+        """
+        import concurrent.futures
+        pool = None
+        if workers > 1:
+            pool = concurrent.futures.ProcessPoolExecutor(workers)
+
+        try:
+            paths = iter(paths)
+            while True:
+                batch = list(itertools.islice(paths, batchSize))
+                if not batch:
+                    break
+
+                # Cheap stat based lookups so unchanged files are never read
+                stats = [os.stat(path) for path in batch]
+                records = [self.cache.get(path, stat)
+                           for path, stat in zip(batch, stats)]
+                misses = [path for path, record in zip(batch, records)
+                          if record is None]
+
+                if pool is None:
+                    results = map(self._extractUncachedData, misses)
+                else:
+                    self._readFolders(misses)
+                    chunkSize = max(1, len(misses) // (workers * 4))
+                    chunks = [misses[i:i + chunkSize]
+                              for i in range(0, len(misses), chunkSize)]
+                    results = itertools.chain.from_iterable(
+                        pool.map(self._extractUncachedChunk, chunks))
+
+                for path, stat, record in zip(batch, stats, records):
+                    if record is None:
+                        data, error, digest, parsed = next(results)
+                        if error is None:
+                            self.cache.put(path, stat, digest, data, parsed)
+                        yield data, error
+                    else:
+                        yield self._extractData(path, record)
+                self.cache.flush()
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def _extractUncachedChunk(self, filePaths):
+        """
+        Extracts data from a chunk of files handed to a worker process like
+        _extractUncachedData, closing the connection to the parse cache that
+        the worker opened for them.
+
+        :param filePaths: A list containing the paths of the data files.
+        :return: A list containing a tuple for each file as returned by
+        _extractUncachedData.
+        """
+        try:
+            return [self._extractUncachedData(filePath)
+                    for filePath in filePaths]
+        finally:
+            # Only this process writes to the cache (see
+            # _extractCachedDataFromPaths)
+            self.cache.close(flush=False)
+
+    def _extractUncachedData(self, filePath):
+        """
+        Extracts data from both the given file path and its contents like
+        _extractData, unless the content hash of the file is found in the
+        parse cache.
+
+        :param filePath: The path of the data file from the root directory.
+        :return: A tuple of the data and error as returned by _extractData,
+        the content hash of the file and whether the file had to be parsed.
+        """
+        try:
+            dataFromPath = self._extractDataFromPath(filePath)
+            with open(filePath, "rb", buffering=0) as file:
+                contents = file.readall()
+            instrumentation.count("BYTES", len(contents))
+            digest = self.cache.digest(contents)
+            dataFromFile = self.cache.getContents(digest)
+            parsed = dataFromFile is None
+            if parsed:
+                dataFromFile = self._extractDataFromContents(contents,
+                                                             filePath)
+            dataFromFolder = self._extractDataFromFolder(filePath)
+        except ValueError as e:
+            return None, self._formatError(e), None, False
+
+        data = dataFromPath.copy()
+        data.update(dataFromFile)
+        data.update(dataFromFolder)
+        return data, None, digest, parsed
+
+    def _extractData(self, filePath, dataFromFile=None):
+        """
+        Extracts data from both the given file path and its contents.
+
+        Errors are returned rather than logged so that worker processes
+        never write to the log file concurrently.
+
+        :param filePath: The path of the data file from the root directory.
+        :param dataFromFile: The data already known about the file contents
+        (e.g. from the parse cache), or None to read the file.
+        :return: A tuple containing the merged data dictionary and None, or
+        None and a time stamped error line for the log file.
+        """
+        # Attempts to extract data from file path and contents
+        # otherwise returns the error to be stored in the log file
+        # The data of the folder is never cached since the contents of the
+        # exit time data file do not identify it
+        try:
+            dataFromPath = self._extractDataFromPath(filePath)
+            if dataFromFile is None:
+                dataFromFile = self._extractDataFromFile(filePath)
+            dataFromFolder = self._extractDataFromFolder(filePath)
+        except ValueError as e:
+            return None, self._formatError(e)
+
+        # Merging the dictionaries
+        data = dataFromPath.copy()
+        data.update(dataFromFile)
+        data.update(dataFromFolder)
+        return data, None
+
+    def _formatError(self, error):
+        """
+        Formats an error as a time stamped line for the log file.
+
+        :param error: The exception raised.
+        :return: The line for the log file.
+        """
+        stamp = datetime.datetime.fromtimestamp(time.time())
+        stamp = stamp.strftime("%m/%d %H:%M:%S")
+        return "{}, {}\n".format(stamp, str(error))
+
+    @instrumentation.stage
     def _extractDataFromPath(self, filePath):
         """
         Parses the given file path and extracts data from it which is then
@@ -76,275 +873,2405 @@ class Extractor:
         concentration, simulation type (uni or multi), ASH value, AWA value,
         path to file, and date of simulation.
 
-        :param filePath: The path of the data file from the root directory.
-        The root directory should be the "results" directory otherwise it
-        should be two directories above a data file.
-        :return: A dictionary containing data extracted from the file path.
+        :param filePath: The path of the data file from the root directory.
+        The root directory should be the "results" directory otherwise it
+        should be two directories above a data file.
+        :return: A dictionary containing data extracted from the file path.
+        """
+        paths = filePath.split(os.sep)
+        folder, file = paths[-2], paths[-1]
+        simDate, fructose = self._parseFolderName(folder, filePath)
+
+        # Extracting data from the file name
+        file = file.split("_")
+        file = file[-1]     # Only the end contains useful data
+        file = file.rstrip(".csv")
+        file = file.split("&")
+        uniMulti, awa, ash, = file
+
+        dataExtracted = \
+        {
+            "FR":       fructose,
+            "MULTI":    uniMulti,
+            "ASH":      ash,
+            "AWA":      awa,
+            "PATH":     filePath,
+            "DATE":     simDate
+        }
+        return dataExtracted
+
+    def _parseFolderName(self, folder, filePath):
+        """
+        Extracts the date and fructose concentration from the name of a
+        folder.
+
+        :param folder: The name of the folder.
+        :param filePath: The path of the file or folder (used in error
+        messages).
+        :return: A tuple of the date and fructose concentration.
+        """
+        # The convention is "date_<letter>_fructose", possibly prefixed
+        # (e.g. "bak_date_<letter>_fructose")
+        folder = folder.split("_")
+
+        if len(folder) == 3:
+            return folder[0], folder[-1]
+        elif len(folder) == 4:
+            return folder[1], folder[-1]
+        raise ValueError("The following folder is named inconsistently, {}"
+                         .format(filePath))
+
+    @instrumentation.stage
+    def _extractDataFromFile(self, filePath):
+        """
+        Reads the given file name, parses the contents to extract data.
+        The data parsed contains: the total number of worms, the worms
+        exited, percentage exited (calculated), and file name.
+
+        :param filePath: The path of the data file from the root directory.
+        The root directory should be the "results" directory otherwise it
+        should be two directories above a data file.
+        :return: A dictionary containing the data extracted from the file
+        contents.
+        """
+        # Unbuffered since the whole file is read at once anyway
+        with open(filePath, "rb", buffering=0) as file:
+            contents = file.readall()
+        instrumentation.count("BYTES", len(contents))
+        return self._extractDataFromContents(contents, filePath)
+
+    def _extractDataFromContents(self, contents, filePath):
+        """
+        Parses the contents of a data file (see _extractDataFromFile).
+
+        :param contents: The contents of the data file as bytes.
+        :param filePath: The path of the data file from the root directory.
+        :return: A dictionary containing the data extracted from the file
+        contents.
+        """
+        wormCount, wormExitedCount = self._parseExitTimes(contents, filePath)
+
+        # Avoiding the formation of a blackhole by dividing by zero
+        if wormCount:
+            exit = str(float(wormExitedCount) / float(wormCount))
+        else:
+            exit = "0"
+
+        dataExtracted = \
+        {
+        "N":        str(wormCount),
+        "N_OUT":    str(wormExitedCount),
+        "EXIT":     exit,
+        "PATH":     filePath
+        }
+        return dataExtracted
+
+    @instrumentation.stage
+    def _extractDataFromOutputs(self, filePath):
+        """
+        Reads the files of the other outputs of the simulation of the given
+        exit time data file, as declared in the <Outputs> block of the .sim
+        file of its folder, and extracts their metrics. The files are found
+        from the name of the data file so no further walking is needed.
+
+        Metrics of outputs that are not declared, of unknown types or whose
+        files are missing (e.g. interrupted simulations) are "NaN".
+
+        :param filePath: The path of the exit time data file.
+        :return: A dictionary containing the metricColumns.
+        """
+        dataExtracted = dict.fromkeys(self.metricColumns, "NaN")
+        for outputPath, column, columns in self._outputPaths(filePath):
+            contents = self._readOutput(outputPath)
+            if contents is None:
+                continue
+            if column is not None:
+                dataExtracted[column] = self._parseRunMean(contents,
+                                                           outputPath)
+            else:
+                dataExtracted.update(self._parseSummary(contents, columns,
+                                                        outputPath))
+        return dataExtracted
+
+    def _outputPaths(self, filePath):
+        """
+        Lists the files of the other outputs of the simulation of the given
+        exit time data file that metrics are extracted from (see
+        _extractDataFromOutputs), whether they exist or not.
+
+        :param filePath: The path of the exit time data file.
+        :return: A list containing a tuple per file of its path and either
+        the metric column of a raw output and None, or None and the metric
+        columns of a processed output.
+        """
+        dirPath, file = os.path.split(filePath)
+        simulation = file.split("_raw_output_", 1)[-1][:-len(".csv")]
+
+        paths = []
+        metadata, outputs = self._readFolder(dirPath)
+        for name, kind in outputs:
+            column = self.rawColumns.get(kind)
+            if column is not None:
+                paths.append((os.path.join(dirPath, "{}_raw_output_{}.csv"
+                                           .format(name, simulation)),
+                              column, None))
+
+            columns = self.processedColumns.get(kind)
+            if columns is not None:
+                paths.append((os.path.join(dirPath,
+                                           "{}_processed_output_{}.txt"
+                                           .format(name, simulation)),
+                              None, columns))
+        return paths
+
+    def _stamp(self, filePath, stat):
+        """
+        Records what the row of a data file is extracted from, to tell later
+        whether it changed: the columns extracted beside those of the file
+        itself, the modification time and size of the file and, when metrics
+        or metadata are extracted, those of the other files of its folder
+        that the row is read from as well.
+
+        :param filePath: The path of the exit time data file.
+        :param stat: The stat result of the data file.
+        :return: A dictionary of the extra "COLUMNS", the "MTIME" and "SIZE"
+        of the file, and of the "SOURCES" when metrics or metadata are
+        extracted, a list of the [modification time, size] of every other
+        file (None if missing).
+        """
+        # Rows extracted with other options lack or carry other columns so
+        # they are parsed again rather than reused
+        extraColumns = []
+        if self.metadata:
+            extraColumns += self.metadataColumns
+        if self.metrics:
+            extraColumns += self.metricColumns
+        stamp = {"COLUMNS": extraColumns, "MTIME": stat.st_mtime_ns,
+                 "SIZE": stat.st_size}
+        if not extraColumns:
+            return stamp
+
+        dirPath = os.path.dirname(filePath)
+        name = os.path.basename(dirPath)
+        sourcePaths = [os.path.join(dirPath, name + ".sim"),
+                       os.path.join(dirPath, "seeds_" + name + ".txt")]
+        if self.metrics:
+            try:
+                sourcePaths += [path for path, column, columns
+                                in self._outputPaths(filePath)]
+            except ValueError:
+                pass    # Logged once the data file is extracted
+
+        stamp["SOURCES"] = []
+        for path in sourcePaths:
+            try:
+                sourceStat = os.stat(path)
+            except OSError:
+                stamp["SOURCES"].append(None)
+            else:
+                stamp["SOURCES"].append([sourceStat.st_mtime_ns,
+                                         sourceStat.st_size])
+        return stamp
+
+    def _extractDataFromFolder(self, filePath):
+        """
+        Extracts the data of the folder of the given exit time data file that
+        was asked for, i.e. its metadata and the metrics of the other outputs
+        of the simulation.
+
+        :param filePath: The path of the exit time data file.
+        :return: A dictionary containing the metadataColumns and the
+        metricColumns, or only those that were asked for.
+        """
+        dataExtracted = {}
+        if self.metadata:
+            metadata, outputs = self._readFolder(os.path.dirname(filePath))
+            for column in self.metadataColumns:
+                dataExtracted[column] = metadata[column]
+        if self.metrics:
+            dataExtracted.update(self._extractDataFromOutputs(filePath))
+        return dataExtracted
+
+    def _isWanted(self, dataDirPath, path):
+        """
+        Checks whether a data file is extracted at all, first against the
+        folder filter and then against the query, so that the files that
+        cannot match are never opened.
+
+        :param dataDirPath: The path to the directory that hosts all the data.
+        :param path: The path of the data file from the results directory.
+        :return: Whether the data file is extracted.
+        """
+        return self._isFolderWanted(dataDirPath, path) and \
+            self._matchesQuery(path)
+
+    def _matchesQuery(self, filePath):
+        """
+        Checks the data extracted from the path of a data file against the
+        query. Values are compared numerically like Database.query does, or
+        as strings when they are not numbers (e.g. dates).
+
+        :param filePath: The path of the data file.
+        :return: Whether the data file may match the query. Files whose path
+        cannot be parsed are kept so that the error is logged.
+        """
+        if self.query is None:
+            return True
+        try:
+            dataFromPath = self._extractDataFromPath(filePath)
+        except ValueError:
+            return True
+
+        for key, wanted in self.query.items():
+            value = dataFromPath[key]
+            if isinstance(wanted, tuple):
+                low, high = wanted
+                value = float(value)
+                if (low is not None and value < float(low)) or \
+                        (high is not None and value > float(high)):
+                    return False
+                continue
+            try:
+                if float(value) != float(wanted):
+                    return False
+            except ValueError:
+                if value != str(wanted):
+                    return False
+        return True
+
+    def _isFolderWanted(self, dataDirPath, path):
+        """
+        Checks the folder of a data file against the folder filter, which
+        only reads the .sim and seeds files of the folder the first time it
+        is seen so no data file is opened to discard a folder.
+
+        :param dataDirPath: The path to the directory that hosts all the data.
+        :param path: The path of the data file from the results directory.
+        :return: Whether the data file is extracted.
+        """
+        if self.folderFilter is None:
+            return True
+        dirPath = os.path.join(dataDirPath, os.path.dirname(path))
+
+        # Folders whose .sim file cannot be parsed are kept so that the
+        # error is logged for each of their data files
+        try:
+            metadata, outputs = self._readFolder(dirPath)
+        except ValueError:
+            return True
+        return self.folderFilter(metadata)
+
+    def _readFolder(self, dirPath):
+        """
+        Reads the metadata of a folder from its name, its .sim file and its
+        seeds file, which are only parsed the first time the folder is seen
+        and every data file of the folder then shares.
+
+        The .sim file is parsed as a stream that stops once both the
+        general settings and the outputs have been read, and elements are
+        discarded as soon as they are read. Metadata missing from the folder (e.g. backups without
+        .sim or seeds files) is "NaN", and so are the date and fructose
+        concentration of folders named inconsistently.
+
+        :param dirPath: The path to the folder.
+        :return: A tuple of a dictionary containing the "DATE", "FR" and
+        metadataColumns of the folder and a list containing a (name, type)
+        tuple per output declared in the <Outputs> block of its .sim file.
+        """
+        import xml.etree.ElementTree
+        folder = self._folders.get(dirPath)
+        if folder is not None:
+            return folder
+
+        name = os.path.basename(dirPath)
+        metadata = dict.fromkeys(["DATE", "FR"] + self.metadataColumns, "NaN")
+        try:
+            metadata["DATE"], metadata["FR"] = self._parseFolderName(name,
+                                                                     dirPath)
+        except ValueError:
+            pass
+
+        outputs = []
+        blocks = set()
+        simPath = os.path.join(dirPath, name + ".sim")
+        try:
+            with open(simPath, "rb") as file:
+                for event, element in xml.etree.ElementTree.iterparse(file):
+                    if element.tag == "Output":
+                        outputs.append((element.get("name"),
+                                        element.get("type")))
+                    elif element.tag == "Setting":
+                        column = self.simSettings.get(element.get("name"))
+                        if column is not None and element.get("value"):
+                            metadata[column] = element.get("value")
+                    elif element.tag in ("Settings", "Outputs"):
+                        blocks.add(element.tag)
+                        if len(blocks) == 2:
+                            break
+                    element.clear()
+        except FileNotFoundError:
+            pass
+        except xml.etree.ElementTree.ParseError:
+            raise ValueError("Unable to parse the following file: {}"
+                             .format(simPath))
+
+        seedsPath = os.path.join(dirPath, "seeds_" + name + ".txt")
+        try:
+            with open(seedsPath, "r") as file:
+                match = self._seedsLine.search(file.read())
+        except FileNotFoundError:
+            match = None
+        if match:
+            metadata["THREADS"], metadata["SEED"] = match.groups()
+
+        folder = metadata, outputs
+        self._folders[dirPath] = folder
+        return folder
+
+    def _readFolders(self, paths):
+        """
+        Reads the folders of the given data files in this process before the
+        files are handed to worker processes, which receive the folders read
+        along with the extractor rather than each parsing them again.
+
+        :param paths: A list containing the paths to the data files.
+        """
+        if not self.metrics and not self.metadata:
+            return
+        for dirPath in {os.path.dirname(path) for path in paths}:
+            try:
+                self._readFolder(dirPath)
+            except ValueError:
+                pass    # Logged once the data files are extracted
+
+    def _readOutput(self, outputPath):
+        """
+        Reads the whole file of an output.
+
+        :param outputPath: The path to the output file.
+        :return: The contents of the file as bytes, or None if it is missing.
+        """
+        try:
+            with open(outputPath, "rb", buffering=0) as file:
+                contents = file.readall()
+        except FileNotFoundError:
+            return None
+        instrumentation.count("BYTES", len(contents))
+        return contents
+
+    # A raw output body where every line is "<run>,<value>" with the value
+    # written as a Java double
+    _runValueBody = re.compile(rb"(?:[0-9]+,-?[0-9]+\.[0-9]+"
+                               rb"(?:E-?[0-9]+)?\n)*")
+    _runValue = re.compile(rb",(.*)\n")
+
+    def _parseRunMean(self, contents, filePath):
+        """
+        Averages the per run values of a raw output file, which like the exit
+        time data files has a header and a "<run>,<value>" line per worm
+        (e.g. whether the worm ended in the spot for in_spot outputs).
+
+        Like _parseExitTimes, well formed files are handled in bulk and
+        anything else line by line.
+
+        :param contents: The contents of the output file as bytes.
+        :param filePath: The path of the output file (used in error
+        messages).
+        :return: The mean value as a string, or "NaN" if there are no runs.
+        """
+        if b"\r" in contents:
+            contents = contents.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+        # Skips first line containing header and any trailing blank lines
+        body = contents.partition(b"\n")[2].rstrip() + b"\n"
+        if b"The " in body:
+            body = b"".join(line for line in body.splitlines(True)
+                            if not line.startswith(self.summaryPrefixes))
+
+        if body == b"\n":
+            return "NaN"
+        if self._runValueBody.fullmatch(body):
+            values = self._runValue.findall(body)
+            return str(sum(map(float, values)) / len(values))
+
+        total = 0.0
+        runCount = 0
+        lines = contents.decode().split("\n")
+
+        # Skips first line containing header
+        for i, line in enumerate(lines[1:], start=1):
+            if not line.strip() or \
+                    line.encode().startswith(self.summaryPrefixes):
+                continue
+            try:
+                run, value = line.split(",")
+                total += float(value)
+            except ValueError:
+                raise ValueError("Unable to parse line {} from the "
+                                 "following file: {}".format(i+1, filePath))
+            runCount += 1
+
+        if not runCount:
+            return "NaN"
+        return str(total / runCount)
+
+    def _parseSummary(self, contents, columns, filePath):
+        """
+        Parses the single summary line of a processed output file, such as
+        "The chemotaxis index is 0.00", whose comma separated values follow
+        the last " is ".
+
+        :param contents: The contents of the output file as bytes.
+        :param columns: The columns the values are stored under, in order.
+        :param filePath: The path of the output file (used in error
+        messages).
+        :return: A dictionary mapping the columns to their values.
+        """
+        values = contents.decode().strip().rpartition(" is ")[2].split(",")
+        if len(values) != len(columns):
+            raise ValueError("Unable to parse the summary from the following "
+                             "file: {}".format(filePath))
+        return dict(zip(columns, (value.strip() for value in values)))
+
+    # Summary lines the simulator may append after the data of a file
+    summaryPrefixes = (b"The average time of exit", b"The chemotaxis index")
+
+    # A data file body where every line is "<run>,<exit time>" with the time
+    # written as a Java double and -1.0 marking worms that never exited
+    _exitTimeBody = re.compile(rb"(?:[0-9]+,(?:-1\.0\n|"
+                               rb"[0-9]+\.[0-9]+(?:E-?[0-9]+)?\n))*")
+
+    def _parseExitTimes(self, contents, filePath):
+        """
+        Counts the worms and those that exited in the contents of an exit
+        time data file.
+
+        Well formed files are counted in bulk on the raw bytes without
+        splitting them into lines, anything else falls back to parsing
+        line by line. Summary lines (see summaryPrefixes) are never counted.
+
+        :param contents: The contents of the data file as bytes.
+        :param filePath: The path of the data file (used in error messages).
+        :return: A tuple of the number of worms and those that exited.
+        """
+        if b"\r" in contents:
+            contents = contents.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+        # Skips first line containing header and any trailing blank lines
+        body = contents.partition(b"\n")[2].rstrip() + b"\n"
+        if b"The " in body:
+            body = b"".join(line for line in body.splitlines(True)
+                            if not line.startswith(self.summaryPrefixes))
+
+        if body == b"\n":
+            return 0, 0
+        if self._exitTimeBody.fullmatch(body):
+            wormCount = body.count(b"\n")
+            wormNotExitedCount = body.count(b",-1.0\n")
+            return wormCount, wormCount - wormNotExitedCount
+
+        return self._parseExitTimeLines(contents.decode(), filePath)
+
+    def _parseExitTimeLines(self, contents, filePath):
+        """
+        Counts the worms and those that exited in the contents of an exit
+        time data file one line at a time (see _parseExitTimes).
+
+        :param contents: The contents of the data file as a string.
+        :param filePath: The path of the data file (used in error messages).
+        :return: A tuple of the number of worms and those that exited.
+        """
+        lines = contents.split("\n")
+        wormCount = 0
+        wormExitedCount = 0
+
+        # Skips first line containing header
+        for i, entry in enumerate(lines[1:], start=1):
+            # Skips over blank lines and summary lines
+            if not entry.strip() or \
+                    entry.encode().startswith(self.summaryPrefixes):
+                continue
+
+            # Attempts to extract data for each entry
+            try:
+                wormNum, timeExited = entry.rstrip().split(",")
+            except ValueError as e:
+                raise ValueError("Unable to parse line {} from the "
+                                 "following file: {}".format(i+1, filePath))
+
+            # Counting total worms and those that exited
+            wormCount += 1
+            if float(timeExited) != -1.0:
+                wormExitedCount += 1
+
+        return wormCount, wormExitedCount
+
+    @instrumentation.stage
+    def _listAllFilePaths(self, dataDirPath):
+        """
+        Lists all the relevant paths from the results directory to the data
+        files (see iterAllFilePaths).
+
+        :param dataDirPath: The path to the directory that hosts all the data.
+        :return: A list containing all the paths from the results directory
+        to the data files.
+        """
+        return list(self.iterAllFilePaths(dataDirPath))
+
+    def iterAllFilePaths(self, dataDirPath):
+        """
+        Generates all the relevant paths from the results directory to the
+        data files, filtering out irrelevant files as the directories are
+        walked (see Scanner).
+
+        :param dataDirPath: The path to the directory that hosts all the data.
+        :return: A generator yielding the paths from the results directory
+        to the data files.
+        """
+        for path, entry in self.scanner.scan(dataDirPath):
+            if self._isWanted(dataDirPath, path):
+                yield path
+
+    def _writeLog(self, logPath, errors):
+        """
+        Appends the given error lines to the log file in a single write.
+
+        :param logPath: The path to the log file.
+        :param errors: A list containing the error lines to be logged.
+        """
+        if errors:
+            with open(logPath, "a") as log:
+                log.write("".join(errors))
+
+    def _warnUser(self, allData, errors):
+        """
+        Warns the user if all or some data failed to be extracted.
+
+        :param allData: A list containing the data extracted.
+        :param errors: A list containing the error lines logged.
+        """
+        if errors:
+            print("WARNING: Some files weren't parsed properly, check"
+                  "error logs for more details!")
+        elif not allData:
+            print("WARNING: Could not find a extract a shred of data! "
+                  "Perhaps the results directory is incorrectly specified?")
+
+    def _initializeLogFile(self, filePath):
+        """
+        Deletes the log file if it already exists.
+
+        :param filePath: The path to the log file.
+        """
+        if os.path.exists(filePath):
+            os.remove(filePath)
+
+
+class Scanner:
+    """
+    Responsible for finding the data files under the results directory,
+    pruning the directories that are not wanted and filtering the file names
+    while walking so that irrelevant entries are never collected.
+    """
+
+    def __init__(self, include=("*",), exclude=(), workers=1):
+        """
+        A simple constructor.
+
+        :param include: The glob patterns of directory names to walk into.
+        :param exclude: The glob patterns of directory names to skip (e.g.
+        "bak_*"), which take precedence over the include patterns.
+        :param workers: The number of threads walking the top level
+        directories of the results directory concurrently.
+        """
+        self.include = self._compileGlobs(include)
+        self.exclude = self._compileGlobs(exclude)
+        self.workers = workers
+
+    def scan(self, dataDirPath):
+        """
+        Walks the results directory and yields every exit time data file.
+
+        :param dataDirPath: The path to the directory that hosts all the data.
+        :return: A generator yielding a tuple per data file of its path from
+        the results directory (i.e. its data dir and file name) and its
+        os.DirEntry, whose cached stat data can be reused.
+        """
+        import concurrent.futures
+        try:
+            files, dirs = self._scanDir(dataDirPath)
+        except OSError:
+            return
+        dataDir = os.path.basename(os.path.normpath(dataDirPath)) + os.sep
+        for entry in files:
+            yield dataDir + entry.name, entry
+
+        # Walks the top level directories (usually one per sweep) on
+        # separate threads as listing them is dominated by I/O latency
+        if self.workers > 1 and len(dirs) > 1:
+            with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+                walks = pool.map(lambda path: list(self._walk(path)), dirs)
+                for walk in walks:
+                    yield from walk
+        else:
+            for path in dirs:
+                yield from self._walk(path)
+
+    def _walk(self, dirPath):
+        """
+        Walks a directory depth first like os.walk, without collecting the
+        irrelevant files or descending into excluded directories.
+
+        :param dirPath: The path to the directory to walk.
+        :return: A generator yielding the same tuples as scan.
+        """
+        stack = [dirPath]
+        while stack:
+            path = stack.pop()
+            try:
+                files, dirs = self._scanDir(path)
+            except OSError:
+                continue
+            dataDir = os.path.basename(path) + os.sep
+            for entry in files:
+                yield dataDir + entry.name, entry
+            stack.extend(reversed(dirs))
+
+    def _scanDir(self, dirPath):
+        """
+        Lists a single directory.
+
+        :param dirPath: The path to the directory to list.
+        :return: A tuple of a list containing the os.DirEntry of the exit
+        time data files and a list containing the paths of the directories to
+        walk into, both ordered as listed by the operating system.
+        """
+        files = []
+        dirs = []
+        with os.scandir(dirPath) as it:
+            for entry in it:
+                name = entry.name
+                # The type comes from the directory listing itself on most
+                # file systems so is_dir rarely needs a stat call
+                if not entry.is_dir():
+                    # Filter out invalid paths (e.g. paths that point to .txt
+                    # files instead of csv files, or paths that contain
+                    # "in_spot_processed_output instead of
+                    # "exit_time_raw_output")
+                    if name.endswith(".csv") and \
+                            "exit_time_raw_output" in name:
+                        files.append(entry)
+                # Symbolic links to directories are not followed (as in
+                # os.walk)
+                elif not entry.is_symlink() and self.include.match(name) \
+                        and not self.exclude.match(name):
+                    dirs.append(entry.path)
+        return files, dirs
+
+    def _compileGlobs(self, globs):
+        """
+        Compiles glob patterns into a single regular expression.
+
+        :param globs: An iterable of glob patterns.
+        :return: A compiled regular expression matching any of the patterns
+        (or nothing when there are none).
+        """
+        patterns = [fnmatch.translate(glob) for glob in globs]
+        return re.compile("|".join(patterns) or "(?!)")
+
+
+class ParseCache:
+    """
+    Responsible for remembering what was extracted from the contents of the
+    data files in a SQLite database, so that files already parsed (under any
+    path, e.g. backups and copies) are never parsed again.
+
+    Entries are keyed by the hash of the file contents, with the path,
+    modification time and size of each file recorded as well so that
+    unchanged files are found without being read. Only the most recently
+    used contents are kept once the size bound is reached.
+    """
+
+    def __init__(self, cachePath, maxEntries=100000):
+        """
+        A simple constructor.
+
+        :param cachePath: The path to the SQLite cache file.
+        :param maxEntries: The number of file contents to keep at most.
+        """
+        self.cachePath = cachePath
+        self.maxEntries = maxEntries
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._clock = 0
+
+    def __getstate__(self):
+        """
+        Leaves the connection out when the cache is sent to worker
+        processes, which open their own one when needed.
+
+        :return: A dictionary of the attributes to pickle.
+        """
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    def get(self, filePath, stat):
+        """
+        Looks a file up by its path, modification time and size, counting a
+        hit when found.
+
+        :param filePath: The path of the data file.
+        :param stat: The os.stat_result of the data file.
+        :return: A dictionary of the "N", "N_OUT" and "EXIT" data of the
+        file, or None if it has not been seen unchanged before.
+        """
+        row = self._connect().execute(
+            "SELECT c.digest, c.n, c.n_out, c.exit "
+            "FROM files f JOIN contents c ON c.digest = f.digest "
+            "WHERE f.path = ? AND f.mtime = ? AND f.size = ?",
+            (filePath, stat.st_mtime_ns, stat.st_size)).fetchone()
+        if row is None:
+            return None
+
+        self.hits += 1
+        self._touch(row[0])
+        return {"N": row[1], "N_OUT": row[2], "EXIT": row[3]}
+
+    def getContents(self, digest):
+        """
+        Looks file contents up by their hash, without counting or updating
+        anything so that it is safe to call from worker processes.
+
+        :param digest: The hash of the file contents (see digest).
+        :return: A dictionary of the "N", "N_OUT" and "EXIT" data of the
+        contents, or None if they have not been parsed before.
+        """
+        row = self._connect().execute(
+            "SELECT n, n_out, exit FROM contents WHERE digest = ?",
+            (digest,)).fetchone()
+        if row is None:
+            return None
+        return {"N": row[0], "N_OUT": row[1], "EXIT": row[2]}
+
+    def put(self, filePath, stat, digest, data, parsed=True):
+        """
+        Records the data extracted from a file, counting a miss if its
+        contents had to be parsed or a hit otherwise.
+
+        :param filePath: The path of the data file.
+        :param stat: The os.stat_result of the data file taken before it was
+        read.
+        :param digest: The hash of the file contents (see digest).
+        :param data: A dictionary containing at least the "N", "N_OUT" and
+        "EXIT" data of the file.
+        :param parsed: Whether the contents had to be parsed.
+        """
+        if parsed:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        connection = self._connect()
+        connection.execute(
+            "INSERT OR REPLACE INTO contents VALUES (?, ?, ?, ?, ?)",
+            (digest, data["N"], data["N_OUT"], data["EXIT"], self._tick()))
+        connection.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+            (filePath, stat.st_mtime_ns, stat.st_size, digest))
+
+    def flush(self):
+        """
+        Evicts the least recently used contents beyond the size bound and
+        commits everything recorded so far.
+        """
+        connection = self._connect()
+        connection.execute(
+            "DELETE FROM contents WHERE digest NOT IN "
+            "(SELECT digest FROM contents ORDER BY used DESC LIMIT ?)",
+            (self.maxEntries,))
+        connection.execute(
+            "DELETE FROM files WHERE digest NOT IN "
+            "(SELECT digest FROM contents)")
+        connection.commit()
+
+    def close(self, flush=True):
+        """
+        Flushes the cache and closes its connection, which is opened again
+        when needed.
+
+        :param flush: Whether to flush the cache first, which processes that
+        only read from it (see getContents) leave to the one writing.
+        """
+        if self._connection is not None:
+            if flush:
+                self.flush()
+            self._connection.close()
+            self._connection = None
+
+    def digest(self, contents):
+        """
+        Hashes the contents of a file.
+
+        :param contents: The contents of the file as bytes.
+        :return: The hash as a hexadecimal string.
+        """
+        return hashlib.blake2b(contents, digest_size=16).hexdigest()
+
+    def _touch(self, digest):
+        """
+        Marks file contents as the most recently used.
+
+        :param digest: The hash of the file contents.
+        """
+        self._connect().execute("UPDATE contents SET used = ? "
+                                "WHERE digest = ?", (self._tick(), digest))
+
+    def _tick(self):
+        """
+        Advances the clock ordering the uses of the cache entries.
+
+        :return: The new time of the clock.
+        """
+        self._clock += 1
+        return self._clock
+
+    def _connect(self):
+        """
+        Opens the cache file, creating its tables if needed, unless already
+        open.
+
+        :return: The SQLite connection.
+        """
+        import sqlite3
+        if self._connection is None:
+            connection = sqlite3.connect(self.cachePath, timeout=60)
+            # Lets the worker processes read while this one writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS contents "
+                               "(digest TEXT PRIMARY KEY, n TEXT, "
+                               "n_out TEXT, exit TEXT, used INTEGER)")
+            connection.execute("CREATE INDEX IF NOT EXISTS contents_used "
+                               "ON contents (used)")
+            connection.execute("CREATE TABLE IF NOT EXISTS files "
+                               "(path TEXT PRIMARY KEY, mtime INTEGER, "
+                               "size INTEGER, digest TEXT)")
+            connection.commit()
+            self._clock = connection.execute("SELECT MAX(used) FROM "
+                                             "contents").fetchone()[0] or 0
+            self._connection = connection
+        return self._connection
+
+
+class Database:
+    """
+    Responsible for managing the database. Namely for inputting entries and
+    querying.
+    """
+
+    def __init__(self, metrics=False, metadata=False):
+        """
+        A simple constructor.
+
+        :param metrics: Whether entries also hold the metrics of the other
+        outputs of the simulations (see Extractor.metricColumns), which are
+        then written after the other columns.
+        :param metadata: Whether entries also hold the metadata of the
+        folders of the simulations (see Extractor.metadataColumns), which is
+        then written after the other columns but before the metrics.
+        """
+        # Initializing formatting variables for CSV database file
+        self.dataOrder = ["FR", "ASH", "AWA", "N", "N_OUT",
+                          "EXIT", "MULTI", "DATE", "PATH"]
+        if metadata:
+            self.dataOrder += Extractor.metadataColumns
+        if metrics:
+            self.dataOrder += Extractor.metricColumns
+        self.template = len(self.dataOrder)*"{:<9} " + "\n"
+
+        # The rules an entry has to pass to be kept when sanitizing, each
+        # a function taking an entry and returning whether it passes
+        self.rules = [self.hasWorms, self.hasWholeHundredWorms]
+        # The only column the rules read, which lets Tables evaluate them
+        # once per distinct value, or None if they read several
+        self.ruleColumn = "N"
+
+    @instrumentation.stage
+    def read(self, databasePath):
+        """
+        Reads the the given database.
+
+        :param databasePath: The path to the database file.
+        :return: A list containing the database entries as dictionaries.
+        """
+        allEntries = []
+
+        with open(databasePath, "r") as database:
+            database = csv.reader(database,
+                                  delimiter=" ",
+                                  skipinitialspace=True)
+            header = next(database)
+
+            for data in database:
+                allEntries.append(dict(zip(header, data)))
+
+        return allEntries
+
+    def readTable(self, databasePath):
+        """
+        Reads the given database into a compact column oriented Table rather
+        than a list of dictionaries.
+
+        :param databasePath: The path to the database file.
+        :return: A Table containing the database entries.
+        """
+        with open(databasePath, "r") as database:
+            database = csv.reader(database,
+                                  delimiter=" ",
+                                  skipinitialspace=True)
+            header = next(database)
+            columns = [column for column in header if column]
+            table = Table(columns)
+
+            # Rows are added in chunks to keep memory bounded while still
+            # letting the table encode a column at a time
+            getColumns = operator.itemgetter(*[header.index(column)
+                                               for column in columns])
+            while True:
+                chunk = list(itertools.islice(database, 10000))
+                if not chunk:
+                    break
+                table.extend([getColumns(data) for data in chunk])
+
+        return table
+
+    def readBinary(self, databasePath):
+        """
+        Reads a database stored in the binary format (see createBinary). The
+        file is memory mapped so opening it is near instant and only the
+        pages holding the values that are used are ever read.
+
+        :param databasePath: The path to the binary database file.
+        :return: A read only Table containing the database entries.
+        """
+        return Table.readBinary(databasePath)
+
+    def createBinary(self, databasePath, entries):
+        """
+        Populates a database stored in the binary format, which holds each
+        column as fixed size numbers plus a table of its distinct strings.
+        Like create, the file is written to a temporary file first.
+
+        :param databasePath: The path to the binary database file.
+        :param entries: An iterable containing dictionaries which themselves
+        contain data for a single row in the database, or a Table.
+        """
+        if not isinstance(entries, Table):
+            entries = Table.fromEntries(entries, self.dataOrder)
+
+        tempPath = "{}.{}.tmp".format(databasePath, os.getpid())
+        try:
+            entries.writeBinary(tempPath)
+            os.replace(tempPath, databasePath)
+        except BaseException:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+            raise
+
+    def openSqlite(self, databasePath):
+        """
+        Opens a database stored in a SQLite file (see SqliteDatabase), which
+        query, sort and read accept in place of a list of entries.
+
+        :param databasePath: The path to the SQLite database file.
+        :return: The SqliteDatabase.
+        """
+        return SqliteDatabase(databasePath, self.dataOrder)
+
+    def readSqlite(self, databasePath):
+        """
+        Reads a database stored in a SQLite file.
+
+        :param databasePath: The path to the SQLite database file.
+        :return: A list containing the database entries as dictionaries.
+        """
+        database = self.openSqlite(databasePath)
+        try:
+            return database.read()
+        finally:
+            database.close()
+
+    def createSqlite(self, databasePath, entries):
+        """
+        Populates a database stored in a SQLite file, replacing its entries
+        in a single transaction so that readers never see a half written
+        database.
+
+        :param databasePath: The path to the SQLite database file.
+        :param entries: An iterable containing dictionaries which themselves
+        contain data for a single row in the database.
+        """
+        database = self.openSqlite(databasePath)
+        try:
+            database.create(entries)
+        finally:
+            database.close()
+
+    def upsertSqlite(self, databasePath, entries, deletedPaths=()):
+        """
+        Inserts entries into a database stored in a SQLite file, replacing
+        the entries with the same PATH, and deletes the entries of the given
+        paths in the same transaction.
+
+        :param databasePath: The path to the SQLite database file.
+        :param entries: An iterable containing dictionaries which themselves
+        contain data for a single row in the database.
+        :param deletedPaths: An iterable containing the PATH of each entry
+        to delete.
+        """
+        database = self.openSqlite(databasePath)
+        try:
+            database.upsert(entries, deletedPaths)
+        finally:
+            database.close()
+
+    def convertToBinary(self, textPath, binaryPath):
+        """
+        Converts a database from the text format to the binary format.
+
+        :param textPath: The path to the text database file.
+        :param binaryPath: The path to the binary database file.
+        """
+        self.createBinary(binaryPath, self.readTable(textPath))
+
+    def convertToText(self, binaryPath, textPath):
+        """
+        Converts a database from the binary format to the text format, with
+        the columns of the binary database.
+
+        :param binaryPath: The path to the binary database file.
+        :param textPath: The path to the text database file.
+        """
+        with self.readBinary(binaryPath) as table:
+            database = copy.copy(self)
+            database.dataOrder = table.columns
+            database.template = len(table.columns)*"{:<9} " + "\n"
+            database.create(textPath, table)
+
+    @instrumentation.stage
+    def create(self, databasePath, entries, chunkSize=10000):
+        """
+        Populates the database with entries.
+
+        The file is opened once and the formatted entries are written in
+        chunks to a temporary file which then replaces the database, so that
+        readers never see a half written database.
+
+        :param databasePath: The path to the database file.
+        :param entries: An iterable containing dictionaries which themselves
+        contain data for a single row in the database.
+        :param chunkSize: The number of entries formatted per write.
+        """
+        tempPath = "{}.{}.tmp".format(databasePath, os.getpid())
+        try:
+            with open(tempPath, "w") as database:
+                database.write(self.template.format(*self.dataOrder))
+
+                chunk = []
+                for entry in entries:
+                    chunk.append(self.formatEntry(entry))
+                    if len(chunk) >= chunkSize:
+                        database.write("".join(chunk))
+                        chunk = []
+                database.write("".join(chunk))
+            os.replace(tempPath, databasePath)
+        except BaseException:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+            raise
+
+    @instrumentation.stage
+    def query(self, database, query):
+        """
+        Queries the database with the filters specified in the .ini file and
+        generates the output in a file specified in the .ini as well.
+
+        :param database: A list containing database entries as dictionaries,
+        a DatabaseIndex over them (see index) when querying repeatedly, a
+        Table or a SqliteDatabase.
+        :param query: A dictionary containing the query data.
+        :return: A list containing dictionaries which themselves contain data
+        for a single row in the database, or a Table if given one.
+        """
+        if isinstance(database, Table):
+            return database.filter(query)
+        if isinstance(database, SqliteDatabase):
+            return database.query(query)
+        if not isinstance(database, DatabaseIndex):
+            database = DatabaseIndex(database)
+        return database.query(query)
+
+    def index(self, database):
+        """
+        Builds an index over the database so that repeated queries avoid
+        scanning every entry.
+
+        :param database: A list containing database entries as dictionaries.
+        :return: A DatabaseIndex which can be passed to query in place of
+        the list.
+        """
+        return DatabaseIndex(database)
+
+    @instrumentation.stage
+    def sort(self, database):
+        """
+        Sorts the database in ascending number based on the fructose
+        concentration followed by the ASH value.
+
+        :param database: A list containing database entries as dictionaries,
+        a Table or a SqliteDatabase.
+        :return: A list containing the sorted database entries as dictionaries,
+        or a Table if given one.
+        """
+        if isinstance(database, Table):
+            return database.sort(["FR", "ASH"])
+        if isinstance(database, SqliteDatabase):
+            return database.sort()
+        sortedDatabase = sorted(database, key=self._sortKey)
+        return sortedDatabase
+
+    def sorter(self, chunkSize=100000):
+        """
+        Creates a sorter which sorts entries the same way as sort but spills
+        them to temporary files whenever too many are held in memory.
+
+        :param chunkSize: The maximum number of entries held in memory.
+        :return: An ExternalSorter to which entries can be added.
+        """
+        return ExternalSorter(self._sortKey, chunkSize)
+
+    @instrumentation.stage
+    def sanitize(self, database):
+        """
+        Sanitizes the database by removing results that are not considered
+        interesting (see partition).
+
+        :param database: A list containing database entries as dictionaries,
+        or a Table.
+        :return: A list containing the sanatized database entries as
+        dictionaries, or a Table if given one.
+        """
+        return self.partition(database)[0]
+
+    @instrumentation.stage
+    def partition(self, database):
+        """
+        Splits the database in a single pass into the results that are
+        considered interesting and the ones that are not.
+
+        Namely, it keeps results passing every one of the rules, which by
+        default remove results where the number of worms is zero or not a
+        multiple of 100 (implying an error in the data itself).
+
+        :param database: A list containing database entries as dictionaries,
+        or a Table.
+        :return: A tuple of the kept and the ignored entries, each a list
+        containing database entries as dictionaries in database order, or a
+        Table if given one.
+        """
+        isSanitary = self.isSanitary
+        column = self.ruleColumn
+        if isinstance(database, Table) and column is not None:
+            passes = {}
+
+            def isKept(value):
+                if value not in passes:
+                    passes[value] = isSanitary({column: value})
+                return passes[value]
+
+            return database.select(column, isKept), \
+                database.select(column, lambda value: not isKept(value))
+
+        if isinstance(database, Table):
+            kept = array.array("I")
+            ignored = array.array("I")
+            for i, entry in enumerate(database):
+                (kept if isSanitary(entry) else ignored).append(i)
+            return database.take(kept), database.take(ignored)
+
+        kept = []
+        ignored = []
+        for entry in database:
+            (kept if isSanitary(entry) else ignored).append(entry)
+        return kept, ignored
+
+    def isSanitary(self, entry):
+        """
+        Checks whether an entry passes every rule (see partition).
+
+        :param entry: A dictionary containing the data for a single row in
+        the database.
+        :return: True if the entry should be kept, False otherwise.
+        """
+        for rule in self.rules:
+            if not rule(entry):
+                return False
+        return True
+
+    def hasWorms(self, entry):
+        """
+        A rule removing results without any worm.
+
+        :param entry: A dictionary containing the data for a single row in
+        the database.
+        :return: True if the entry should be kept, False otherwise.
+        """
+        return int(entry["N"]) != 0
+
+    def hasWholeHundredWorms(self, entry):
+        """
+        A rule removing results whose number of worms is not a multiple of
+        100, as simulations run worms by the hundred.
+
+        :param entry: A dictionary containing the data for a single row in
+        the database.
+        :return: True if the entry should be kept, False otherwise.
+        """
+        return int(entry["N"]) % 100 == 0
+
+    def _sortKey(self, entry):
+        """
+        The key by which database entries are sorted.
+
+        :param entry: A dictionary containing the data for a single row in
+        the database.
+        :return: A tuple of the fructose concentration and ASH value.
+        """
+        if isinstance(entry, TableRow):
+            return entry.number("FR"), entry.number("ASH")
+        return valueNumbers[entry["FR"]], valueNumbers[entry["ASH"]]
+
+    def formatEntry(self, data):
+        """
+        Formats the given entry data into a row of the database.
+
+        :param data: A dictionary containing the data for a single row in
+        the database.
+        :return: The row formatted prettily as a string.
+        """
+        orderedData = [data[order] for order in self.dataOrder]
+        return self.template.format(*orderedData)
+
+
+class ExternalSorter:
+    """
+    Responsible for sorting more entries than fit in memory. Entries are
+    collected into chunks which are sorted and spilled to temporary files
+    once full, then all the chunks are lazily merged. The sort is stable.
+    """
+
+    def __init__(self, key, chunkSize=100000):
+        """
+        A simple constructor.
+
+        :param key: The function by which entries are sorted.
+        :param chunkSize: The maximum number of entries held in memory.
+        """
+        self.key = key
+        self.chunkSize = chunkSize
+        self.count = 0
+        self._chunk = []
+        self._spilled = []      # Temporary files holding the sorted chunks
+
+    def add(self, entry):
+        """
+        Adds an entry to be sorted.
+
+        :param entry: A dictionary containing the data for a single row in
+        the database.
+        """
+        self._chunk.append(entry)
+        self.count += 1
+        if len(self._chunk) >= self.chunkSize:
+            self._spill()
+
+    def sorted(self):
+        """
+        Merges all the entries added so far in sorted order. Chunks are
+        merged in the order they were spilled, which keeps the sort stable.
+
+        :return: A generator yielding the sorted entries.
+        """
+        if not self._spilled:
+            yield from sorted(self._chunk, key=self.key)
+            return
+
+        if self._chunk:
+            self._spill()
+        try:
+            chunks = [self._readChunk(file) for file in self._spilled]
+            yield from heapq.merge(*chunks, key=self.key)
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Deletes the temporary files holding the spilled chunks.
+        """
+        for file in self._spilled:
+            file.close()
+        self._spilled = []
+
+    def _spill(self):
+        """
+        Sorts the entries held in memory and writes them to a temporary file.
+        """
+        import tempfile
+        file = tempfile.TemporaryFile()
+        for entry in sorted(self._chunk, key=self.key):
+            pickle.dump(entry, file, pickle.HIGHEST_PROTOCOL)
+        file.seek(0)
+        self._spilled.append(file)
+        self._chunk = []
+
+    def _readChunk(self, file):
+        """
+        Reads back the entries of a spilled chunk one at a time.
+
+        :param file: The temporary file holding the chunk.
+        :return: A generator yielding the entries of the chunk.
+        """
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+
+
+class Table:
+    """
+    Responsible for holding database entries compactly in columns rather
+    than as a dictionary of strings per entry.
+
+    Every column stores each of its distinct strings once and every row as
+    an integer code into them (except PATH whose values are all distinct).
+    Numeric columns also hold the value of every row as a double so that
+    filtering and sorting never parse a string. Filtering and sorting return
+    read only views which share the columns and only hold the indices of
+    their rows. Rows are exposed as read only TableRow views which behave
+    like the dictionaries of a database read by Database.read.
+    """
+
+    numericColumns = ("FR", "ASH", "AWA", "N", "N_OUT", "EXIT", "MULTI")
+    uniqueColumns = ("PATH",)
+    binaryMagic = b"SWEEPDB1"
+
+    def __init__(self, columns):
+        """
+        A simple constructor.
+
+        :param columns: A list containing the names of the columns.
+        """
+        self.columns = list(columns)
+        self._codes = {}        # Maps a column to the code of each row
+        self._strings = {}      # Maps a column to its distinct strings
+        self._lookup = {}       # Maps a column to a string to code mapping
+        self._numbers = {}      # Maps a numeric column to each row's value
+        self._parsed = {}       # Maps a numeric column to each string's value
+        self._count = 0         # The number of rows stored in the columns
+        self._rows = None       # The stored rows of a view, None otherwise
+        self._mapped = None     # The file mapped by readBinary, if any
+
+        for column in self.columns:
+            self._strings[column] = []
+            if column in self.uniqueColumns:
+                continue
+            self._codes[column] = array.array("I")
+            self._lookup[column] = {}
+            if column in self.numericColumns:
+                self._numbers[column] = array.array("d")
+                self._parsed[column] = []
+
+    @classmethod
+    def fromEntries(cls, entries, columns=None):
+        """
+        Builds a table from database entries.
+
+        :param entries: An iterable containing database entries as
+        dictionaries.
+        :param columns: A list containing the names of the columns, defaults
+        to the columns of the database file.
+        :return: A Table containing the entries.
+        """
+        table = cls(columns or Database().dataOrder)
+        for entry in entries:
+            table.append(entry)
+        return table
+
+    def append(self, entry):
+        """
+        Appends an entry to the end of the table.
+
+        :param entry: A dictionary containing the data for a single row in
+        the database.
+        """
+        self.extend([[entry[column] for column in self.columns]])
+
+    def extend(self, rows):
+        """
+        Appends rows to the end of the table one column at a time, which is
+        considerably faster than appending them one by one.
+
+        :param rows: A list containing each row as a list of its values (as
+        strings) in the order of the columns.
+        """
+        if self._rows is not None or self._lookup is None:
+            raise TypeError("Cannot extend a read only table")
+        if not rows:
+            return
+
+        for column, values in zip(self.columns, zip(*rows)):
+            strings = self._strings[column]
+            if column in self.uniqueColumns:
+                strings.extend(values)
+                continue
+
+            # Stores the strings (and their numbers) not seen before
+            lookup = self._lookup[column]
+            for value in dict.fromkeys(values):
+                if value not in lookup:
+                    lookup[value] = len(strings)
+                    strings.append(value)
+                    if column in self.numericColumns:
+                        self._parsed[column].append(self._parse(value))
+
+            codes = array.array("I", map(lookup.__getitem__, values))
+            self._codes[column].extend(codes)
+            if column in self.numericColumns:
+                self._numbers[column].extend(
+                    map(self._parsed[column].__getitem__, codes))
+        self._count += len(rows)
+
+    def _parse(self, value):
+        """
+        :param value: The value of a numeric column as a string.
+        :return: The value as a number, or NaN if it is not a number.
+        """
+        try:
+            return float(value)
+        except ValueError:
+            return float("nan")
+
+    @classmethod
+    def readBinary(cls, path):
+        """
+        Memory maps a table written by writeBinary. The columns are views
+        into the mapped file so nothing is read until it is used.
+
+        :param path: The path to the binary file.
+        :return: A read only Table.
+        """
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        table = None
+        try:
+            table = cls._mapBinary(path, mapped, view)
+        finally:
+            if table is None:
+                view.release()
+                mapped.close()
+        return table
+
+    @classmethod
+    def _mapBinary(cls, path, mapped, view):
+        """
+        Builds the table of readBinary from the mapped file.
+
+        :param path: The path to the binary file.
+        :param mapped: The mmap of the file.
+        :param view: A memoryview of the mapped file.
+        :return: A read only Table.
+        """
+
+        if bytes(view[:8]) != cls.binaryMagic:
+            raise ValueError("The following file is not a binary database, "
+                             "{}".format(path))
+        offset, length = struct.unpack_from("<QQ", mapped, 8)
+        directory = json.loads(bytes(view[offset:offset + length]).decode())
+        if directory["byteorder"] != sys.byteorder:
+            raise ValueError("The following binary database was written on "
+                             "a {} endian machine, {}"
+                             .format(directory["byteorder"], path))
+
+        rows = directory["rows"]
+        table = cls([column["name"] for column in directory["columns"]])
+        table._count = rows
+        table._lookup = None
+        table._parsed = None
+        table._mapped = mapped
+        table._view = view
+
+        for column in directory["columns"]:
+            name = column["name"]
+            table._strings[name] = MappedStrings(
+                view, column["strings"], name not in cls.uniqueColumns)
+            if column["codes"] is not None:
+                start = column["codes"]
+                table._codes[name] = view[start:start + 4*rows].cast("I")
+            if column["numbers"] is not None:
+                start = column["numbers"]
+                table._numbers[name] = view[start:start + 8*rows].cast("d")
+        return table
+
+    def close(self):
+        """
+        Closes the file mapped by readBinary, after which the table and the
+        tables derived from it can no longer be read. Tables can also be
+        closed by using them as context managers.
+        """
+        if self._mapped is None:
+            return
+        for strings in self._strings.values():
+            strings.release()
+        for columns in (self._codes, self._numbers):
+            for values in columns.values():
+                values.release()
+        self._view.release()
+        self._mapped.close()
+        self._mapped = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def writeBinary(self, path):
+        """
+        Writes the table in a binary format made of a header, a block per
+        column holding its strings, codes and numbers, and a directory of
+        where each block starts.
+
+        :param path: The path to the binary file.
+        """
+        directory = {"rows": len(self), "byteorder": sys.byteorder,
+                     "columns": []}
+
+        with open(path, "wb") as file:
+            file.write(self.binaryMagic + struct.pack("<QQ", 0, 0))
+
+            for column in self.columns:
+                strings = self._strings[column]
+                if column in self.uniqueColumns:
+                    strings = self._stored(strings)
+                entry = {"name": column,
+                         "strings": self._writeStrings(file, strings),
+                         "codes": None,
+                         "numbers": None}
+
+                if column not in self.uniqueColumns:
+                    entry["codes"] = self._writeArray(
+                        file, "I", self._stored(self._codes[column]))
+                if column in self._numbers:
+                    entry["numbers"] = self._writeArray(
+                        file, "d", self._stored(self._numbers[column]))
+                directory["columns"].append(entry)
+
+            directoryBytes = json.dumps(directory).encode()
+            offset = file.tell()
+            file.write(directoryBytes)
+            file.seek(len(self.binaryMagic))
+            file.write(struct.pack("<QQ", offset, len(directoryBytes)))
+
+    def _writeStrings(self, file, strings):
+        """
+        Writes a string table made of the end offset of every string
+        followed by the strings themselves encoded as UTF-8.
+
+        :param file: The binary file being written.
+        :param strings: An iterable containing the strings.
+        :return: A list of where the offsets start, the number of strings
+        and where the strings start.
+        """
+        encoded = [string.encode() for string in strings]
+        offsets = array.array("Q", itertools.accumulate(map(len, encoded)))
+        start = self._writeArray(file, "Q", offsets)
+        blob = file.tell()
+        file.write(b"".join(encoded))
+        return [start, len(encoded), blob]
+
+    def _writeArray(self, file, typecode, values):
+        """
+        Writes numbers as a contiguous array aligned to eight bytes.
+
+        :param file: The binary file being written.
+        :param typecode: The array type code of the numbers.
+        :param values: An iterable containing the numbers.
+        :return: The position in the file where the array starts.
+        """
+        file.write(b"\0" * (-file.tell() % 8))
+        start = file.tell()
+        array.array(typecode, values).tofile(file)
+        return start
+
+    def value(self, column, i):
+        """
+        :param column: The name of the column.
+        :param i: The index of the row.
+        :return: The value of the row in the column as a string.
+        """
+        if self._rows is not None:
+            i = self._rows[i]
+        if column in self.uniqueColumns:
+            return self._strings[column][i]
+        return self._strings[column][self._codes[column][i]]
+
+    def number(self, column, i):
+        """
+        :param column: The name of a numeric column.
+        :param i: The index of the row.
+        :return: The value of the row in the column as a number.
+        """
+        if self._rows is not None:
+            i = self._rows[i]
+        return self._numbers[column][i]
+
+    def numbers(self, column):
+        """
+        :param column: The name of a numeric column.
+        :return: An array containing the value of each row as a number.
+        """
+        if self._rows is None:
+            return self._numbers[column]
+        return array.array("d", self._stored(self._numbers[column]))
+
+    def filter(self, query):
+        """
+        Selects the rows whose values numerically equal every value of the
+        query (the same semantics as Database.query).
+
+        :param query: A dictionary containing the query data.
+        :return: A Table view containing the matched rows in order.
+        """
+        indices = range(len(self))
+        for column, value in query.items():
+            value = float(value)
+            if column in self._numbers:
+                numbers = self._numbers[column]
+                if self._rows is not None:
+                    indices = list(indices)
+                    numbers = map(numbers.__getitem__,
+                                  map(self._rows.__getitem__, indices))
+                else:
+                    numbers = map(numbers.__getitem__, indices)
+            else:
+                numbers = (float(self.value(column, i)) for i in indices)
+            indices = list(itertools.compress(indices,
+                                              map(value.__eq__, numbers)))
+        return self.take(indices)
+
+    def select(self, column, predicate):
+        """
+        Selects the rows for which the predicate holds on the value of the
+        given column. The predicate is evaluated once per distinct value.
+
+        :param column: The name of the column.
+        :param predicate: A function taking a value (as a string) and
+        returning whether its rows should be selected.
+        :return: A Table view containing the selected rows in order.
+        """
+        if column in self.uniqueColumns:
+            selected = map(predicate, self._stored(self._strings[column]))
+        else:
+            codes = {code for code, value in enumerate(self._strings[column])
+                     if predicate(value)}
+            selected = map(codes.__contains__,
+                           self._stored(self._codes[column]))
+        return self.take(itertools.compress(range(len(self)), selected))
+
+    def sort(self, columns):
+        """
+        Sorts the rows in ascending numeric order of the given columns. The
+        sort is stable.
+
+        :param columns: A list containing the names of numeric columns.
+        :return: A Table view containing the sorted rows.
+        """
+        keys = list(zip(*[self._stored(self._numbers[column])
+                          for column in columns]))
+        return self.take(sorted(range(len(self)), key=keys.__getitem__))
+
+    def take(self, indices):
+        """
+        Builds a read only view of the given rows which shares the columns
+        of this table.
+
+        :param indices: An iterable containing the indices of the rows.
+        :return: A Table view containing the rows in the order of the indices.
+        """
+        if self._rows is not None:
+            indices = map(self._rows.__getitem__, indices)
+        table = copy.copy(self)
+        table._rows = array.array("I", indices)
+        return table
+
+    def _stored(self, values):
+        """
+        :param values: A sequence containing a value per stored row.
+        :return: An iterable containing the value of each row of this table.
+        """
+        if self._rows is None:
+            return values
+        return map(values.__getitem__, self._rows)
+
+    def __len__(self):
+        if self._rows is not None:
+            return len(self._rows)
+        return self._count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Table row index out of range")
+        return TableRow(self, i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield TableRow(self, i)
+
+
+class MappedStrings(collections.abc.Sequence):
+    """
+    A read only sequence of the strings of a string table inside a memory
+    mapped binary database, decoded only when accessed.
+    """
+
+    def __init__(self, view, location, cached):
         """
-        paths = filePath.split(os.sep)
-        folder, file = paths[-2], paths[-1]
+        A simple constructor.
 
-        # Extracting data from the folder name. The convention
-        # is "date_<letter>_fructose"
-        folder = folder.split("_")
+        :param view: A memoryview of the mapped file.
+        :param location: A list of where the offsets start, the number of
+        strings and where the strings start (see Table._writeStrings).
+        :param cached: Whether decoded strings are kept, which is worthwhile
+        for columns with few distinct strings.
+        """
+        start, count, blob = location
+        self._ends = view[start:start + 8*count].cast("Q")
+        self._blob = view[blob:]
+        self._cache = {} if cached else None
+
+    def __getitem__(self, i):
+        if self._cache is not None and i in self._cache:
+            return self._cache[i]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("String index out of range")
+
+        start = self._ends[i - 1] if i else 0
+        string = bytes(self._blob[start:self._ends[i]]).decode()
+        if self._cache is not None:
+            self._cache[i] = string
+        return string
+
+    def __len__(self):
+        return len(self._ends)
+
+    def release(self):
+        """
+        Releases the views into the mapped file.
+        """
+        self._ends.release()
+        self._blob.release()
 
-        if len(folder) == 3:
-            simDate = folder[0]
-            fructose = folder[-1]
-        elif len(folder) == 4:
-            simDate = folder[1]
-            fructose = folder[-1]
-        else:
-            raise NameError("The following folder is named inconsistently, {}"
-                            .format(filePath))
 
-        # Extracting data from the file name
-        file = file.split("_")
-        file = file[-1]     # Only the end contains useful data
-        file = file.rstrip(".csv")
-        file = file.split("&")
-        uniMulti, awa, ash, = file
+class TableRow(collections.abc.Mapping):
+    """
+    A read only view of a single row of a Table which behaves like the
+    dictionary of a database entry.
+    """
 
-        dataExtracted = \
-        {
-            "FR":       fructose,
-            "MULTI":    uniMulti,
-            "ASH":      ash,
-            "AWA":      awa,
-            "PATH":     filePath,
-            "DATE":     simDate
-        }
-        return dataExtracted
+    __slots__ = ("table", "index")
 
-    def _extractDataFromFile(self, filePath):
+    def __init__(self, table, index):
         """
-        Reads the given file name, parses the contents to extract data.
-        The data parsed contains: the total number of worms, the worms
-        exited, percentage exited (calculated), and file name.
+        A simple constructor.
 
-        :param filePath: The path of the data file from the root directory.
-        The root directory should be the "results" directory otherwise it
-        should be two directories above a data file.
-        :return: A dictionary containing the data extracted from the file
-        contents.
+        :param table: The table holding the row.
+        :param index: The index of the row in the table.
         """
-        with open(filePath, "r") as file:
-            header = file.readline()    # Skips first line containing header
-            wormCount = 0
-            wormExitedCount = 0
+        self.table = table
+        self.index = index
 
-            for i, entry in enumerate(file, start=1):
-                # Skips over blank lines
-                if not entry.strip():
-                    continue
+    def number(self, column):
+        """
+        :param column: The name of a numeric column.
+        :return: The value of the row in the column as a number.
+        """
+        return self.table.number(column, self.index)
 
-                # Attempts to extract data for each entry1
-                try:
-                    wormNum, timeExited = entry.rstrip().split(",")
-                except ValueError as e:
-                    raise ValueError("Unable to parse line {} from the "
-                                     "following file: {}".format(i+1, filePath))
-
-                # Counting total worms and those that exited
-                wormCount += 1
-                if float(timeExited) != -1.0:
-                    wormExitedCount += 1
-
-            # Avoiding the formation of a blackhole by dividing by zero
-            if wormCount:
-                exit = str(float(wormExitedCount) / float(wormCount))
-            else:
-                exit = "0"
+    def __getitem__(self, column):
+        return self.table.value(column, self.index)
 
-            dataExtracted = \
-            {
-            "N":        str(wormCount),
-            "N_OUT":    str(wormExitedCount),
-            "EXIT":     exit,
-            "PATH":     filePath
-            }
-            return dataExtracted
+    def __iter__(self):
+        return iter(self.table.columns)
 
-    def _listAllFilePaths(self, dataDirPath):
-        """
-        Lists all the relevant paths from the results directory to the data
-        files. Initially, lists all existing files in the results directory
-        then proceeds to filter out irrelevant ones.
+    def __len__(self):
+        return len(self.table.columns)
 
-        :param dataDirPath: The path to the directory that hosts all the data.
-        :return: A list containing all the paths from the results directory
-        to the data files.
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class DatabaseIndex:
+    """
+    Responsible for answering equality queries on the database entries
+    without scanning all of them. Values are parsed into numbers once per
+    column and entries are grouped by the values of the queried keys, so
+    each lookup is a single dictionary access.
+    """
+
+    def __init__(self, entries):
         """
-        allPaths = []
-        pathList = []
+        A simple constructor.
 
-        # Generate all the paths for all files starting from the rootPath
-        for root, dirs, files in os.walk(dataDirPath):
-            for file in files:
-                pathFromRoot = os.path.join(root, file)
-                allPaths.append(pathFromRoot)
+        :param entries: A list containing database entries as dictionaries,
+        or a Table whose numeric columns are used without parsing.
+        """
+        self.entries = entries
+        self._columns = {}      # Maps a key to its values parsed as numbers
+        if isinstance(entries, Table):
+            self.entries = list(entries)
+            self._columns = {column: entries.numbers(column)
+                             for column in Table.numericColumns
+                             if column in entries.columns}
+        self._lookups = {}      # Maps a tuple of keys to its grouped entries
+
+    def query(self, query):
+        """
+        Finds the entries whose values numerically equal every value of the
+        query (the same semantics as Database.query).
 
-        # Filter out invalid paths (e.g. paths that point to .txt files
-        # instead of csv files, or paths that contain
-        # "in_spot_processed_output instead of "exit_time_raw_output")
-        for pathFromRoot in allPaths:
+        :param query: A dictionary containing the query data.
+        :return: A list containing the matched entries in database order.
+        """
+        keys = tuple(sorted(query))
+        values = tuple(float(query[key]) for key in keys)
 
-            # Remove all path components except the last two parts which
-            # have the data dir, and data file respectively
-            path = pathFromRoot.split(os.sep)
-            dataDir, file = path[-2], path[-1]
+        lookup = self._lookups.get(keys)
+        if lookup is None:
+            lookup = self._buildLookup(keys)
+            self._lookups[keys] = lookup
 
-            # Filter file paths based on file name and extension
-            if file.endswith(".csv") and "exit_time_raw_output" in file:
-                    path = os.path.join(dataDir, file)
-                    pathList.append(path)
+        return list(lookup.get(values, []))
 
-        return pathList
+    def _buildLookup(self, keys):
+        """
+        Groups the entries by their numeric values for the given keys.
 
-    def _initializeLogFile(self, filePath):
+        :param keys: A tuple containing the keys of a query.
+        :return: A dictionary mapping a tuple of values to a list containing
+        the entries having those values.
         """
-        Deletes the log file if it already exists.
+        lookup = {}
+        columns = [self._column(key) for key in keys]
+        for i, entry in enumerate(self.entries):
+            values = tuple(column[i] for column in columns)
+            lookup.setdefault(values, []).append(entry)
+        return lookup
+
+    def _column(self, key):
+        """
+        Parses every value of the given key into a number, only once.
 
-        :param filePath: The path to the log file.
+        :param key: The key (i.e. database column) to parse.
+        :return: A list containing the parsed value of each entry.
         """
-        if os.path.exists(filePath):
-            os.remove(filePath)
+        column = self._columns.get(key)
+        if column is None:
+            parse = valueNumbers.__getitem__ if key in ValuePool.columns \
+                else float
+            column = [parse(entry[key]) for entry in self.entries]
+            self._columns[key] = column
+        return column
 
 
-class Database:
+class SqliteDatabase:
     """
-    Responsible for managing the database. Namely for inputting entries and
-    querying.
+    Responsible for storing the database in a SQLite file, as an
+    alternative to the text and binary formats which can only be rewritten
+    in full. Entries can be upserted by their PATH, and queries on the
+    fructose concentration, ASH, AWA and MULTI values are lookups in a
+    composite index rather than scans.
+
+    The file is in WAL mode and every write is a single transaction so
+    readers (e.g. another process querying while the database is being
+    generated) keep seeing the previous database until a write is committed.
+
+    Numbers are stored as integers and reals so that they compare and sort
+    numerically. The few whose text would not read back the same (e.g.
+    "0.20") also have their text kept in the _TEXT column of their row.
     """
 
-    def __init__(self):
+    # The leading columns of the composite index, most selective first
+    indexColumns = ("FR", "ASH", "AWA", "MULTI")
+
+    def __init__(self, databasePath, columns):
         """
         A simple constructor.
+
+        :param databasePath: The path to the SQLite database file.
+        :param columns: A list containing the columns of the entries, in
+        order, which must include "PATH".
         """
-        # Initializing formatting variables for CSV database file
-        self.dataOrder = ["FR", "ASH", "AWA", "N", "N_OUT",
-                          "EXIT", "MULTI", "DATE", "PATH"]
-        self.template = len(self.dataOrder)*"{:<9} " + "\n"
+        self.databasePath = databasePath
+        self.columns = list(columns)
+        self._numeric = [(column, column in Table.numericColumns)
+                         for column in self.columns]
+        self._connection = None
 
-    def read(self, databasePath):
+    def __getstate__(self):
         """
-        Reads the the given database.
+        Leaves the connection out when pickled, which is opened again when
+        needed.
 
-        :param databasePath: The path to the database file.
-        :return: A list containing the database entries as dictionaries.
+        :return: A dictionary of the attributes to pickle.
         """
-        allEntries = []
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
 
-        with open(databasePath, "r") as database:
-            database = csv.reader(database,
-                                  delimiter=" ",
-                                  skipinitialspace=True)
-            header = next(database)
+    def read(self):
+        """
+        Reads every entry in the order they were first written.
 
-            for data in database:
-                allEntries.append(dict(zip(header, data)))
+        :return: A list containing the entries as dictionaries of strings,
+        like the ones of Database.read.
+        """
+        return self._select("ORDER BY rowid", ())
 
-        return allEntries
+    def create(self, entries):
+        """
+        Replaces every entry of the database in a single transaction.
 
-    def create(self, databasePath, entries):
+        :param entries: An iterable containing dictionaries which themselves
+        contain data for a single row in the database, whose PATH values are
+        all distinct.
         """
-        Populates the database with entries.
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DROP TABLE IF EXISTS entries")
+            self._createTable(connection)
+            connection.executemany(self._insert(""),
+                                   map(self._values, entries))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def upsert(self, entries, deletedPaths=()):
+        """
+        Inserts the given entries, replacing the values of the ones whose
+        PATH is already in the database (which keep their position), and
+        deletes the entries of the given paths in the same transaction.
 
-        :param databasePath: The path to the database file.
-        :param entries: A list containing dictionaries which themselves
+        :param entries: An iterable containing dictionaries which themselves
         contain data for a single row in the database.
+        :param deletedPaths: An iterable containing the PATH of each entry
+        to delete.
+        """
+        updates = ", ".join('"{0}" = excluded."{0}"'.format(column)
+                            for column in self.columns + ["_TEXT"]
+                            if column != "PATH")
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("DELETE FROM entries WHERE PATH = ?",
+                                   ((path,) for path in deletedPaths))
+            connection.executemany(
+                self._insert("ON CONFLICT (PATH) DO UPDATE SET " + updates),
+                map(self._values, entries))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def delete(self, paths):
         """
-        self._initializeDataFile(databasePath)
+        Deletes the entries of the given paths.
 
-        for entry in entries:
-            self._writeEntry(databasePath, entry)
+        :param paths: An iterable containing the PATH of each entry.
+        """
+        self.upsert((), paths)
 
-    def query(self, database, query):
+    def query(self, query):
         """
-        Queries the database with the filters specified in the .ini file and
-        generates the output in a file specified in the .ini as well.
+        Finds the entries whose values numerically equal every value of the
+        query (the same semantics as Database.query) through the index.
 
-        :param database: A list containing database entries as dictionaries.
         :param query: A dictionary containing the query data.
-        :return: A list containing dictionaries which themselves contain data
-        for a single row in the database.
+        :return: A list containing the matched entries in database order.
+        """
+        keys = sorted(query)
+        for key in keys:
+            if key not in self.columns:
+                raise KeyError(key)
+        where = " AND ".join('"{}" = ?'.format(key) for key in keys)
+        return self._select("WHERE {} ORDER BY rowid".format(where),
+                            [float(query[key]) for key in keys])
+
+    def sort(self):
         """
-        totalCriteria = len(query)
-        validMatches = []
+        Reads every entry sorted like Database.sort does, ties being kept in
+        database order.
 
-        # For every entry1 in the database, checks whether the query
-        # criteria are matched, and if so then stores the line.
-        for entry in database:
+        :return: A list containing the sorted entries as dictionaries.
+        """
+        return self._select("ORDER BY FR, ASH, rowid", ())
 
-            # Counts the number of criteria matches
-            criteriaMatched = 0
-            for key in query.keys():
-                if float(query[key]) == float(entry[key]):
-                    criteriaMatched += 1
+    def close(self):
+        """
+        Closes the connection to the database file.
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
 
-            # If all the criteria match then the result is stored
-            if criteriaMatched == totalCriteria:
-                validMatches.append(entry)
+    def __len__(self):
+        """
+        :return: The number of entries.
+        """
+        self._connect()
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM entries").fetchone()[0]
 
-        return validMatches
+    def _select(self, clause, parameters):
+        """
+        Selects entries and turns them back into dictionaries of strings.
 
-    def sort(self, database):
+        :param clause: The SQL following the FROM clause.
+        :param parameters: The parameters of the clause.
+        :return: A list containing the selected entries as dictionaries.
         """
-        Sorts the database in ascending number based on the fructose
-        concentration followed by the ASH value.
+        columns = ", ".join('"{}"'.format(column) for column in self.columns)
+        rows = self._connect().execute(
+            "SELECT {}, _TEXT FROM entries {}".format(columns, clause),
+            parameters)
+
+        entries = []
+        for row in rows:
+            entry = dict(zip(self.columns,
+                             ("" if value is None else str(value)
+                              for value in row[:-1])))
+            if row[-1] is not None:
+                entry.update(json.loads(row[-1]))
+            entries.append(valueStrings.internEntry(entry))
+        return entries
+
+    def _insert(self, conflict):
+        """
+        Builds the statement inserting a single entry.
 
-        :param database: A list containing database entries as dictionaries.
-        :return: A list containing the sorted database entries as dictionaries.
+        :param conflict: The SQL handling an entry whose PATH exists.
+        :return: The statement.
         """
-        sortedDatabase = sorted(database, key=lambda k: (float(k["FR"]),
-                                                         float(k["ASH"])))
-        return sortedDatabase
+        return "INSERT INTO entries VALUES ({}) {}".format(
+            ", ".join("?" * (len(self.columns) + 1)), conflict)
 
-    def sanitize(self, database):
+    def _values(self, entry):
         """
-        Sanitizes the database by removing results that are not considered
-        interesting.
+        Turns an entry into the values of its row, where numbers are stored
+        as integers or reals as written (e.g. "1.0" stays a real and reads
+        back the same) so that they compare and sort numerically.
 
-        Namely, it removes results where the number of worms is zero or not a
-        multiple of 100 (implying an error in the data itself).
+        :param entry: A dictionary containing data for a single row.
+        :return: A tuple containing the value of every column followed by
+        the texts of the numbers that would not read back the same, if any.
+        """
+        values = []
+        texts = None
+        for column, numeric in self._numeric:
+            value = entry[column]
+            if numeric:
+                number = self._number(value)
+                if isinstance(value, str) and str(number) != value:
+                    texts = texts or {}
+                    texts[column] = value
+                value = number
+            values.append(value)
+        values.append(None if texts is None else json.dumps(texts))
+        return values
+
+    def _number(self, value):
+        """
+        Parses the value of a numeric column.
 
-        :param database: A list containing database entries as dictionaries.
-        :return: A list containing the sanatized database entries as
-        dictionaries.
+        :param value: The value as a string.
+        :return: The value as an integer if written as one, as a real if
+        written as a finite one (e.g. "0.5" or "1e-05"), or else (e.g.
+        "NaN") as it is.
+        """
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            pass
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return value
+        return number if math.isfinite(number) else value
+
+    def _createTable(self, connection):
         """
-        sanitizedEntries = []
+        Creates the entries table and its indexes if they do not exist.
 
-        for i, entry in enumerate(database):
-            worms = int(entry["N"])
-            if worms != 0 and worms % 100 == 0:
-                sanitizedEntries.append(entry)
+        Numeric columns are declared without a type so that SQLite keeps
+        the integers and reals they are given as they are, whereas the
+        numeric affinity would turn reals such as 1.0 into integers.
+
+        :param connection: The SQLite connection.
+        """
+        declarations = []
+        for column in self.columns:
+            if column == "PATH":
+                declarations.append('"PATH" TEXT PRIMARY KEY')
+            elif column in Table.numericColumns:
+                declarations.append('"{}"'.format(column))
+            else:
+                declarations.append('"{}" TEXT'.format(column))
+        declarations.append("_TEXT TEXT")
+        connection.execute("CREATE TABLE IF NOT EXISTS entries ({})"
+                           .format(", ".join(declarations)))
+
+        indexColumns = [column for column in self.indexColumns
+                        if column in self.columns]
+        if indexColumns:
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_key ON entries ({})"
+                .format(", ".join(indexColumns)))
+
+    def _connect(self):
+        """
+        Opens the database file, creating its table if needed, unless
+        already open. Transactions are handled explicitly.
 
-        return sanitizedEntries
+        :return: The SQLite connection.
+        """
+        import sqlite3
+        if self._connection is None:
+            connection = sqlite3.connect(self.databasePath, timeout=60,
+                                         isolation_level=None)
+            # Lets readers carry on while the database is being written
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._createTable(connection)
+            self._connection = connection
+        return self._connection
+
+
+class TripletSearch:
+    """
+    Responsible for finding fructose triplets in the database. The entries
+    are grouped once by (ASH, AWA, MULTI) and then by FR so that matching a
+    triplet is a handful of dictionary lookups rather than database scans.
+    """
 
-    def _writeEntry(self, databasePath, data):
+    def __init__(self, database):
         """
-        Writes the given entry1 data into the supplied database in the
-        correct format.
+        A simple constructor.
 
-        :param data: A dictionary containing the data for a single row in
-        the database.
-        :param databasePath: The path to the database file.
+        :param database: A list containing database entries as dictionaries,
+        or a Table whose numeric columns are used without parsing.
         """
-        orderedData = [data[order] for order in self.dataOrder]
+        self.database = database
+        self._groups = {}
+        self._groupSums = None
+
+        if isinstance(database, Table):
+            self._frs, ashes, awas, multis = \
+                [database.numbers(column)
+                 for column in ("FR", "ASH", "AWA", "MULTI")]
+        else:
+            self._frs, ashes, awas, multis = \
+                [[valueNumbers[entry[column]] for entry in database]
+                 for column in ("FR", "ASH", "AWA", "MULTI")]
 
-        # Writes the data formatted prettily into the database
-        with open(databasePath, "a") as database:
-            database.write(self.template.format(*orderedData))
+        # Uni simulations are matched regardless of their AWA value hence
+        # they are grouped without it
+        for i, entry in enumerate(database):
+            multi = multis[i]
+            if multi == 1.0:
+                key = (ashes[i], awas[i], multi)
+            elif multi == 0.0:
+                key = (ashes[i], None, multi)
+            else:
+                continue
+            group = self._groups.setdefault(key, {})
+            group.setdefault(self._frs[i], []).append(entry)
+
+    def candidates(self):
+        """
+        Lists every distinct (oneMolar, ASH, AWA) candidate in the order that
+        it first appears in the database. Candidates whose four molar
+        fructose concentration exceeds the highest allowed value of 100 are
+        left out.
+
+        :return: A generator yielding a tuple of the one molar fructose
+        concentration (as an integer) and the ASH and AWA values (as strings).
+        """
+        seen = set()
+        for fr, entry in zip(self._frs, self.database):
+            oneMolar = int(fr / 2)
+            candidate = (oneMolar, entry["ASH"], entry["AWA"])
+            if oneMolar*4 <= 100 and candidate not in seen:
+                seen.add(candidate)
+                yield candidate
+
+    def score(self, oneMolars, ashes, awas, molarToExitUni, molarToExitMulti):
+        """
+        Calculates the goodness of fit of a whole grid of candidates at once,
+        giving the same fits as Controller.computeGoodnessOfFit does for the
+        entries matched by match (up to rounding).
+
+        The chi-squared sum of a group of entries against an observed value O
+        expands to O**2 * sum(1/E) - 2*O*n + sum(E) over its n non zero
+        expected values E, plus (O - 1)**2 per zero one. These sums are
+        computed once per group so that scoring a candidate no longer
+        depends on how many entries it matches, and candidates sharing the
+        same one molar concentration and ASH value are only scored once.
+
+        :param oneMolars: A sequence of the one molar fructose concentration
+        of each candidate.
+        :param ashes: A sequence of the ASH value of each candidate.
+        :param awas: A sequence of the AWA value of each candidate.
+        :param molarToExitUni: A dictionary mapping molar concentration to
+        the observed exit percentage of uni simulations.
+        :param molarToExitMulti: A dictionary mapping molar concentration to
+        the observed exit percentage of multi simulations.
+        :return: A tuple of two arrays of doubles containing the uni and multi
+        fit of each candidate, both NaN for candidates without entries for
+        every multi molar concentration.
+        """
+        fitsUni = array.array("d")
+        fitsMulti = array.array("d")
+        for fitUni, fitMulti in self.scores(zip(oneMolars, ashes, awas),
+                                            molarToExitUni,
+                                            molarToExitMulti):
+            fitsUni.append(fitUni)
+            fitsMulti.append(fitMulti)
+        return fitsUni, fitsMulti
+
+    def scores(self, candidates, molarToExitUni, molarToExitMulti):
+        """
+        Calculates the goodness of fit of candidates one at a time like
+        score, so that they can be ranked without holding every fit.
+
+        :param candidates: An iterable of (oneMolar, ASH, AWA) tuples like the
+        ones of candidates.
+        :param molarToExitUni: A dictionary mapping molar concentration to
+        the observed exit percentage of uni simulations.
+        :param molarToExitMulti: A dictionary mapping molar concentration to
+        the observed exit percentage of multi simulations.
+        :return: A generator yielding a tuple of the uni and multi fit of
+        each candidate, both NaN for candidates without entries for every
+        multi molar concentration.
+        """
+        sums = self._sums()
+        molars = [(int(molar), float(molarToExitUni[molar]),
+                   float(molarToExitMulti[molar])) for molar in ("2", "3", "4")]
+        noSums = (0.0, 0, 0.0, 0)
+        nan = float("nan")
+
+        multiGroups = {}
+        scored = {}
+        for oneMolar, ash, awa in candidates:
+            # Grids repeat the same values so their parsing is memoized too
+            multi = multiGroups.get((ash, awa))
+            if multi is None:
+                multi = self._groups.get((float(ash), float(awa), 1.0), {})
+                multiGroups[(ash, awa)] = multi
+            if float(oneMolar*2) not in multi or \
+                    float(oneMolar*3) not in multi or \
+                    float(oneMolar*4) not in multi:
+                yield nan, nan
+                continue
 
-    def _initializeDataFile(self, filePath):
+            # Both fits are calculated from the uni matches (as in
+            # Controller.findFructoseTriplets)
+            fits = scored.get((oneMolar, ash))
+            if fits is None:
+                fitUni = fitMulti = 0.0
+                for molar, observedUni, observedMulti in molars:
+                    inverses, count, total, zeros = \
+                        sums.get((float(ash), None, 0.0,
+                                  float(oneMolar*molar)), noSums)
+                    fitUni += observedUni**2*inverses - \
+                        2*observedUni*count + total + \
+                        zeros*(observedUni - 1)**2
+                    fitMulti += observedMulti**2*inverses - \
+                        2*observedMulti*count + total + \
+                        zeros*(observedMulti - 1)**2
+                fits = scored[(oneMolar, ash)] = (fitUni, fitMulti)
+            yield fits
+
+    def _sums(self):
         """
-        Creates a new file with a header containing the data parameters.
+        Sums the expected exit percentages of every group of entries sharing
+        the same ASH, AWA, MULTI and FR values (see score), once.
 
-        :param filePath: The path to the database file.
+        :return: A dictionary mapping (ASH, AWA, MULTI, FR) to a tuple of the
+        sum of the inverses of the non zero expected values, their count,
+        their sum, and the count of zero expected values.
         """
-        with open(filePath, "w") as file:
-            header = self.template.format(*self.dataOrder)
-            file.write(header)
+        if self._groupSums is None:
+            self._groupSums = {}
+            for key, frToEntries in self._groups.items():
+                for fr, entries in frToEntries.items():
+                    inverses = total = 0.0
+                    count = zeros = 0
+                    for entry in entries:
+                        if isinstance(entry, TableRow):
+                            expected = entry.number("EXIT")*100
+                        else:
+                            expected = float(entry["EXIT"])*100
+                        if expected != 0.0:
+                            inverses += 1/expected
+                            total += expected
+                            count += 1
+                        else:
+                            zeros += 1
+                    self._groupSums[key + (fr,)] = (inverses, count, total,
+                                                    zeros)
+        return self._groupSums
+
+    def match(self, oneMolar, ash, awa):
+        """
+        Matches the entries of the two, three and four molar fructose
+        concentrations for the given candidate.
+
+        :param oneMolar: The one molar fructose concentration.
+        :param ash: The ASH value.
+        :param awa: The AWA value.
+        :return: A tuple of two dictionaries mapping molar concentration to
+        the list of matched uni and multi entries respectively, each list
+        being in database order.
+        """
+        ash, awa = valueNumbers[ash], valueNumbers[awa]
+        uni = self._groups.get((ash, None, 0.0), {})
+        multi = self._groups.get((ash, awa, 1.0), {})
+
+        molarToMatchUni = {}
+        molarToMatchMulti = {}
+        for molar in ("2", "3", "4"):
+            fr = float(oneMolar*int(molar))
+            molarToMatchUni[molar] = list(uni.get(fr, []))
+            molarToMatchMulti[molar] = list(multi.get(fr, []))
+        return molarToMatchUni, molarToMatchMulti
 
 
 class Controller:
@@ -354,41 +3281,380 @@ class Controller:
     to perform calculations using it.
     """
 
-    def __init__(self, settingsPath):
+    # The observed exit percentages that the uni and multi simulations are
+    # fitted to, per molar fructose concentration
+    molarToExitUni = \
+    {
+        "2": 35,
+        "3": 7,
+        "4": 0
+    }
+    molarToExitMulti = \
+    {
+        "2": 80,
+        "3": 50,
+        "4": 0
+    }
+
+    def __init__(self, settingsPath, baseDir=None):
         """
         A simple constructor.
 
         :param settingsPath: The path to the .ini file containing settings.
+        :param baseDir: The directory that the relative paths of the .ini
+        file are taken from, or None to take them from the working
+        directory.
         """
         # Reads the .ini file
         self.config = configparser.ConfigParser()
         self.config.read(settingsPath)
 
+        # Resolved before anything (e.g. the parse cache) is opened from them
+        if baseDir is not None and self.config.has_section("PATHS"):
+            paths = self.config["PATHS"]
+            for name, path in paths.items():
+                if path and not os.path.isabs(path):
+                    paths[name] = os.path.normpath(os.path.join(baseDir,
+                                                                path))
+
         # Initializing variables
-        self.database = Database()
-        self.extractor = Extractor()
+        metrics = self.config.getboolean("OPTIONS", "metrics", fallback=False)
+        metadata = self.config.getboolean("OPTIONS", "metadata",
+                                          fallback=False)
+        self.database = Database(metrics, metadata)
+        self.extractor = Extractor(self._createScanner(),
+                                   self._createParseCache(), metrics,
+                                   metadata, query=self._createQuery())
+
+        # Refused here rather than once the data files are found
+        if self.extractor.cache is not None and \
+                self.config.getint("OPTIONS", "io_concurrency",
+                                   fallback=0) > 0:
+            raise ValueError("The parse_cache path and the io_concurrency "
+                             "option cannot be set together since the "
+                             "asynchronous reads cannot use the parse cache")
+
+        # Instrumentation is enabled by either the .ini file or the
+        # environment (e.g. SWEEPING_INSTRUMENT=1)
+        enabled = os.environ.get("SWEEPING_INSTRUMENT", "").lower()
+        if enabled not in ("", "0", "false", "no") or \
+                self.config.getboolean("OPTIONS", "instrument",
+                                       fallback=False):
+            instrumentation.start(profile=bool(self.config.get(
+                "PATHS", "instrument_profile", fallback="")))
+
+    def writeInstrumentationReport(self):
+        """
+        Stops the instrumentation (if enabled) and writes its report, and
+        its cProfile profile if a path is specified for it in the .ini file.
+        """
+        if not instrumentation.enabled:
+            return
+        instrumentation.stop()
+        instrumentation.writeReport(
+            self.config.get("PATHS", "instrument_report",
+                            fallback="instrumentation.json"),
+            self.config.get("PATHS", "instrument_profile", fallback=""))
+
+    def _createScanner(self):
+        """
+        Creates the scanner finding the data files from the directory globs
+        (separated by commas) and the number of threads in the .ini file.
+
+        :return: The scanner.
+        """
+        def globs(option, fallback):
+            value = self.config.get("OPTIONS", option, fallback=fallback)
+            return [glob.strip() for glob in value.split(",") if glob.strip()]
+
+        return Scanner(globs("scan_include", "*"), globs("scan_exclude", ""),
+                       self.config.getint("OPTIONS", "scan_workers",
+                                          fallback=1))
+
+    def _createQuery(self):
+        """
+        Creates the query restricting the data files extracted from the
+        ingest filter of the .ini file (see parseQuery).
 
+        :return: The query (see Extractor), or None if there is no filter.
+        """
+        return self.parseQuery(self.config.get("OPTIONS", "ingest_filter",
+                                               fallback="")) or None
+
+    def parseQuery(self, value):
+        """
+        Parses filters separated by commas, each either "KEY=VALUE" or
+        "KEY=LOW:HIGH" where either bound may be left out (e.g. "FR=50,
+        ASH=0.2:0.3, AWA=:-1"). The text columns (see Extractor.textColumns)
+        cannot be bounded.
+
+        :param value: The filters as a string.
+        :return: A dictionary mapping each key to its wanted value as a
+        string, or to a tuple of its bounds as numbers (None when left out).
+        """
+        query = {}
+        for queryFilter in value.split(","):
+            if not queryFilter.strip():
+                continue
+            key, _, wanted = queryFilter.partition("=")
+            key, wanted = key.strip().upper(), wanted.strip()
+            if ":" in wanted:
+                if key in Extractor.textColumns:
+                    raise ValueError("The following key is not a number and "
+                                     "cannot be bounded: {}".format(key))
+                low, _, high = wanted.partition(":")
+                wanted = (float(low) if low.strip() else None,
+                          float(high) if high.strip() else None)
+            query[key] = wanted
+        return query
+
+    def _createParseCache(self):
+        """
+        Creates the parse cache from the path and size bound in the .ini
+        file.
+
+        :return: The parse cache, or None if no path is specified.
+        """
+        cachePath = self.config.get("PATHS", "parse_cache", fallback="")
+        if not cachePath:
+            return None
+        return ParseCache(cachePath,
+                          self.config.getint("OPTIONS", "parse_cache_size",
+                                             fallback=100000))
+
+    @instrumentation.stage
     def generateDatabase(self):
         """
         Generates a a sorted and sanitized database from the options
         specified in the .ini file.
 
         The database is initially generated raw then sanitized and sorted to
-        remove irrelevant entries.
+        remove irrelevant entries. When the incremental option is set, only
+        the files changed since the manifest was last written are parsed.
+        When the streaming option is set, entries flow from the extractor
+        through an external sort into the database file so that memory use
+        stays bounded. When the io_concurrency option is set, that many file
+        reads are overlapped instead (see Extractor.extractAllDataAsync).
+        When the metrics option is set, the metrics of the other outputs of
+        every simulation are joined into its row, and when the metadata
+        option is set so is the metadata of its folder. When the ingest
+        filter option is set, only the data files whose paths match it are
+        read.
+        """
+        try:
+            self._generateDatabase()
+        finally:
+            self.extractor.close()
+
+    def _generateDatabase(self):
+        """
+        Generates the database for generateDatabase.
+        """
+        paths = self.config["PATHS"]
+        workers = self.config.getint("OPTIONS", "workers", fallback=1)
+        streaming = self.config.getboolean("OPTIONS", "streaming",
+                                           fallback=False)
+        concurrency = self.config.getint("OPTIONS", "io_concurrency",
+                                         fallback=0)
+
+        # Incremental builds only parse files changed since the last build
+        if self.config.getboolean("OPTIONS", "incremental", fallback=False):
+            manifest = self.extractor.readManifest(paths["manifest"])
+            data, manifest = self.extractor.extractChangedData(
+                paths["results_read"], paths["results_read_log"],
+                manifest, workers)
+            self.extractor.writeManifest(paths["manifest"], manifest)
+        elif streaming:
+            data = self.extractor.iterAllData(paths["results_read"],
+                                              paths["results_read_log"],
+                                              workers)
+        elif concurrency > 0:
+            data = self.extractor.extractAllDataAsync(
+                paths["results_read"], paths["results_read_log"], concurrency)
+            print("Read the data files at {:.0f} files/s".format(
+                self.extractor.filesPerSecond))
+        else:
+            data = self.extractor.extractAllData(paths["results_read"],
+                                                 paths["results_read_log"],
+                                                 workers)
+
+        if streaming:
+            self._streamDatabase(data)
+            return
+
+        sanitized, diff = self.database.partition(data)
+
+        sanitized = self.database.sort(sanitized)
+        diff = self.database.sort(diff)
+
+        self._createDatabase(sanitized)
+        if diff:
+            self.database.create(paths["database_ignored"], diff)
+
+    def _streamDatabase(self, data):
+        """
+        Sanitizes, sorts and writes the database with bounded memory by
+        routing each entry to an external sorter as it arrives.
+
+        :param data: An iterable containing the extracted entries.
+        """
+        paths = self.config["PATHS"]
+        chunkSize = self.config.getint("OPTIONS", "sort_chunk_size",
+                                       fallback=100000)
+        sanitized = self.database.sorter(chunkSize)
+        diff = self.database.sorter(chunkSize)
+
+        for entry in data:
+            if self.database.isSanitary(entry):
+                sanitized.add(entry)
+            else:
+                diff.add(entry)
+
+        self._createDatabase(sanitized.sorted())
+        if diff.count:
+            self.database.create(paths["database_ignored"], diff.sorted())
+        diff.close()
+
+    def _createDatabase(self, entries):
+        """
+        Writes the database in the format specified in the .ini file.
+
+        :param entries: An iterable containing the database entries.
+        """
+        databasePath = self.config["PATHS"]["database"]
+        databaseFormat = self.config.get("OPTIONS", "database_format",
+                                         fallback="text")
+        if databaseFormat == "binary":
+            self.database.createBinary(databasePath, entries)
+        elif databaseFormat == "sqlite":
+            self.database.createSqlite(databasePath, entries)
+        else:
+            self.database.create(databasePath, entries)
+
+    def readDatabase(self):
+        """
+        Reads the database in the format specified in the .ini file.
+
+        :return: A list containing the database entries as dictionaries, or
+        a Table for the binary format.
+        """
+        databasePath = self.config["PATHS"]["database"]
+        databaseFormat = self.config.get("OPTIONS", "database_format",
+                                         fallback="text")
+        if databaseFormat == "binary":
+            return self.database.readBinary(databasePath)
+        elif databaseFormat == "sqlite":
+            return self.database.readSqlite(databasePath)
+        return self.database.read(databasePath)
+
+    def queryDatabase(self, query):
+        """
+        Queries the database in the format specified in the .ini file (see
+        Database.query). The sqlite format is queried through its index
+        rather than read in full.
+
+        :param query: A dictionary containing the query data.
+        :return: A list containing the matched database entries as
+        dictionaries, or a Table for the binary format.
+        """
+        databaseFormat = self.config.get("OPTIONS", "database_format",
+                                         fallback="text")
+        if databaseFormat != "sqlite":
+            return self.database.query(self.readDatabase(), query)
+
+        database = self.database.openSqlite(self.config["PATHS"]["database"])
+        try:
+            return self.database.query(database, query)
+        finally:
+            database.close()
+
+    def watch(self, cycles=None):
+        """
+        Watches the results directory and keeps the database and the fructose
+        triplets up to date while the simulator writes new data files, by
+        polling it every watch_interval seconds from the .ini file. Only the
+        files that are new, changed or removed are extracted (see
+        Extractor.pollChangedData), files modified within the last
+        watch_settle seconds being left for a later poll, and only the
+        fructose triplets their rows take part in are rescored (see
+        rescoreFructoseTriplets).
+
+        The manifest is written after every poll that changed anything so
+        that the watch carries on where it stopped when restarted, and the
+        parse cache is closed once the watch stops.
+
+        :param cycles: The number of polls before returning, or None to poll
+        until interrupted.
         """
         paths = self.config["PATHS"]
-        data = self.extractor.extractAllData(paths["results_read"],
-                                             paths["results_read_log"])
-        sanitized = self.database.sanitize(data)
-        diff = [entry for entry in data if entry not in sanitized]
+        interval = self.config.getfloat("OPTIONS", "watch_interval",
+                                        fallback=5.0)
+        settle = self.config.getfloat("OPTIONS", "watch_settle",
+                                      fallback=2.0)
+        workers = self.config.getint("OPTIONS", "workers", fallback=1)
+
+        manifest = self.extractor.readManifest(paths["manifest"])
+        failed = {}
+        cycle = 0
+        try:
+            while cycles is None or cycle < cycles:
+                if cycle:
+                    time.sleep(interval)
+                cycle += 1
+
+                data, extracted, replaced, manifest = \
+                    self.extractor.pollChangedData(
+                        paths["results_read"], paths["results_read_log"],
+                        manifest, failed, settle, workers)
+                if not extracted and not replaced:
+                    continue
 
+                self.extractor.writeManifest(paths["manifest"], manifest)
+                database = self._updateDatabase(data, extracted, replaced)
+                self.rescoreFructoseTriplets(database, extracted + replaced)
+                if paths.get("triplets_manifest"):
+                    self._writeTripletManifest(paths["triplets_manifest"],
+                                               self._manifestRows(database))
+                print("Ingested {} data files, {} changed or removed".format(
+                    len(extracted), len(replaced)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.extractor.close()
+
+    def _updateDatabase(self, data, extracted, replaced):
+        """
+        Brings the database up to date after some rows were extracted,
+        changed or removed. The SQLite format is updated in place whereas
+        the other formats are written again in full.
+
+        :param data: A list containing every extracted entry.
+        :param extracted: A list containing the entries newly extracted.
+        :param replaced: A list containing the previous entries of the files
+        changed or removed.
+        :return: A list containing the sorted and sanitized entries.
+        """
+        paths = self.config["PATHS"]
+        sanitized, diff = self.database.partition(data)
         sanitized = self.database.sort(sanitized)
         diff = self.database.sort(diff)
 
-        self.database.create(paths["database"], sanitized)
+        if self.config.get("OPTIONS", "database_format",
+                           fallback="text") == "sqlite":
+            upserted = [entry for entry in extracted
+                        if self.database.isSanitary(entry)]
+            kept = {entry["PATH"] for entry in upserted}
+            self.database.upsertSqlite(
+                paths["database"], upserted,
+                [entry["PATH"] for entry in replaced + extracted
+                 if entry["PATH"] not in kept])
+        else:
+            self._createDatabase(sanitized)
         if diff:
             self.database.create(paths["database_ignored"], diff)
+        return sanitized
 
+    @instrumentation.stage
     def generateFructoseTriplets(self):
         """
         This function is to be used indirectly to help fit the three parameters
@@ -404,96 +3670,345 @@ class Controller:
         defined in the java simulator) and then it calculates it's
         corresponding goodness of fit.
 
-        In terms of implementation, it reads each line of the sorted database,
-        then proceeds to find a fructose triplets for the given ASH and AWA
-        values. If successful, it first calculates it's goodness of fit
-        and then stores the data in a new file.
+        In terms of implementation, it reads the sorted database, then finds
+        the fructose triplets for every distinct ASH and AWA value (see
+        findFructoseTriplets) and stores each one in a new file named after
+        its goodness of fit. When the triplets_top option is set, only the
+        best triplets are kept instead (see _writeRankedTriplets).
+
+        When a path is specified for the triplets manifest in the .ini file,
+        the rows every triplet was last written from are recorded there and
+        only the triplets depending on rows that changed since are rescored
+        (see rescoreFructoseTriplets).
+        """
+        database = self.readDatabase()
+        queriesDir = self.config["PATHS"]["queries"]
+
+        top = self.config.getint("OPTIONS", "triplets_top", fallback=0)
+        if top > 0:
+            self._writeRankedTriplets(database, top)
+            return
+
+        manifestPath = self.config.get("PATHS", "triplets_manifest",
+                                       fallback="")
+        manifest = rows = None
+        if manifestPath:
+            rows = self._manifestRows(database)
+            if os.path.exists(queriesDir):
+                manifest = self._readTripletManifest(manifestPath)
+
+        if manifest is None:
+            for name, data in self.findFructoseTriplets(database):
+                if not os.path.exists(queriesDir):
+                    os.makedirs(queriesDir)
+                self.database.create(os.path.join(queriesDir, name), data)
+        else:
+            self.rescoreFructoseTriplets(
+                database, self._changedRows(manifest, rows, database))
+        if manifestPath:
+            self._writeTripletManifest(manifestPath, rows)
+
+    def _readTripletManifest(self, manifestPath):
+        """
+        Reads the manifest of the rows the fructose triplets were last
+        written from.
+
+        :param manifestPath: The path to the triplets manifest file.
+        :return: A dictionary mapping the PATH of every row to a list of its
+        "FR", "ASH", "AWA" and "MULTI" values and the digest of the whole
+        row, or None if the manifest is missing, unreadable, was written
+        for other observed exit percentages or any triplet file it lists no
+        longer exists.
+        """
+        try:
+            with open(manifestPath, "r") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("MOLAR_TO_EXIT") != [self.molarToExitUni,
+                                            self.molarToExitMulti]:
+            return None
+
+        # Triplet files deleted since cannot be told apart from triplets
+        # that are still up to date, hence everything is written again
+        queriesDir = self.config["PATHS"]["queries"]
+        if not set(manifest.get("FILES", ())) <= set(os.listdir(queriesDir)):
+            return None
+        return manifest["ROWS"]
+
+    def _writeTripletManifest(self, manifestPath, rows):
+        """
+        Writes the manifest of the rows the fructose triplets were written
+        from, along with the triplet files written, replacing the old one
+        only once the new one has been fully written.
+
+        :param manifestPath: The path to the triplets manifest file.
+        :param rows: The rows of the manifest (see _manifestRows).
+        """
+        queriesDir = self.config["PATHS"]["queries"]
+        files = sorted(os.listdir(queriesDir)) \
+            if os.path.exists(queriesDir) else []
+        manifest = {"MOLAR_TO_EXIT": [self.molarToExitUni,
+                                      self.molarToExitMulti],
+                    "ROWS": rows,
+                    "FILES": files}
+
+        # The manifest is encoded at once since json.dump encodes it piece
+        # by piece without the C encoder
+        tempPath = "{}.{}.tmp".format(manifestPath, os.getpid())
+        with open(tempPath, "w") as file:
+            file.write(json.dumps(manifest))
+        os.replace(tempPath, manifestPath)
+
+    def _manifestRows(self, database):
         """
-        database = self.database.read(self.config["PATHS"]["database"])
+        Lists the rows of the database the way the triplets manifest records
+        them.
+
+        :param database: A list containing the database entries as
+        dictionaries, or a Table.
+        :return: A dictionary mapping the PATH of every row to a list of its
+        "FR", "ASH", "AWA" and "MULTI" values and the digest of the whole
+        row.
+        """
+        getValues = operator.itemgetter(*self.database.dataOrder)
+        rows = {}
         for entry in database:
-            fr = entry["FR"]
-            ash = entry["ASH"]
-            awa = entry["AWA"]
-            oneMolar = int(float(fr) / 2)
-            molarToFr = \
-            {
-                "1": str(oneMolar*1),
-                "2": str(oneMolar*2),
-                "3": str(oneMolar*3),
-                "4": str(oneMolar*4),
-            }
-
-            # Filters out sets of invalid fructose sets since the highest
-            # allowed value is 100 and then attempts to find matches
-            if int(molarToFr["4"]) <= 100:
-                molarToUniQuery = \
-                {
-                    "1": {"FR": molarToFr["1"], "ASH": ash, "MULTI": "0"},
-                    "2": {"FR": molarToFr["2"], "ASH": ash, "MULTI": "0"},
-                    "3": {"FR": molarToFr["3"], "ASH": ash, "MULTI": "0"},
-                    "4": {"FR": molarToFr["4"], "ASH": ash, "MULTI": "0"},
-                }
-                molarToMultiQuery = \
-                {
-                    "1": {"FR": molarToFr["1"], "ASH": ash, "AWA": awa,
-                          "MULTI": "1"},
-                    "2": {"FR": molarToFr["2"], "ASH": ash, "AWA": awa,
-                          "MULTI": "1"},
-                    "3": {"FR": molarToFr["3"], "ASH": ash, "AWA": awa,
-                          "MULTI": "1"},
-                    "4": {"FR": molarToFr["4"], "ASH": ash, "AWA": awa,
-                          "MULTI": "1"},
-                }
-
-                molarToMatchUni = \
-                {
-                    "2": self.database.query(database, molarToUniQuery["2"]),
-                    "3": self.database.query(database, molarToUniQuery["3"]),
-                    "4": self.database.query(database, molarToUniQuery["4"])
-                }
-                molarToMatchMulti = \
-                {
-                    "2": self.database.query(database, molarToMultiQuery["2"]),
-                    "3": self.database.query(database, molarToMultiQuery["3"]),
-                    "4": self.database.query(database, molarToMultiQuery["4"])
-                }
-            else:
+            digest = hashlib.blake2b("\0".join(getValues(entry)).encode(),
+                                     digest_size=8).hexdigest()
+            rows[entry["PATH"]] = [entry["FR"], entry["ASH"], entry["AWA"],
+                                   entry["MULTI"], digest]
+        return rows
+
+    def _changedRows(self, manifest, rows, database):
+        """
+        Lists the rows of the database that were added or changed since the
+        triplets manifest was written, along with the previous rows of those
+        that were changed or removed.
+
+        :param manifest: The rows of the triplets manifest (see
+        _readTripletManifest).
+        :param rows: The rows of the database as the manifest records them
+        (see _manifestRows).
+        :param database: A list containing the database entries as
+        dictionaries, or a Table.
+        :return: A list containing the rows as dictionaries of at least their
+        "FR", "ASH", "AWA" and "MULTI" values.
+        """
+        changed = []
+        for entry in database:
+            record = manifest.get(entry["PATH"])
+            if record != rows[entry["PATH"]]:
+                changed.append(entry)
+                if record is not None:
+                    changed.append(dict(zip(("FR", "ASH", "AWA", "MULTI"),
+                                            record)))
+        for path, record in manifest.items():
+            if path not in rows:
+                changed.append(dict(zip(("FR", "ASH", "AWA", "MULTI"),
+                                        record)))
+        return changed
+
+    def _writeRankedTriplets(self, database, top):
+        """
+        Writes the best fructose triplets ranked by goodness of fit into a
+        single file, keeping only the best ones while scoring (see
+        rankFructoseTriplets). When the triplets_details option is set, the
+        entries of each of these triplets are also stored in a file named
+        after its goodness of fit like generateFructoseTriplets does.
+
+        :param database: A list containing database entries as dictionaries,
+        or a Table.
+        :param top: The number of best triplets to keep.
+        """
+        queriesDir = self.config["PATHS"]["queries"]
+        details = self.config.getboolean("OPTIONS", "triplets_details",
+                                         fallback=False)
+
+        search = TripletSearch(database)
+        ranked = self.rankFructoseTriplets(search, top)
+
+        template = "{:<6} {:<14} {:<14} {:<14} {:<9} {:<9} {:<9}\n"
+        lines = [template.format("RANK", "FIT", "FIT_UNI", "FIT_MULTI",
+                                 "ONE_MOLAR", "ASH", "AWA")]
+        for rank, triplet in enumerate(ranked, start=1):
+            lines.append(template.format(
+                rank, "{:.4f}".format(triplet["FIT"]),
+                "{:.4f}".format(triplet["FIT_UNI"]),
+                "{:.4f}".format(triplet["FIT_MULTI"]),
+                triplet["ONE_MOLAR"], triplet["ASH"], triplet["AWA"]))
+
+        # Replaces the previous ranking only once it is fully written
+        rankedPath = self.config.get("PATHS", "ranked_queries",
+                                     fallback="ranked_queries.txt")
+        tempPath = "{}.{}.tmp".format(rankedPath, os.getpid())
+        with open(tempPath, "w") as file:
+            file.writelines(lines)
+        os.replace(tempPath, rankedPath)
+
+        if not details:
+            return
+        if not os.path.exists(queriesDir):
+            os.makedirs(queriesDir)
+        for triplet in ranked:
+            name, data = self._scoreFructoseTriplet(
+                search, triplet["ONE_MOLAR"], triplet["ASH"], triplet["AWA"])
+            self.database.create(os.path.join(queriesDir, name), data)
+
+    def rescoreFructoseTriplets(self, database, rows):
+        """
+        Rescores only the fructose triplets that the given rows take part in
+        (e.g. rows added, changed or removed) rather than every triplet like
+        generateFructoseTriplets. The files of these triplets are written
+        again, and deleted when the triplet no longer has sufficient data.
+        When the triplets_top option is set, the ranking is written again
+        instead since scoring every triplet at once is cheap.
+
+        :param database: A list containing the sorted database entries as
+        dictionaries, including the given rows unless they were removed.
+        :param rows: A list containing the rows whose triplets are rescored.
+        """
+        top = self.config.getint("OPTIONS", "triplets_top", fallback=0)
+        if top > 0:
+            self._writeRankedTriplets(database, top)
+            return
+
+        queriesDir = self.config["PATHS"]["queries"]
+        if not os.path.exists(queriesDir):
+            os.makedirs(queriesDir)
+
+        # Keys of the candidates the rows take part in, where uni rows take
+        # part regardless of the AWA value (see TripletSearch.match)
+        keys = set()
+        for row in rows:
+            fr, ash = valueNumbers[row["FR"]], valueNumbers[row["ASH"]]
+            awa = valueNumbers[row["AWA"]] \
+                if valueNumbers[row["MULTI"]] == 1.0 else None
+            for molar in (2, 3, 4):
+                if fr % molar == 0:
+                    keys.add((int(fr) // molar, ash, awa))
+            # The candidate the row brings along (see candidates)
+            keys.add((int(fr / 2), ash, valueNumbers[row["AWA"]]))
+
+        def isAffected(oneMolar, ash, awa):
+            ash = valueNumbers[ash]
+            return (oneMolar, ash, valueNumbers[awa]) in keys or \
+                (oneMolar, ash, None) in keys
+
+        # Files are named "<fit>_(<oneMolar>_<ASH>_<AWA>).txt"
+        for name in os.listdir(queriesDir):
+            candidate = name.partition("_")[2][1:-len(").txt")].split("_")
+            try:
+                oneMolar, ash, awa = candidate
+                affected = isAffected(int(oneMolar), ash, awa)
+            except ValueError:
                 continue
+            if affected:
+                os.remove(os.path.join(queriesDir, name))
+
+        # Only the rows sharing the ASH value of an affected candidate can
+        # take part in its triplet
+        ashes = {key[1] for key in keys}
+        if isinstance(database, Table):
+            values = database.numbers("ASH")
+        else:
+            values = [valueNumbers[entry["ASH"]] for entry in database]
+        search = TripletSearch([entry for entry, value in zip(database, values)
+                                if value in ashes])
+        for oneMolar, ash, awa in search.candidates():
+            if isAffected(oneMolar, ash, awa):
+                triplet = self._scoreFructoseTriplet(search, oneMolar, ash,
+                                                     awa)
+                if triplet is not None:
+                    name, data = triplet
+                    self.database.create(os.path.join(queriesDir, name),
+                                         data)
+
+    def findFructoseTriplets(self, database):
+        """
+        Finds every fructose triplet in the database along with its goodness
+        of fit. Each distinct triplet is found and scored exactly once.
 
-            # Accept fructose triplet only if there is sufficient data
-            # available and store it along with it's calculated goodness fit
-            if all(molarToMatchMulti.values()) and \
-               all(molarToMultiQuery.values()):
-
-                data = list(molarToMatchUni.values())[0] + \
-                       list(molarToMatchMulti.values())[0]
-                data = self.database.sort(data)
-
-                molarToExitUni = \
-                {
-                    "2": 35,
-                    "3": 7,
-                    "4": 0
-                }
-                molarToExitMulti = \
-                {
-                    "2": 80,
-                    "3": 50,
-                    "4": 0
-                }
-
-                fitUni = self.computeGoodnessOfFit(molarToMatchUni,
-                                                   molarToExitUni)
-                fitMulti = self.computeGoodnessOfFit(molarToMatchUni,
-                                                     molarToExitMulti)
-                fitness = str(int(fitUni + fitMulti))
-
-                queriesDir = self.config["PATHS"]["queries"]
-                if not os.path.exists(queriesDir):
-                    os.makedirs(queriesDir)
+        :param database: A list containing database entries as dictionaries.
+        :return: A generator yielding a tuple of the file name of a triplet
+        and a list containing its sorted entries.
+        """
+        search = TripletSearch(database)
+        for oneMolar, ash, awa in search.candidates():
+            triplet = self._scoreFructoseTriplet(search, oneMolar, ash, awa)
+            if triplet is not None:
+                yield triplet
 
-                name = "{}_({}_{}_{}).txt".format(fitness, oneMolar, ash, awa)
-                self.database.create(os.path.join(queriesDir, name), data)
+    def _scoreFructoseTriplet(self, search, oneMolar, ash, awa):
+        """
+        Matches the entries of a fructose triplet and calculates its goodness
+        of fit.
+
+        :param search: The TripletSearch over the database.
+        :param oneMolar: The one molar fructose concentration.
+        :param ash: The ASH value.
+        :param awa: The AWA value.
+        :return: A tuple of the file name of the triplet and a list
+        containing its sorted entries, or None if there is not enough data.
+        """
+        molarToMatchUni, molarToMatchMulti = search.match(oneMolar, ash, awa)
+
+        # Accept fructose triplet only if there is sufficient data
+        # available and store it along with it's calculated goodness fit
+        if not all(molarToMatchMulti.values()):
+            return None
+
+        data = molarToMatchUni["2"] + molarToMatchMulti["2"]
+        data = self.database.sort(data)
+
+        fitUni = self.computeGoodnessOfFit(molarToMatchUni,
+                                           self.molarToExitUni)
+        fitMulti = self.computeGoodnessOfFit(molarToMatchUni,
+                                             self.molarToExitMulti)
+        fitness = str(int(fitUni + fitMulti))
+
+        name = "{}_({}_{}_{}).txt".format(fitness, oneMolar, ash, awa)
+        return name, data
+
+    def rankFructoseTriplets(self, database, top=10):
+        """
+        Scores every fructose triplet in the database at once and ranks them
+        by goodness of fit (see TripletSearch.score), without sorting or
+        writing out the entries of each triplet.
+
+        :param database: A list containing database entries as dictionaries,
+        a Table, or a TripletSearch already built over either.
+        :param top: The number of best (i.e. lowest) fits to return, which
+        are the only ones kept while ranking.
+        :return: A list containing a dictionary per triplet, best first, of
+        its "FIT" (as used in the file names of findFructoseTriplets),
+        "FIT_UNI", "FIT_MULTI", "ONE_MOLAR", "ASH" and "AWA".
+        """
+        search = database
+        if not isinstance(search, TripletSearch):
+            search = TripletSearch(database)
+
+        # Candidates are scored as they are ranked so that only the best ones
+        # are held, ties being ranked in the order of the candidates, and
+        # the ones without sufficient data are scored as NaN
+        candidates, scoring = itertools.tee(search.candidates())
+        fits = ((fitUni + fitMulti, i, fitUni, fitMulti, candidate)
+                for i, (candidate, (fitUni, fitMulti)) in enumerate(zip(
+                    candidates, search.scores(scoring, self.molarToExitUni,
+                                              self.molarToExitMulti)))
+                if not math.isnan(fitUni))
+        ranked = []
+        for fit, i, fitUni, fitMulti, (oneMolar, ash, awa) \
+                in heapq.nsmallest(top, fits):
+            ranked.append({
+                "FIT":          fit,
+                "FIT_UNI":      fitUni,
+                "FIT_MULTI":    fitMulti,
+                "ONE_MOLAR":    oneMolar,
+                "ASH":          ash,
+                "AWA":          awa
+            })
+        return ranked
 
     def computeGoodnessOfFit(self, matchedEntries, molarToExit):
         """
@@ -511,7 +4026,10 @@ class Controller:
         chi = 0
         for molar, entries in matchedEntries.items():
             for entry in entries:
-                expected = float(entry["EXIT"])*100
+                if isinstance(entry, TableRow):
+                    expected = entry.number("EXIT")*100
+                else:
+                    expected = float(entry["EXIT"])*100
                 observed = float(molarToExit[molar])
                 if expected != 0.0:
                     chi += (observed - expected)**2 / expected
@@ -522,5 +4040,9 @@ class Controller:
 
 if __name__ == '__main__':
     controller = Controller("settings.ini")
-    controller.generateDatabase()
-    controller.generateFructoseTriplets()
+    if controller.config.getboolean("OPTIONS", "watch", fallback=False):
+        controller.watch()
+    else:
+        controller.generateDatabase()
+        controller.generateFructoseTriplets()
+    controller.writeInstrumentationReport()
@@ -0,0 +1,235 @@
+"""
+Runs a single step of the cleaner, reading its paths and options from a
+.ini file (the settings.ini next to this file by default). Relative paths
+in the .ini file are taken from the directory of the .ini file, as when
+running cleaner.py from there.
+
+Run from the repository root, for instance:
+
+    python -m sweeping.cli scan
+    python -m sweeping.cli build
+    python -m sweeping.cli query FR=50 ASH=0.2:0.3 AWA=:-1
+    python -m sweeping.cli triplets
+    python -m sweeping.cli stats
+
+The query and stats commands only read the existing database, hence are
+quickest with the sqlite (or binary) database format.
+"""
+import argparse
+import os
+
+
+# The columns whose values are not numbers, which are matched as they are
+# written and cannot be bounded (as Extractor.textColumns, repeated here so
+# that the cleaner is not imported before the arguments are checked)
+TEXT_COLUMNS = ("DATE", "PATH")
+
+
+def main():
+    """
+    Parses the command line arguments and runs the requested command.
+    """
+    parser = argparse.ArgumentParser(prog="python -m sweeping.cli",
+                                     description=__doc__.strip(),
+                                     formatter_class=argparse.
+                                     RawDescriptionHelpFormatter)
+    parser.add_argument("--settings",
+                        default=os.path.join(os.path.dirname(__file__),
+                                             "settings.ini"),
+                        help="path to the .ini file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="list the data files that would "
+                                            "be extracted")
+    scan.add_argument("--count", action="store_true",
+                      help="only print how many there are")
+
+    commands.add_parser("build", help="extract the data files into the "
+                                      "database")
+
+    query = commands.add_parser("query", help="print the entries of the "
+                                              "database matching filters")
+    query.add_argument("filters", nargs="*",
+                       help='filters such as "FR=50" or "ASH=0.2:0.3", '
+                            'where either bound may be left out')
+    query.add_argument("--count", action="store_true",
+                       help="only print how many entries match")
+
+    commands.add_parser("triplets", help="find the fructose triplets of the "
+                                         "database")
+
+    commands.add_parser("stats", help="summarize the database")
+
+    args = parser.parse_args()
+
+    # The cleaner is only imported once the arguments are known to be valid
+    # so that mistakes (and --help) are answered at once
+    controller = createController(args.settings)
+    databasePath = controller.config.get("PATHS", "database", fallback="")
+    if args.command in ("query", "stats") and \
+            not os.path.exists(databasePath):
+        parser.error("the database {} does not exist, run the build command "
+                     "first".format(databasePath))
+    if args.command == "scan":
+        runScan(controller, args.count)
+    elif args.command == "build":
+        controller.generateDatabase()
+        controller.writeInstrumentationReport()
+    elif args.command == "query":
+        runQuery(controller, parseFilters(parser, controller, args.filters),
+                 args.count)
+    elif args.command == "triplets":
+        controller.generateFructoseTriplets()
+        controller.writeInstrumentationReport()
+    elif args.command == "stats":
+        runStats(controller)
+
+
+def createController(settingsPath):
+    """
+    Creates the controller from the given .ini file, with the relative
+    paths of the .ini file taken from its directory.
+
+    :param settingsPath: The path to the .ini file.
+    :return: The Controller.
+    """
+    from sweeping.cleaner import Controller
+
+    if not os.path.exists(settingsPath):
+        raise SystemExit("The settings file {} does not exist"
+                         .format(settingsPath))
+    return Controller(settingsPath,
+                      os.path.dirname(os.path.abspath(settingsPath)))
+
+
+def runScan(controller, count):
+    """
+    Prints the paths to the data files that a build would extract.
+
+    :param controller: The Controller.
+    :param count: Whether to only print how many there are.
+    """
+    resultsPath = controller.config["PATHS"]["results_read"]
+    paths = controller.extractor.iterAllFilePaths(resultsPath)
+    if count:
+        print(sum(1 for path in paths))
+        return
+    for path in paths:
+        print(os.path.join(resultsPath, path))
+
+
+def parseFilters(parser, controller, filters):
+    """
+    Parses the filters of the query command, reporting the ones that are
+    malformed, name unknown columns or hold values that are not numbers
+    through the parser.
+
+    :param parser: The ArgumentParser.
+    :param controller: The Controller.
+    :param filters: A list containing the filters (see
+    Controller.parseQuery).
+    :return: A dictionary mapping each key to its wanted value as a string,
+    or to a tuple of its bounds as numbers (None when left out).
+    """
+    dataOrder = controller.database.dataOrder
+    query = {}
+    for queryFilter in filters:
+        if "=" not in queryFilter:
+            parser.error('expected a filter such as "FR=50", got "{}"'
+                         .format(queryFilter))
+        try:
+            parsed = controller.parseQuery(queryFilter)
+        except ValueError:
+            key = queryFilter.partition("=")[0].strip().upper()
+            if key in TEXT_COLUMNS:
+                parser.error("the {} column cannot be bounded".format(key))
+            parser.error('the bounds of "{}" are not numbers'
+                         .format(queryFilter))
+        for key, wanted in parsed.items():
+            if key not in dataOrder:
+                parser.error("unknown column {} (choose from {})"
+                             .format(key, ", ".join(dataOrder)))
+            if key not in TEXT_COLUMNS and not isinstance(wanted, tuple):
+                try:
+                    float(wanted)
+                except ValueError:
+                    parser.error('the value of "{}" is not a number'
+                                 .format(queryFilter))
+        query.update(parsed)
+    return query
+
+
+def runQuery(controller, query, count):
+    """
+    Prints the entries of the database matching every filter, straight from
+    the database file. Equality filters on numbers are answered by the
+    database (e.g. with the index of the sqlite format), whereas ranges and
+    the text columns are checked afterwards.
+
+    :param controller: The Controller.
+    :param query: A dictionary of the filters (see parseFilters).
+    :param count: Whether to only print how many entries match.
+    """
+    equal = {key: wanted for key, wanted in query.items()
+             if not isinstance(wanted, tuple) and key not in TEXT_COLUMNS}
+    text = {key: wanted for key, wanted in query.items()
+            if key in TEXT_COLUMNS}
+    bounds = {key: wanted for key, wanted in query.items()
+              if isinstance(wanted, tuple)}
+
+    database = controller.database
+    if equal:
+        entries = controller.queryDatabase(equal)
+    else:
+        entries = controller.readDatabase()
+    entries = [entry for entry in entries
+               if all(entry[key] == text[key] for key in text) and
+               all(isWithin(entry[key], *bounds[key]) for key in bounds)]
+
+    if count:
+        print(len(entries))
+        return
+    print(database.template.format(*database.dataOrder), end="")
+    for entry in entries:
+        print(database.formatEntry(entry), end="")
+
+
+def isWithin(value, low, high):
+    """
+    :param value: The value as a string.
+    :param low: The lowest value allowed, or None for any.
+    :param high: The highest value allowed, or None for any.
+    :return: Whether the value is within the bounds.
+    """
+    value = float(value)
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def runStats(controller):
+    """
+    Prints the number of entries of the database, the distinct values of
+    its parameter columns and the number of fructose triplets written.
+
+    :param controller: The Controller.
+    """
+    from sweeping.cleaner import valueNumbers
+
+    paths = controller.config["PATHS"]
+    entries = controller.readDatabase()
+    print("{:<10} {:>8}".format("entries", len(entries)))
+    for column in ("FR", "ASH", "AWA", "MULTI"):
+        values = {valueNumbers[entry[column]] for entry in entries}
+        if values:
+            print("{:<10} {:>8} values from {:g} to {:g}".format(
+                column, len(values), min(values), max(values)))
+
+    if os.path.exists(paths["database_ignored"]):
+        ignored = controller.database.read(paths["database_ignored"])
+        print("{:<10} {:>8}".format("ignored", len(ignored)))
+    if os.path.isdir(paths["queries"]):
+        print("{:<10} {:>8}".format("triplets",
+                                    len(os.listdir(paths["queries"]))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Converts a database between the text format and the binary format.
+
+Run from the repository root, for instance:
+
+    python -m sweeping.convert to-binary database.txt database.bin
+    python -m sweeping.convert to-text database.bin database.txt
+"""
+import argparse
+
+from sweeping.cleaner import Database
+
+
+def main():
+    """
+    Parses the command line arguments and runs the requested conversion.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip(),
+                                     formatter_class=argparse.
+                                     RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="conversion", required=True)
+
+    toBinary = commands.add_parser("to-binary", help="text to binary")
+    toBinary.add_argument("source", help="path to the text database")
+    toBinary.add_argument("destination", help="path to the binary database")
+
+    toText = commands.add_parser("to-text", help="binary to text")
+    toText.add_argument("source", help="path to the binary database")
+    toText.add_argument("destination", help="path to the text database")
+
+    args = parser.parse_args()
+    database = Database()
+    if args.conversion == "to-binary":
+        database.convertToBinary(args.source, args.destination)
+    else:
+        database.convertToText(args.source, args.destination)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,11 +5,19 @@ __author__ = "Othman Alikhan"
 __email__ = "sc14omsa@leeds.ac.uk"
 __date__ = "2016-08-15"
 """
+import configparser
 import filecmp
+import json
 import os
+import shutil
+import tempfile
 import unittest
 import mock
-from sweeping.cleaner import Extractor, Database, Controller
+from sweeping import cli
+from sweeping.cleaner import Extractor, Scanner, ParseCache, Database, \
+    Controller, Table, TripletSearch, ValuePool, instrumentation, valueStrings
+from sweeping.benchmark import generateSyntheticDatabase, \
+    legacyFructoseTriplets, generateResultsTree, runScenarios, SCENARIOS
 
 
 ################################# UNIT TESTS ###################################
@@ -58,6 +66,161 @@ class TestExtractor(unittest.TestCase):
         data = self.extractor.extractAllData("foo", "bar")[0]
         self.assertDictEqual(data, {"FR": "50", "N": "100"})
 
+    def testExtractAllDataParallel(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            serialLog = os.path.join(tempDir, "serial.txt")
+            parallelLog = os.path.join(tempDir, "parallel.txt")
+
+            with mock.patch("sweeping.cleaner.print", create=True):
+                serial = self.extractor.extractAllData(self.dataPath,
+                                                       serialLog)
+                parallel = self.extractor.extractAllData(self.dataPath,
+                                                         parallelLog,
+                                                         workers=2)
+
+            # Same rows in the same order, and the same error lines
+            self.assertListEqual(parallel, serial)
+            with open(serialLog, "r") as f1, open(parallelLog, "r") as f2:
+                errors1 = [line.split(", ", 1)[1] for line in f1]
+                errors2 = [line.split(", ", 1)[1] for line in f2]
+            self.assertListEqual(errors2, errors1)
+            self.assertEqual(len(errors2), 2)
+
+    @mock.patch("sweeping.cleaner.print", create=True)
+    def testExtractAllDataAsync(self, mockPrint):
+        with tempfile.TemporaryDirectory() as tempDir:
+            logPath = os.path.join(tempDir, "log.txt")
+            allData = self.extractor.extractAllData(self.dataPath, logPath)
+            for concurrency in (1, 16):
+                data = self.extractor.extractAllDataAsync(self.dataPath,
+                                                          logPath,
+                                                          concurrency)
+                self.assertListEqual(data, allData)
+                self.assertGreater(self.extractor.filesPerSecond, 0)
+
+            with open(logPath, "r") as file:
+                self.assertEqual(len(file.readlines()), 2)
+
+    def testExtractAllDataAsyncError(self):
+        failingPath = os.path.join(
+            self.dataPath, self.extractor._listAllFilePaths(self.dataPath)[0])
+        extractDataFromFile = self.extractor._extractDataFromFile
+
+        def extract(filePath):
+            if filePath == failingPath:
+                raise OSError("Dangling symbolic link")
+            return extractDataFromFile(filePath)
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            logPath = os.path.join(tempDir, "log.txt")
+            with mock.patch.object(self.extractor, "_extractDataFromFile",
+                                   side_effect=extract):
+                with self.assertRaises(OSError):
+                    self.extractor.extractAllData(self.dataPath, logPath)
+                for concurrency in (1, 16):
+                    with self.assertRaisesRegex(OSError, "Dangling"):
+                        self.extractor.extractAllDataAsync(
+                            self.dataPath, logPath, concurrency)
+
+    @mock.patch("sweeping.cleaner.print", create=True)
+    def testIterAllData(self, mockPrint):
+        with tempfile.TemporaryDirectory() as tempDir:
+            logPath = os.path.join(tempDir, "log.txt")
+            allData = self.extractor.extractAllData(self.dataPath, logPath)
+            for workers in (1, 2):
+                data = self.extractor.iterAllData(self.dataPath, logPath,
+                                                  workers, batchSize=50)
+                self.assertListEqual(list(data), allData)
+
+    @mock.patch("sweeping.cleaner.print", create=True)
+    def testExtractChangedData(self, mockPrint):
+        with tempfile.TemporaryDirectory() as tempDir:
+            dataPath = os.path.join(tempDir, "results")
+            shutil.copytree(os.path.join("..", "test", "results",
+                                         "type_a_subset"), dataPath)
+            logPath = os.path.join(tempDir, "log.txt")
+
+            # An empty manifest parses everything
+            data, manifest = self.extractor.extractChangedData(dataPath,
+                                                               logPath, {})
+            self.assertListEqual(data, self.extractor.extractAllData(
+                dataPath, logPath))
+
+            # Only the modified file is parsed again, deleted files are dropped
+            changed, deleted = sorted(manifest)[:2]
+            with open(changed, "a") as file:
+                file.write("101,-1.0\n")
+            os.remove(deleted)
+
+            extractFile = self.extractor._extractDataFromFile
+            with mock.patch.object(self.extractor, "_extractDataFromFile",
+                                   side_effect=extractFile) as mockExtract:
+                data, manifest = self.extractor.extractChangedData(
+                    dataPath, logPath, manifest)
+                mockExtract.assert_called_once_with(changed)
+
+            self.assertNotIn(deleted, manifest)
+            self.assertEqual(manifest[changed]["ROW"]["N"], "101")
+            self.assertListEqual(data, self.extractor.extractAllData(
+                dataPath, logPath))
+
+    @mock.patch("sweeping.cleaner.print", create=True)
+    def testExtractCachedData(self, mockPrint):
+        with tempfile.TemporaryDirectory() as tempDir:
+            dataPath = os.path.join(tempDir, "results")
+            copyPath = os.path.join(tempDir, "copy")
+            shutil.copytree(os.path.join("..", "test", "results",
+                                         "type_a_subset"), dataPath)
+            shutil.copytree(dataPath, copyPath)
+            logPath = os.path.join(tempDir, "log.txt")
+            expected = self.extractor.extractAllData(dataPath, logPath)
+
+            cache = ParseCache(os.path.join(tempDir, "cache.sqlite"))
+            extractor = Extractor(cache=cache)
+            self.assertListEqual(extractor.extractAllData(dataPath, logPath),
+                                 expected)
+            self.assertEqual((cache.hits, cache.misses), (0, len(expected)))
+
+            # Unchanged files are not read again and copies not parsed again
+            with mock.patch.object(extractor, "_extractDataFromContents") \
+                    as mockParse:
+                data = extractor.extractAllData(dataPath, logPath, workers=2)
+                self.assertListEqual(data, expected)
+                copies = extractor.extractAllData(copyPath, logPath)
+                self.assertEqual(len(copies), len(expected))
+                mockParse.assert_not_called()
+            self.assertEqual(cache.hits, 2 * len(expected))
+
+            # Worker processes close the connection they open for a chunk
+            # without writing to the cache
+            with mock.patch.object(cache, "flush") as mockFlush:
+                paths = [entry["PATH"] for entry in expected[:2]]
+                self.assertEqual(len(extractor._extractUncachedChunk(paths)),
+                                 2)
+                self.assertIsNone(cache._connection)
+                mockFlush.assert_not_called()
+
+            extractor.close()
+            self.assertIsNone(cache._connection)
+
+    def testParseCacheEviction(self):
+        stat = os.stat(__file__)
+        data = {"N": "100", "N_OUT": "1", "EXIT": "0.01"}
+        with tempfile.TemporaryDirectory() as tempDir:
+            cache = ParseCache(os.path.join(tempDir, "cache.sqlite"), 2)
+            for name in ("a", "b"):
+                cache.put(name, stat, name, data)
+            self.assertDictEqual(cache.get("a", stat), data)
+            cache.put("c", stat, "c", data)
+            cache.flush()
+
+            # The least recently used contents are evicted with their files
+            self.assertIsNone(cache.get("b", stat))
+            self.assertIsNone(cache.getContents("b"))
+            self.assertIsNotNone(cache.getContents("a"))
+            self.assertEqual((cache.hits, cache.misses), (1, 3))
+            cache.close()
+
     def test_ExtractDataFromPath(self):
         filePath = os.path.join("12Aug_m_50",
                                 "exit_time_raw_output_1&-2.2&0.32.csv")
@@ -74,6 +237,10 @@ class TestExtractor(unittest.TestCase):
         dataExtracted = self.extractor._extractDataFromPath(filePath)
         self.assertDictEqual(dataExtracted, data)
 
+        with self.assertRaisesRegex(ValueError, "named inconsistently"):
+            self.extractor._extractDataFromPath(os.path.join(
+                "misnamed", "exit_time_raw_output_1&-2.2&0.32.csv"))
+
     def test_ExtractDataFromFile(self):
         filePath = os.path.join("..", "test", "results",
                                 "exit_time_raw_output_0&-2.25&0.27.csv")
@@ -88,6 +255,191 @@ class TestExtractor(unittest.TestCase):
         dataExtracted = self.extractor._extractDataFromFile(filePath)
         self.assertDictEqual(dataExtracted, data)
 
+    def test_ExtractDataFromOutputs(self):
+        filePath = os.path.join(self.dataPath, "16Aug_m_100",
+                                "exit_time_raw_output_1&-0.55&0.26.csv")
+        data = \
+        {
+            "IN_SPOT":      "1.0",
+            "CI":           "0.00",
+            "EXIT_MEAN":    "NaN",
+            "EXIT_STD":     "NaN"
+        }
+
+        dataExtracted = self.extractor._extractDataFromOutputs(filePath)
+        self.assertDictEqual(dataExtracted, data)
+
+    @mock.patch("sweeping.cleaner.print", create=True)
+    def testExtractQueriedData(self, mockPrint):
+        with tempfile.TemporaryDirectory() as tempDir:
+            logPath = os.path.join(tempDir, "log.txt")
+            allData = Extractor().extractAllData(self.dataPath, logPath)
+            query = {"FR": 50, "ASH": (0.27, 0.3), "AWA": (None, -0.6)}
+            expected = [entry for entry in allData
+                        if float(entry["FR"]) == 50
+                        and 0.27 <= float(entry["ASH"]) <= 0.3
+                        and float(entry["AWA"]) <= -0.6]
+            self.assertTrue(0 < len(expected) < len(allData))
+
+            # Only the files whose paths match the query are read
+            extractor = Extractor(query=query)
+            with mock.patch.object(extractor, "_extractDataFromFile",
+                                   wraps=extractor._extractDataFromFile) \
+                    as read:
+                data = extractor.extractAllData(self.dataPath, logPath)
+        self.assertListEqual(data, expected)
+        self.assertEqual(read.call_count, len(expected))
+
+        with self.assertRaisesRegex(ValueError, "EXIT"):
+            Extractor(query={"EXIT": 0.5})
+        with self.assertRaisesRegex(ValueError, "DATE"):
+            Extractor(query={"DATE": (1.0, 2.0)})
+
+    def test_ReadFolder(self):
+        metadata = \
+        {
+            "DATE":         "16Aug",
+            "FR":           "100",
+            "SEED":         "1471351022638",
+            "THREADS":      "20",
+            "WORMS":        "100",
+            "END_TIME":     "900",
+            "STEP_SIZE":    "0.0001"
+        }
+        outputs = [("in_spot", "SimpleChemotaxisCircle"),
+                   ("exit_time", "TimePointCrossingCircle")]
+
+        dirPath = os.path.join(self.dataPath, "16Aug_m_100")
+        self.assertEqual(self.extractor._readFolder(dirPath),
+                         (metadata, outputs))
+
+        # Outputs declared after the settings are read too
+        with tempfile.TemporaryDirectory() as tempDir:
+            dirPath = os.path.join(tempDir, "16Aug_m_100")
+            os.mkdir(dirPath)
+            with open(os.path.join(dirPath, "16Aug_m_100.sim"), "w") as file:
+                file.write('<Simulation><Settings><Setting '
+                           'name="numberOfSimulations" value="100" />'
+                           '</Settings><Outputs><Output name="in_spot" '
+                           'type="SimpleChemotaxisCircle" /></Outputs>'
+                           '</Simulation>')
+            metadata, declared = self.extractor._readFolder(dirPath)
+            self.assertEqual(metadata["WORMS"], "100")
+            self.assertListEqual(declared, outputs[:1])
+
+        # Backups have neither a .sim nor a seeds file
+        dirPath = os.path.join(self.dataPath, "bak_16Aug_m_40")
+        metadata, outputs = self.extractor._readFolder(dirPath)
+        self.assertEqual((metadata["FR"], metadata["SEED"]), ("40", "NaN"))
+        self.assertListEqual(outputs, [])
+
+    @mock.patch("sweeping.cleaner.print", create=True)
+    def testExtractFilteredFolders(self, mockPrint):
+        extractor = Extractor(metadata=True, folderFilter=lambda folder:
+                              folder["FR"] == "100")
+
+        # Folders are discarded without opening any of their data files
+        with tempfile.TemporaryDirectory() as tempDir:
+            logPath = os.path.join(tempDir, "log.txt")
+            with mock.patch.object(extractor, "_extractDataFromFile",
+                                   wraps=extractor._extractDataFromFile) \
+                    as read:
+                data = extractor.extractAllData(self.dataPath, logPath)
+        self.assertTrue(data)
+        self.assertEqual(read.call_count, len(data))
+        for entry in data:
+            self.assertEqual(entry["FR"], "100")
+            self.assertEqual(entry["WORMS"], "100")
+            self.assertEqual(entry["SEED"], extractor._readFolder(
+                os.path.dirname(entry["PATH"]))[0]["SEED"])
+
+    @mock.patch("sweeping.cleaner.print", create=True)
+    def testExtractAllMetrics(self, mockPrint):
+        with tempfile.TemporaryDirectory() as tempDir:
+            resultsPath = os.path.join(tempDir, "results")
+            generateResultsTree(resultsPath, folders=2, files=5, corrupt=0,
+                                incomplete=0)
+            logPath = os.path.join(tempDir, "log.txt")
+            data = Extractor().extractAllData(resultsPath, logPath)
+            metrics = Extractor(metrics=True).extractAllData(resultsPath,
+                                                             logPath)
+
+            # The metrics are joined into the rows of their simulations
+            self.assertEqual(len(metrics), len(data))
+            for entry, metricEntry in zip(data, metrics):
+                self.assertDictEqual({key: metricEntry[key]
+                                      for key in entry}, entry)
+                self.assertEqual(metricEntry["IN_SPOT"], "0.0")
+                for column in Extractor.metricColumns:
+                    float(metricEntry[column])
+
+            # Outputs missing from a folder are left as NaN
+            os.remove(os.path.join(os.path.dirname(metrics[0]["PATH"]),
+                                   os.path.basename(metrics[0]["PATH"])
+                                   .replace("exit_time_raw", "in_spot_raw")))
+            metrics = Extractor(metrics=True).extractAllData(resultsPath,
+                                                             logPath)
+            self.assertEqual(metrics[0]["IN_SPOT"], "NaN")
+            self.assertNotEqual(metrics[0]["CI"], "NaN")
+
+            databasePath = os.path.join(tempDir, "database.txt")
+            database = Database(metrics=True)
+            database.create(databasePath, metrics)
+            self.assertListEqual([{key: entry[key]
+                                   for key in database.dataOrder}
+                                  for entry in database.read(databasePath)],
+                                 metrics)
+
+    @mock.patch("sweeping.cleaner.print", create=True)
+    def testExtractChangedMetrics(self, mockPrint):
+        with tempfile.TemporaryDirectory() as tempDir:
+            resultsPath = os.path.join(tempDir, "results")
+            generateResultsTree(resultsPath, folders=2, files=5, corrupt=0,
+                                incomplete=0)
+            logPath = os.path.join(tempDir, "log.txt")
+            extractor = Extractor(metrics=True)
+            data, manifest = extractor.extractChangedData(resultsPath,
+                                                          logPath, {})
+
+            # Rewriting an output of a simulation parses its row again even
+            # though its exit time data file is unchanged
+            path = sorted(manifest)[0]
+            ciPath = next(outputPath for outputPath, column, columns
+                          in extractor._outputPaths(path)
+                          if columns == ("CI",))
+            with open(ciPath, "w") as file:
+                file.write("The chemotaxis index is 0.75\n")
+            data, manifest = extractor.extractChangedData(resultsPath,
+                                                          logPath, manifest)
+
+            self.assertEqual(manifest[path]["ROW"]["CI"], "0.75")
+            self.assertListEqual(data, Extractor(metrics=True).extractAllData(
+                resultsPath, logPath))
+
+            # Turning the metadata on parses every row again with its columns
+            # rather than reusing the rows extracted without them
+            extractor = Extractor(metrics=True, metadata=True)
+            data, manifest = extractor.extractChangedData(resultsPath,
+                                                          logPath, manifest)
+            self.assertTrue(all("SEED" in row for row in data))
+            self.assertListEqual(data, extractor.extractAllData(resultsPath,
+                                                                logPath))
+
+    def test_ParseExitTimes(self):
+        header = b"Run,Exit time\n"
+        footer = b"The average time of exit is 12.5\r\n" \
+                 b"The chemotaxis index is 0.5\r\n"
+        body = b"1,-1.0\r\n2,12.5\r\n3,1.0E-4\r\n\r\n"
+        parse = self.extractor._parseExitTimes
+        self.assertEqual(parse(header + body, "a.csv"), (3, 2))
+        self.assertEqual(parse(header + body + footer, "a.csv"), (3, 2))
+        self.assertEqual(parse(header, "a.csv"), (0, 0))
+
+        # Lines that are not canonical fall back to the line parser
+        self.assertEqual(parse(header + b"1, -1\n2,7\n", "a.csv"), (2, 1))
+        with self.assertRaisesRegex(ValueError, "line 3 .* a.csv"):
+            parse(header + b"1,-1.0\n2;3.0\n", "a.csv")
+
     def test_ListAllFilePaths(self):
         allPathsFile = os.path.join("..", "test", "results",
                                     "type_a_path_list.txt")
@@ -123,6 +475,44 @@ class TestExtractor(unittest.TestCase):
         mockRemove.assert_called_once_with(mockLogPath)
 
 
+class TestScanner(unittest.TestCase):
+    """
+    Unit tests for the Scanner class.
+    """
+
+    def setUp(self):
+        self.dataPath = os.path.join("..", "test", "results", "type_a")
+
+    def testScan(self):
+        # The scanner finds the same files, in the same order, as os.walk
+        walked = [os.path.join(os.path.basename(root), file)
+                  for root, dirs, files in os.walk(self.dataPath)
+                  for file in files
+                  if file.endswith(".csv") and "exit_time_raw_output" in file]
+        scanned = [path for path, entry in Scanner().scan(self.dataPath)]
+        self.assertListEqual(scanned, walked)
+
+        parallel = Scanner(workers=4).scan(self.dataPath)
+        self.assertListEqual([path for path, entry in parallel], walked)
+
+    def testScanGlobs(self):
+        scanner = Scanner(exclude=["bak_*", "bak1_*"])
+        dataDirs = {os.path.dirname(path)
+                    for path, entry in scanner.scan(self.dataPath)}
+        self.assertIn("16Aug_m_60", dataDirs)
+        self.assertIn("batch0_16Aug_u_50", dataDirs)
+        self.assertFalse(any(d.startswith("bak") for d in dataDirs))
+
+        scanner = Scanner(include=["batch*"])
+        dataDirs = {os.path.dirname(path)
+                    for path, entry in scanner.scan(self.dataPath)}
+        self.assertSetEqual(dataDirs, {"batch0_16Aug_u_50",
+                                       "batch0_16Aug_u_40"})
+
+    def testScanMissingDirectory(self):
+        self.assertListEqual(list(Scanner().scan("missing")), [])
+
+
 class TestDatabase(unittest.TestCase):
     """
     Unit tests for the Database class.
@@ -158,24 +548,57 @@ class TestDatabase(unittest.TestCase):
 
             self.assertDictEqual(database[0], self.entry1)
 
-    @mock.patch("os.path")
-    @mock.patch("os.remove")
-    def testCreate(self, mockRemove, mockPath):
+    def testValuePool(self):
+        strings = ValuePool()
+        numbers = ValuePool(float)
+        value = "".join(["0.", "30"])
+
+        self.assertIs(strings[value], value)
+        self.assertIs(strings["0.30"], value)
+        self.assertEqual(numbers["0.30"], 0.3)
+        self.assertRaises(ValueError, numbers.__getitem__, "16Aug")
+        self.assertNotIn("16Aug", numbers)
+
+        entry = strings.internEntry(dict(self.entry1))
+        self.assertDictEqual(entry, self.entry1)
+        self.assertIs(entry["ASH"], value)
+
+    @mock.patch("os.replace")
+    def testCreate(self, mockReplace):
         entries = [self.entry1, self.entry2, self.entry3]
 
         mockOpen = mock.mock_open()
         with mock.patch("builtins.open", mockOpen, create=True):
-            self.database.create("foo", entries)
+            self.database.create("foo", entries, chunkSize=2)
 
-            # Check whether header was written
-            header = self.database.template.format(*self.database.dataOrder)
-            mockOpen().write.assert_any_call(header)
+            # Check whether the file was opened once and moved into place
+            tempPath = mockOpen.call_args[0][0]
+            mockOpen.assert_called_once_with(tempPath, "w")
+            mockReplace.assert_called_once_with(tempPath, "foo")
 
-            # Check whether entries were written
+            # Check whether the header and entries were written in order
+            header = self.database.template.format(*self.database.dataOrder)
+            written = "".join(call[0][0] for call
+                              in mockOpen().write.call_args_list)
+            expected = [header]
             for entry in entries:
                 orderedEntry = [entry[order] for order in self.database.dataOrder]
-                orderedEntry = self.database.template.format(*orderedEntry)
-                mockOpen().write.assert_any_call(orderedEntry)
+                expected.append(self.database.template.format(*orderedEntry))
+            self.assertEqual(written, "".join(expected))
+
+    def testCreateFailure(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            databasePath = os.path.join(tempDir, "database.txt")
+            self.database.create(databasePath, [self.entry1])
+            with open(databasePath, "r") as database:
+                contents = database.read()
+
+            # A failed write leaves the old database and no temporary file
+            with self.assertRaises(KeyError):
+                self.database.create(databasePath, [self.entry1, {}])
+            self.assertListEqual(os.listdir(tempDir), ["database.txt"])
+            with open(databasePath, "r") as database:
+                self.assertEqual(database.read(), contents)
 
     def testQuery(self):
         query = \
@@ -199,12 +622,73 @@ class TestDatabase(unittest.TestCase):
 
         self._assertSorted(iter(sortedEntries))
 
+    def testSorter(self):
+        entry4 = self.entry3.copy()
+        entry4["ASH"] = "0.40"
+        database = [self.entry1, self.entry2, self.entry3,
+                    entry4, entry4, entry4, self.entry2]
+
+        # Spilling every two entries must give the same order as sort
+        sorter = self.database.sorter(chunkSize=2)
+        for entry in database:
+            sorter.add(entry)
+        self.assertListEqual(list(sorter.sorted()),
+                             self.database.sort(database))
+
+    def testTable(self):
+        entries = [self.entry1, self.entry2, self.entry3]
+        table = Table.fromEntries(entries)
+
+        # Rows read back exactly and the values are stored once per column
+        self.assertEqual(len(table), 3)
+        self.assertListEqual([dict(row) for row in table], entries)
+        self.assertEqual(table[-1].number("ASH"), 0.6)
+        self.assertListEqual(list(table.numbers("N")), [110.0, 0.0, 130.0])
+        self.assertEqual(len(table._strings["AWA"]), 1)
+
+        # Database operations accept the table and return one
+        query = {"FR": 50, "MULTI": "0"}
+        self.assertListEqual(list(self.database.query(table, query)),
+                             self.database.query(entries, query))
+        self.assertListEqual(list(self.database.sort(table)),
+                             self.database.sort(entries))
+        self.assertListEqual(list(self.database.sanitize(table)), [])
+
     def testSanitize(self):
         database = [self.entry1, self.entry2, self.entry3]
 
         self.assertListEqual(self.database.sanitize(database), [])
 
-    def test_WriteEntry(self):
+    def testPartition(self):
+        entries = [dict(self.entry1, N=str(worms))
+                   for worms in (100, 0, 37, 200)]
+        kept, ignored = self.database.partition(entries)
+        self.assertListEqual(kept, [entries[0], entries[3]])
+        self.assertListEqual(ignored, entries[1:3])
+
+        # Tables evaluate the rules once per distinct worm count
+        table = Table.fromEntries(entries * 3)
+        with mock.patch.object(self.database, "isSanitary",
+                               wraps=self.database.isSanitary) as isSanitary:
+            kept, ignored = self.database.partition(table)
+        self.assertEqual(isSanitary.call_count, 4)
+        self.assertListEqual(list(kept), [entries[0], entries[3]] * 3)
+        self.assertListEqual(list(ignored), entries[1:3] * 3)
+
+        # Rules are pluggable
+        self.database.rules.append(lambda entry: int(entry["N"]) < 150)
+        kept, ignored = self.database.partition(entries)
+        self.assertListEqual(kept, [entries[0]])
+        self.assertListEqual(ignored, entries[1:])
+
+        # Rules reading several columns are evaluated per row
+        self.database.rules.append(lambda entry: entry["ASH"] == "0.30")
+        self.database.ruleColumn = None
+        kept, ignored = self.database.partition(Table.fromEntries(entries))
+        self.assertListEqual(list(kept), [entries[0]])
+        self.assertListEqual(list(ignored), entries[1:])
+
+    def test_FormatEntry(self):
         entryData = \
         {
             "FR":       "50",
@@ -222,20 +706,7 @@ class TestDatabase(unittest.TestCase):
         orderedEntry = [entryData[order] for order in self.database.dataOrder]
         expectedEntry = self.database.template.format(*orderedEntry)
 
-        mockOpen = mock.mock_open()
-        with mock.patch("builtins.open", mockOpen, create=True):
-            self.database._writeEntry("foo", entryData)
-
-            mockOpen().write.assert_called_once_with(expectedEntry)
-
-    def test_InitializeDataFile(self):
-        mockOpen = mock.mock_open()
-        with mock.patch("builtins.open", mockOpen, create=True):
-            self.database._initializeDataFile("bar")
-
-            # Asserts whether the header was written into the database file
-            header = self.database.template.format(*self.database.dataOrder)
-            mockOpen().write.assert_called_once_with(header)
+        self.assertEqual(self.database.formatEntry(entryData), expectedEntry)
 
     def _assertSorted(self, entries):
         """
@@ -275,7 +746,34 @@ class TestIntegration(unittest.TestCase):
         self.controller = Controller(settingsPath)
 
     def testReadIniFile(self):
-        self.assertListEqual(self.controller.config.sections(), ["PATHS"])
+        self.assertListEqual(self.controller.config.sections(),
+                             ["PATHS", "OPTIONS"])
+
+        # The asynchronous reads cannot go through the parse cache
+        with tempfile.TemporaryDirectory() as tempDir:
+            settingsPath = os.path.join(tempDir, "settings.ini")
+            with open(settingsPath, "w") as file:
+                file.write("[PATHS]\nparse_cache=cache.sqlite\n"
+                           "[OPTIONS]\nio_concurrency=8\n")
+            with self.assertRaises(ValueError):
+                Controller(settingsPath)
+
+        extractor = Extractor(cache=ParseCache("cache.sqlite"))
+        with self.assertRaises(ValueError):
+            extractor.extractAllDataAsync(self.resultsDir, "log.txt")
+
+    def test_CreateQuery(self):
+        self.assertIsNone(self.controller._createQuery())
+        self.controller.config["OPTIONS"]["ingest_filter"] = \
+            "fr=50, ASH=0.2:0.3, AWA=:-1,"
+        self.assertDictEqual(self.controller._createQuery(),
+                             {"FR": "50", "ASH": (0.2, 0.3),
+                              "AWA": (None, -1.0)})
+
+        # Dates are not numbers so they cannot be bounded
+        self.controller.config["OPTIONS"]["ingest_filter"] = "DATE=1:2"
+        with self.assertRaises(ValueError):
+            self.controller._createQuery()
 
     def testGenerateTypeASubsetDatabase(self):
         expectedDatabase = os.path.join(self.databaseDir, "expected",
@@ -298,6 +796,159 @@ class TestIntegration(unittest.TestCase):
         self.assertTrue(filecmp.cmp(producedDatabase, expectedDatabase,
                                     shallow=False))
 
+    @mock.patch("sweeping.cleaner.print", create=True)
+    def testGenerateStreamedDatabase(self, mockPrint):
+        with tempfile.TemporaryDirectory() as tempDir:
+            paths = self.controller.config["PATHS"]
+            paths["results_read"] = os.path.join(self.resultsDir, "type_a")
+            paths["results_read_log"] = os.path.join(tempDir, "log.txt")
+
+            # The parse cache is closed once the database is generated
+            cache = ParseCache(os.path.join(tempDir, "cache.sqlite"))
+            self.controller.extractor.cache = cache
+
+            produced = []
+            for streaming in ("false", "true"):
+                paths["database"] = os.path.join(tempDir, streaming)
+                paths["database_ignored"] = paths["database"] + "_ignored"
+                self.controller.config["OPTIONS"]["streaming"] = streaming
+                self.controller.config["OPTIONS"]["sort_chunk_size"] = "10"
+                self.controller.generateDatabase()
+                self.assertIsNone(cache._connection)
+                produced.append(paths["database"])
+
+            self.assertTrue(filecmp.cmp(*produced, shallow=False))
+            self.assertTrue(filecmp.cmp(*[path + "_ignored"
+                                          for path in produced],
+                                        shallow=False))
+
+    @mock.patch("sweeping.cleaner.print", create=True)
+    @mock.patch.dict(os.environ, {"SWEEPING_INSTRUMENT": "1"})
+    def testInstrumentation(self, mockPrint):
+        with tempfile.TemporaryDirectory() as tempDir:
+            # The profile has to be asked for before the controller exists
+            config = configparser.ConfigParser()
+            config.read(os.path.join(".", "settings.ini"))
+            paths = config["PATHS"]
+            paths["results_read"] = os.path.join(self.resultsDir, "type_a")
+            for path in ("results_read_log", "database", "database_ignored",
+                         "queries", "triplets_manifest", "instrument_report",
+                         "instrument_profile"):
+                paths[path] = os.path.join(tempDir, path)
+            settingsPath = os.path.join(tempDir, "settings.ini")
+            with open(settingsPath, "w") as file:
+                config.write(file)
+
+            controller = Controller(settingsPath)
+            self.addCleanup(instrumentation.stop)
+            self.assertTrue(instrumentation.enabled)
+            controller.generateDatabase()
+            controller.generateFructoseTriplets()
+            controller.writeInstrumentationReport()
+            self.assertFalse(instrumentation.enabled)
+
+            with open(paths["instrument_report"], "r") as file:
+                report = json.load(file)
+            self.assertTrue(os.path.exists(paths["instrument_profile"]))
+
+        stages = report["STAGES"]
+        files = stages["Extractor._extractDataFromFile"]["CALLS"]
+        self.assertEqual(report["FILES"], files)
+        self.assertEqual(stages["Extractor._extractDataFromPath"]["CALLS"],
+                         files)
+        self.assertEqual(stages["Controller.generateDatabase"]["CALLS"], 1)
+        for stage in ("Extractor._listAllFilePaths", "Database.partition",
+                      "Database.sort", "Database.create", "Database.read",
+                      "Controller.generateFructoseTriplets"):
+            self.assertIn(stage, stages)
+        self.assertGreater(report["BYTES"], 0)
+        self.assertGreater(report["FILES_PER_SECOND"], 0)
+
+    @mock.patch("sweeping.cleaner.print", create=True)
+    def testWatch(self, mockPrint):
+        with tempfile.TemporaryDirectory() as tempDir:
+            resultsPath = os.path.join(tempDir, "results")
+            generateResultsTree(resultsPath, folders=8, files=20, corrupt=0.05,
+                                incomplete=0.1)
+            sparePath = os.path.join(tempDir, "spare")
+            folders = sorted(os.listdir(resultsPath))
+            os.rename(os.path.join(resultsPath, folders[-1]), sparePath)
+
+            def createController(name, options):
+                config = configparser.ConfigParser()
+                config.read(os.path.join(".", "settings.ini"))
+                config["PATHS"]["results_read"] = resultsPath
+                for path in ("results_read_log", "database",
+                             "database_ignored", "queries", "manifest",
+                             "triplets_manifest"):
+                    config["PATHS"][path] = os.path.join(tempDir, name + path)
+                config["OPTIONS"].update(options)
+                settingsPath = os.path.join(tempDir, name + "settings.ini")
+                with open(settingsPath, "w") as file:
+                    config.write(file)
+                return Controller(settingsPath)
+
+            def assertSameOutput(watched):
+                full = createController("full_", {})
+                full.generateDatabase()
+                full.generateFructoseTriplets()
+                for path in ("database", "database_ignored"):
+                    self.assertTrue(filecmp.cmp(full.config["PATHS"][path],
+                                                watched.config["PATHS"][path],
+                                                shallow=False))
+                fullDir = full.config["PATHS"]["queries"]
+                watchedDir = watched.config["PATHS"]["queries"]
+                names = sorted(os.listdir(fullDir))
+                self.assertListEqual(sorted(os.listdir(watchedDir)), names)
+                self.assertTrue(names)
+                self.assertListEqual(filecmp.cmpfiles(
+                    fullDir, watchedDir, names, shallow=False)[0], names)
+                shutil.rmtree(fullDir)
+
+            watched = createController("watched_", {"watch_settle": "0",
+                                                    "watch_interval": "0"})
+            with mock.patch.object(watched.extractor, "close",
+                                   wraps=watched.extractor.close) as close:
+                watched.watch(cycles=1)
+                close.assert_called_once_with()
+            assertSameOutput(watched)
+
+            # A folder lands, a file is rewritten, another one rewritten into
+            # one that fails to parse and another removed
+            os.rename(sparePath, os.path.join(resultsPath, folders[-1]))
+            folderPath = os.path.join(resultsPath, folders[0])
+            names = sorted(os.listdir(folderPath))
+            names = [name for name in names if "exit_time_raw" in name]
+            os.remove(os.path.join(folderPath, names[0]))
+            with open(os.path.join(folderPath, names[1]), "w") as file:
+                file.write("Run,TimePointCrossingCircle\n" +
+                           "".join("{},-1.0\n".format(run)
+                                   for run in range(1, 101)))
+            with open(os.path.join(folderPath, names[2]), "w") as file:
+                file.write("Run,TimePointCrossingCircle\n1;-1.0\n")
+
+            # Unsettled files are left for a later poll
+            watched.config["OPTIONS"]["watch_settle"] = "3600"
+            watched.watch(cycles=1)
+            mockPrint.assert_called_with("Ingested 0 data files, 1 changed "
+                                         "or removed")
+
+            # Files that fail to parse are only logged once while watching
+            logPath = watched.config["PATHS"]["results_read_log"]
+            os.remove(logPath)
+            watched.config["OPTIONS"]["watch_settle"] = "0"
+            mockPrint.reset_mock()
+            watched.watch(cycles=2)
+            self.assertEqual(mockPrint.call_count, 1)
+            assertSameOutput(watched)
+
+            with open(logPath) as file, \
+                    open(os.path.join(tempDir, "full_results_read_log")) \
+                    as fullFile:
+                lines = fullFile.readlines()
+                self.assertTrue(lines)
+                self.assertEqual(len(file.readlines()), len(lines))
+
     def testQueryMockDatabase(self):
         mockPath = os.path.join(self.databaseDir, "expected", "mock.txt")
         database = self.controller.database.read(mockPath)
@@ -305,6 +956,92 @@ class TestIntegration(unittest.TestCase):
 
         self.assertTrue(len(matches) == 5)
 
+    @mock.patch("sweeping.cli.print", create=True)
+    def testCliQueryMockDatabase(self, mockPrint):
+        mockPath = os.path.join(self.databaseDir, "expected", "mock.txt")
+        database = self.controller.database.read(mockPath)
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            # Relative paths are taken from the directory of the .ini file
+            settingsPath = os.path.join(tempDir, "settings.ini")
+            with open(settingsPath, "w") as file:
+                file.write("[PATHS]\ndatabase=mock.txt\n"
+                           "parse_cache=cache.sqlite\n")
+            shutil.copy(mockPath, tempDir)
+            controller = cli.createController(settingsPath)
+            self.assertEqual(controller.config["PATHS"]["database"],
+                             os.path.join(tempDir, "mock.txt"))
+            self.assertEqual(controller.extractor.cache.cachePath,
+                             os.path.join(tempDir, "cache.sqlite"))
+
+            def run(*arguments):
+                argv = ["cli", "--settings", settingsPath] + list(arguments)
+                with mock.patch("sys.argv", argv):
+                    cli.main()
+
+            run("query", "--count", "FR=100", "AWA=-1.7")
+            mockPrint.assert_called_with(5)
+
+            run("query", "--count", "FR=100", "ASH=0.3:")
+            mockPrint.assert_called_with(len(
+                [entry for entry in database
+                 if float(entry["FR"]) == 100 and float(entry["ASH"]) >= 0.3]))
+
+            run("query", "FR=100", "AWA=-1.7")
+            printed = "".join(call[0][0] for call in mockPrint.call_args_list
+                              [-6:])
+            self.assertEqual(printed.split("\n")[0].split(),
+                             self.controller.database.dataOrder)
+            self.assertEqual(len(printed.splitlines()), 6)
+
+            # Text columns are matched as written
+            run("query", "--count", "DATE=16Aug", "FR=100")
+            mockPrint.assert_called_with(len(
+                [entry for entry in database if float(entry["FR"]) == 100]))
+
+            # Mistakes are reported rather than raised
+            for mistake in ("FOO=1", "FR=abc", "FR=abc:1", "DATE=:1", "FR"):
+                with mock.patch("sys.stderr") as mockStderr, \
+                        self.assertRaises(SystemExit) as context:
+                    run("query", mistake)
+                self.assertEqual(context.exception.code, 2)
+                self.assertTrue(mockStderr.write.called)
+
+            # The sqlite format is queried through its index rather than
+            # read in full
+            with open(settingsPath, "w") as file:
+                file.write("[PATHS]\ndatabase=mock.sqlite\n"
+                           "[OPTIONS]\ndatabase_format=sqlite\n")
+            self.controller.database.createSqlite(
+                os.path.join(tempDir, "mock.sqlite"),
+                [dict(entry, PATH="{}_{}".format(i, entry["PATH"]))
+                 for i, entry in enumerate(database)])
+            with mock.patch.object(Database, "readSqlite") as mockRead:
+                run("query", "--count", "FR=100", "AWA=-1.7")
+                mockPrint.assert_called_with(5)
+                mockRead.assert_not_called()
+
+    def testInternedMockDatabase(self):
+        mockPath = os.path.join(self.databaseDir, "expected", "mock.txt")
+        database = self.controller.database
+        # Paths of the mock database are made unique like real ones are
+        entries = [dict(entry, PATH="{}_{}".format(i, entry["PATH"]))
+                   for i, entry in enumerate(database.read(mockPath))]
+
+        # Strings are shared by the SQLite backend (see valueStrings)
+        with tempfile.TemporaryDirectory() as tempDir:
+            sqlitePath = os.path.join(tempDir, "mock.sqlite")
+            database.createSqlite(sqlitePath, entries)
+            first = database.readSqlite(sqlitePath)
+            second = database.readSqlite(sqlitePath)
+
+        for column in ValuePool.columns:
+            self.assertIs(first[0][column], second[0][column])
+        self.assertIsNot(first[0]["PATH"], second[0]["PATH"])
+
+        # Dates are not kept in the pools, which are never emptied
+        self.assertNotIn(first[0]["DATE"], valueStrings)
+
     def testSanitizeMockDatabase(self):
         mockPath = os.path.join(self.databaseDir, "expected", "mock.txt")
         database = self.controller.database.read(mockPath)
@@ -312,6 +1049,279 @@ class TestIntegration(unittest.TestCase):
 
         self.assertTrue(len(sanitizedEntries) == 7)
 
+    def testIndexedQueryMockDatabase(self):
+        mockPath = os.path.join(self.databaseDir, "expected", "mock.txt")
+        database = self.controller.database.read(mockPath)
+        index = self.controller.database.index(database)
+
+        # The index must match a linear scan for every query combination
+        for entry in database:
+            for query in ({"FR": entry["FR"]},
+                          {"FR": entry["FR"], "ASH": entry["ASH"]},
+                          {"AWA": float(entry["AWA"]), "MULTI": entry["MULTI"],
+                           "ASH": entry["ASH"], "FR": int(entry["FR"])}):
+                expected = [e for e in database
+                            if all(float(e[k]) == float(v)
+                                   for k, v in query.items())]
+                self.assertListEqual(
+                    self.controller.database.query(index, query), expected)
+
+    def testFindFructoseTripletsSynthetic(self):
+        database = generateSyntheticDatabase(400, values=3)
+        triplets = list(self.controller.findFructoseTriplets(database))
+        names = [name for name, data in triplets]
+
+        # Each triplet is found once and agrees with the legacy search
+        self.assertTrue(triplets)
+        self.assertEqual(len(names), len(set(names)))
+        self.assertDictEqual(dict(triplets),
+                             legacyFructoseTriplets(self.controller, database))
+
+    def testRankFructoseTripletsSynthetic(self):
+        database = generateSyntheticDatabase(2000, values=5)
+        names = [name for name, data in
+                 self.controller.findFructoseTriplets(database)]
+        ranked = self.controller.rankFructoseTriplets(database, len(names))
+
+        # Every triplet is ranked, best first, with the fit of its file name
+        self.assertEqual(len(ranked), len(names))
+        fits = [triplet["FIT"] for triplet in ranked]
+        self.assertListEqual(fits, sorted(fits))
+        self.assertSetEqual({"{}_({}_{}_{}).txt".format(
+            int(t["FIT"]), t["ONE_MOLAR"], t["ASH"], t["AWA"])
+            for t in ranked}, set(names))
+
+        table = self.controller.rankFructoseTriplets(Table.fromEntries(
+            database), 3)
+        self.assertListEqual([t["FIT"] for t in table], fits[:3])
+
+    def testGenerateRankedFructoseTriplets(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            paths = self.controller.config["PATHS"]
+            paths["database"] = os.path.join(tempDir, "database.txt")
+            paths["ranked_queries"] = os.path.join(tempDir, "ranked.txt")
+            self.controller.database.create(
+                paths["database"], generateSyntheticDatabase(2000, values=5))
+
+            produced = []
+            for top in ("0", "3"):
+                paths["queries"] = os.path.join(tempDir, "queries" + top)
+                self.controller.config["OPTIONS"]["triplets_top"] = top
+                self.controller.config["OPTIONS"]["triplets_details"] = "true"
+                self.controller.generateFructoseTriplets()
+                produced.append(paths["queries"])
+            allQueries, topQueries = [os.listdir(path) for path in produced]
+
+            # Only the best triplets are stored, exactly as before
+            with open(paths["ranked_queries"], "r") as file:
+                ranked = [line.split() for line in file][1:]
+            self.assertEqual(len(ranked), 3)
+            self.assertSetEqual({"_({}_{}_{}).txt".format(*row[4:])
+                                 for row in ranked},
+                                {name[name.index("_"):]
+                                 for name in topQueries})
+            self.assertLessEqual(set(topQueries), set(allQueries))
+            fits = sorted(int(name.split("_")[0]) for name in allQueries)
+            self.assertListEqual(sorted(int(name.split("_")[0])
+                                        for name in topQueries), fits[:3])
+            for name in topQueries:
+                self.assertTrue(filecmp.cmp(
+                    os.path.join(produced[0], name),
+                    os.path.join(produced[1], name), shallow=False))
+
+    @mock.patch("sweeping.cleaner.print", create=True)
+    def testRescoreChangedFructoseTriplets(self, mockPrint):
+        with tempfile.TemporaryDirectory() as tempDir:
+            paths = self.controller.config["PATHS"]
+            paths["database"] = os.path.join(tempDir, "database.txt")
+            paths["queries"] = os.path.join(tempDir, "queries")
+            paths["triplets_manifest"] = os.path.join(tempDir,
+                                                      "triplets.json")
+            # Paths are made unique like real ones are
+            entries = [dict(entry, PATH="{}_{}".format(i, entry["PATH"]))
+                       for i, entry in enumerate(
+                           generateSyntheticDatabase(3000, values=6))]
+            self.controller.database.create(paths["database"], entries)
+            self.controller.generateFructoseTriplets()
+
+            # Rows are changed, removed and added
+            changed = [dict(entry, EXIT="0.5") for entry in entries[:50]]
+            added = [dict(entry, PATH=entry["PATH"] + ".new")
+                     for entry in entries[-50:]]
+            updated = self.controller.database.sort(
+                changed + entries[50:-100] + added)
+            self.controller.database.create(paths["database"], updated)
+
+            with mock.patch.object(self.controller, "_scoreFructoseTriplet",
+                                   wraps=self.controller._scoreFructoseTriplet
+                                   ) as score:
+                self.controller.generateFructoseTriplets()
+            self.assertLess(score.call_count,
+                            len(list(TripletSearch(updated).candidates())))
+
+            # Unchanged databases rescore nothing
+            with mock.patch.object(self.controller,
+                                   "_scoreFructoseTriplet") as score:
+                self.controller.generateFructoseTriplets()
+            score.assert_not_called()
+
+            # Deleted triplet files are written again
+            queriesDir = paths["queries"]
+            for name in os.listdir(queriesDir)[::2]:
+                os.remove(os.path.join(queriesDir, name))
+            self.controller.generateFructoseTriplets()
+
+            # The triplets are the same as if written from scratch
+            paths["triplets_manifest"] = ""
+            paths["queries"] = os.path.join(tempDir, "expected")
+            self.controller.generateFructoseTriplets()
+            names = sorted(os.listdir(paths["queries"]))
+            self.assertTrue(names)
+            self.assertListEqual(sorted(os.listdir(
+                os.path.join(tempDir, "queries"))), names)
+            self.assertListEqual(filecmp.cmpfiles(
+                paths["queries"], os.path.join(tempDir, "queries"), names,
+                shallow=False)[0], names)
+
+    @mock.patch("sweeping.cleaner.print", create=True)
+    def testGeneratedResultsTree(self, mockPrint):
+        with tempfile.TemporaryDirectory() as tempDir:
+            resultsPath = os.path.join(tempDir, "results")
+            counts = generateResultsTree(resultsPath, folders=4, files=10,
+                                         corrupt=0.2, incomplete=0.2)
+            self.assertEqual(counts["FILES"], 40)
+            self.assertTrue(counts["CORRUPT"] and counts["INCOMPLETE"])
+
+            # Corrupt files are logged and incomplete ones sanitized away
+            logPath = os.path.join(tempDir, "log.txt")
+            data = Extractor().extractAllData(resultsPath, logPath)
+            self.assertEqual(len(data), counts["FILES"] - counts["CORRUPT"])
+            with open(logPath, "r") as file:
+                self.assertEqual(len(file.readlines()), counts["CORRUPT"])
+            self.assertLess(len(Database().sanitize(data)), len(data))
+
+            timings = runScenarios(resultsPath, repeat=1, queries=10)
+            self.assertListEqual(sorted(timings), sorted(SCENARIOS))
+            self.assertEqual(timings["query"]["ITEMS"], 10)
+
+    def testTableMockDatabase(self):
+        mockPath = os.path.join(self.databaseDir, "expected", "mock.txt")
+        database = self.controller.database.read(mockPath)
+        table = self.controller.database.readTable(mockPath)
+
+        for operation in (self.controller.database.sanitize,
+                          self.controller.database.sort):
+            self.assertListEqual([dict(row) for row in operation(table)],
+                                 [{key: entry[key] for key in table.columns}
+                                  for entry in operation(database)])
+
+        index = self.controller.database.index(table)
+        matches = self.controller.database.query(index, {"FR": 100,
+                                                         "AWA": -1.7})
+        self.assertEqual(len(matches), 5)
+
+    def testBinaryMockDatabase(self):
+        mockPath = os.path.join(self.databaseDir, "expected", "mock.txt")
+        database = self.controller.database
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            binaryPath = os.path.join(tempDir, "mock.bin")
+            textPaths = [os.path.join(tempDir, name)
+                         for name in ("direct.txt", "converted.txt")]
+
+            # Converting there and back gives the same text database
+            database.convertToBinary(mockPath, binaryPath)
+            database.convertToText(binaryPath, textPaths[1])
+            database.create(textPaths[0], database.read(mockPath))
+            self.assertTrue(filecmp.cmp(*textPaths, shallow=False))
+
+            # Columns beyond the ones of the database are converted as well
+            entries = [dict(entry, EXTRA=str(i))
+                       for i, entry in enumerate(database.read(mockPath))]
+            extraPath = os.path.join(tempDir, "extra.bin")
+            Table.fromEntries(entries, database.dataOrder + ["EXTRA"]) \
+                .writeBinary(extraPath)
+            database.convertToText(extraPath, textPaths[1])
+            columns = database.dataOrder + ["EXTRA"]
+            self.assertListEqual(
+                [[entry[column] for column in columns]
+                 for entry in database.read(textPaths[1])],
+                [[entry[column] for column in columns] for entry in entries])
+
+            # Closing the mapped database releases the file
+            with database.readBinary(binaryPath) as table:
+                self.assertEqual(len(table), len(entries))
+            self.assertIsNone(table._mapped)
+
+            # The mapped database supports the usual operations
+            table = database.readBinary(binaryPath)
+            matches = database.query(table, {"FR": 100, "AWA": -1.7})
+            self.assertEqual(len(matches), 5)
+            self.assertEqual(len(database.sanitize(table)), 7)
+            with self.assertRaises(TypeError):
+                table.append(dict(table[0]))
+
+            # Views of the mapped database can be written back out
+            sortedPath = os.path.join(tempDir, "sorted.bin")
+            database.createBinary(sortedPath, database.sort(table))
+            self.assertListEqual(
+                [dict(row) for row in database.readBinary(sortedPath)],
+                [dict(row) for row in database.sort(database.readTable(
+                    mockPath))])
+
+    def testSqliteMockDatabase(self):
+        mockPath = os.path.join(self.databaseDir, "expected", "mock.txt")
+        database = self.controller.database
+        # Paths of the mock database are made unique like real ones are
+        entries = [dict({key: entry[key] for key in database.dataOrder},
+                        PATH="{}_{}".format(i, entry["PATH"]))
+                   for i, entry in enumerate(database.read(mockPath))]
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            sqlitePath = os.path.join(tempDir, "mock.sqlite")
+
+            # Values read back exactly as they were written, even numbers
+            # written unusually
+            entries[1]["ASH"] = "0.40"
+            entries[2]["AWA"] = "1e-05"
+            database.createSqlite(sqlitePath, entries)
+            self.assertListEqual(database.readSqlite(sqlitePath), entries)
+
+            stored = database.openSqlite(sqlitePath)
+            self.addCleanup(stored.close)
+            for query in ({"FR": 100, "AWA": -1.7}, {"ASH": 0.32}):
+                self.assertListEqual(database.query(stored, query),
+                                     database.query(entries, query))
+            self.assertListEqual(database.sort(stored),
+                                 database.sort(entries))
+            plan = stored._connect().execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM entries WHERE FR = 100 "
+                "AND ASH = 0.32").fetchall()
+            self.assertIn("entries_key", str(plan))
+            self.assertEqual(stored._connect().execute(
+                "SELECT typeof(AWA) FROM entries WHERE PATH = ?",
+                (entries[2]["PATH"],)).fetchone(), ("real",))
+
+            # Upserts replace entries by PATH and append new ones
+            changed = dict(entries[0], N="50")
+            added = dict(entries[0], PATH="added.csv")
+            database.upsertSqlite(sqlitePath, [changed, added])
+            self.assertListEqual(stored.read(),
+                                 [changed] + entries[1:] + [added])
+            stored.delete(["added.csv"])
+            self.assertEqual(len(stored), len(entries))
+
+            # The controller queries the sqlite format through its index
+            # rather than reading it in full
+            config = self.controller.config
+            config["PATHS"]["database"] = sqlitePath
+            config["OPTIONS"]["database_format"] = "sqlite"
+            with mock.patch.object(Database, "readSqlite") as mockRead:
+                self.assertListEqual(
+                    self.controller.queryDatabase({"FR": 100, "AWA": -1.7}),
+                    database.query(stored.read(), {"FR": 100, "AWA": -1.7}))
+                mockRead.assert_not_called()
+
     def testSortMockDatabase(self):
         mockPath = os.path.join(self.databaseDir, "expected", "mock.txt")
         mockSorted = os.path.join(self.databaseDir, "expected", "mock_sorted.txt")